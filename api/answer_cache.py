@@ -0,0 +1,180 @@
+# answer_cache.py - Semantic /api/chat response cache keyed on question embeddings
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """Size-bounded LRU of chat responses matched by cosine similarity.
+
+    Every entry is tagged with the ``fact_calls`` data version it was computed
+    against; seeing a new version drops the whole cache. Entries also keep the
+    literals of their question (dates, issue types, sentiments, names, numbers):
+    questions that differ only in a literal embed almost identically, so a hit
+    must match them exactly as well as clear the similarity threshold.
+
+    Questions whose answer is known not to depend on wording (see
+    ``lookup_key``) can instead be cached under an exact key, which needs no
+    embedding; both kinds share the LRU and the size bound.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.data_version: Optional[int] = None
+        self._entries: "OrderedDict[int, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._literals: Dict[int, Tuple[Tuple[str, str], ...]] = {}
+        self._keys: Dict[Hashable, int] = {}
+        self._key_of: Dict[int, Hashable] = {}
+        self._vectors: Dict[int, np.ndarray] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_ids: List[int] = []
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _sync_version(self, data_version: int):
+        if data_version != self.data_version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._vectors.clear()
+            self._literals.clear()
+            self._keys.clear()
+            self._key_of.clear()
+            self._matrix = None
+            self.data_version = data_version
+
+    def _rebuild_matrix(self):
+        self._matrix_ids = list(self._vectors)
+        self._matrix = (
+            np.stack([self._vectors[i] for i in self._matrix_ids])
+            if self._matrix_ids
+            else None
+        )
+
+    def _drop(self, entry_id: int):
+        self._entries.pop(entry_id, None)
+        self._vectors.pop(entry_id, None)
+        self._literals.pop(entry_id, None)
+        self._keys.pop(self._key_of.pop(entry_id, None), None)
+        self._matrix = None
+
+    def _add(self, response: Dict[str, Any]) -> int:
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (time.monotonic(), response)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+        return entry_id
+
+    def lookup(
+        self,
+        embedding: List[float],
+        data_version: Optional[int],
+        literals: Tuple[Tuple[str, str], ...] = (),
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        if data_version is None:
+            return None
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        with self._lock:
+            self._sync_version(data_version)
+            if self._matrix is None:
+                self._rebuild_matrix()
+            if self._matrix is None:
+                self.misses += 1
+                return None
+
+            scores = self._matrix @ query
+            # The most similar entry asked about the same literals, if any does
+            for best in np.argsort(-scores):
+                similarity = float(scores[best])
+                if similarity < self.threshold:
+                    break
+                entry_id = self._matrix_ids[best]
+                entry = self._entries.get(entry_id)
+                if entry is None or self._literals.get(entry_id) != literals:
+                    continue
+                if time.monotonic() - entry[0] >= self.ttl_seconds:
+                    self._drop(entry_id)
+                    continue
+                self._entries.move_to_end(entry_id)
+                self.hits += 1
+                return entry[1], similarity
+
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        embedding: List[float],
+        response: Dict[str, Any],
+        data_version: Optional[int],
+        literals: Tuple[Tuple[str, str], ...] = (),
+    ):
+        if data_version is None:
+            return
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        with self._lock:
+            self._sync_version(data_version)
+            entry_id = self._add(response)
+            self._vectors[entry_id] = vector
+            self._literals[entry_id] = literals
+            self._matrix = None
+
+    def lookup_key(
+        self, key: Hashable, data_version: Optional[int]
+    ) -> Optional[Dict[str, Any]]:
+        """Exact-key lookup; ``key`` must capture everything the answer depends on."""
+        if data_version is None:
+            return None
+        with self._lock:
+            self._sync_version(data_version)
+            entry_id = self._keys.get(key)
+            entry = self._entries.get(entry_id) if entry_id is not None else None
+            if entry and time.monotonic() - entry[0] >= self.ttl_seconds:
+                self._drop(entry_id)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            return entry[1]
+
+    def store_key(
+        self, key: Hashable, response: Dict[str, Any], data_version: Optional[int]
+    ):
+        if data_version is None:
+            return
+        with self._lock:
+            self._sync_version(data_version)
+            if key in self._keys:
+                self._drop(self._keys[key])
+            entry_id = self._add(response)
+            self._keys[key] = entry_id
+            self._key_of[entry_id] = key
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "invalidations": self.invalidations,
+            "data_version": self.data_version,
+        }
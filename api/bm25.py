@@ -0,0 +1,185 @@
+# bm25.py - Incremental BM25 inverted index over call transcripts and summaries
+import array
+import math
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:['.@-][a-z0-9]+)*")
+
+STOPWORDS = frozenset(
+    """a an and are as at be but by can could did do does for from had has have
+    hello hi how i i'm in is it it's me my of on or our so that the their them
+    there they this to was we were what when where which who why will with would
+    you your""".split()
+)
+
+BM25_COLUMNS = (
+    "call_id, agent_id, transcript, summary, sentiment, issue_type, call_timestamp"
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over ``fields`` of each call, built one document at a time.
+
+    Postings are kept per term as two packed arrays (uint32 doc numbers and
+    uint16 term frequencies), roughly 6 bytes per posting. Re-adding a call
+    tombstones its previous document number; tombstones are left out of scoring
+    and document frequencies, and the postings are compacted once they make up
+    more than ``compact_ratio`` of all document numbers.
+    """
+
+    def __init__(
+        self,
+        k1: float = 1.2,
+        b: float = 0.75,
+        fields: Iterable[str] = ("transcript", "summary"),
+        compact_ratio: float = 0.25,
+    ):
+        self.k1 = k1
+        self.b = b
+        self.fields = tuple(fields)
+        self.compact_ratio = compact_ratio
+        self._postings: Dict[str, Tuple[array.array, array.array]] = {}
+        self._doc_lengths = array.array("I")
+        self._doc_ids: List[Optional[str]] = []
+        self._rows: List[Optional[Dict[str, Any]]] = []
+        self._positions: Dict[str, int] = {}
+        self._total_length = 0
+        self._live_docs = 0
+        self._dead_docs = 0
+        self._lock = threading.RLock()
+        self.ready = False
+
+    def __len__(self) -> int:
+        return self._live_docs
+
+    def _remove(self, docnum: int):
+        self._total_length -= self._doc_lengths[docnum]
+        self._doc_lengths[docnum] = 0
+        self._doc_ids[docnum] = None
+        self._rows[docnum] = None
+        self._live_docs -= 1
+        self._dead_docs += 1
+
+    def _compact(self):
+        # Renumber live documents densely and drop tombstoned postings
+        live = [i for i, doc_id in enumerate(self._doc_ids) if doc_id is not None]
+        remap = np.full(len(self._doc_ids), -1, dtype=np.int64)
+        remap[live] = np.arange(len(live))
+        for term, (docs, tfs) in list(self._postings.items()):
+            new_docs = remap[np.frombuffer(docs, dtype=np.uint32)]
+            keep = new_docs >= 0
+            if not keep.any():
+                del self._postings[term]
+                continue
+            self._postings[term] = (
+                array.array("I", new_docs[keep].astype(np.uint32).tobytes()),
+                array.array("H", np.frombuffer(tfs, dtype=np.uint16)[keep].tobytes()),
+            )
+        self._doc_lengths = array.array("I", (self._doc_lengths[i] for i in live))
+        self._doc_ids = [self._doc_ids[i] for i in live]
+        self._rows = [self._rows[i] for i in live]
+        self._positions = {doc_id: n for n, doc_id in enumerate(self._doc_ids)}
+        self._dead_docs = 0
+
+    def add(self, call_id: str, text: str, row: Optional[Dict[str, Any]] = None):
+        tokens = tokenize(text)
+        counts: Dict[str, int] = {}
+        for tok in tokens:
+            counts[tok] = counts.get(tok, 0) + 1
+
+        with self._lock:
+            old = self._positions.get(call_id)
+            if old is not None:
+                self._remove(old)
+                if self._dead_docs > self.compact_ratio * len(self._doc_ids):
+                    self._compact()
+
+            docnum = len(self._doc_ids)
+            self._doc_ids.append(call_id)
+            self._rows.append(row)
+            self._doc_lengths.append(len(tokens))
+            self._positions[call_id] = docnum
+            self._total_length += len(tokens)
+            self._live_docs += 1
+
+            for tok, tf in counts.items():
+                postings = self._postings.get(tok)
+                if postings is None:
+                    postings = (array.array("I"), array.array("H"))
+                    self._postings[tok] = postings
+                postings[0].append(docnum)
+                postings[1].append(min(tf, 65535))
+
+    def add_rows(self, rows: List[Dict[str, Any]]):
+        for row in rows:
+            text = "\n".join(str(row.get(f) or "") for f in self.fields)
+            meta = {k: v for k, v in row.items() if k != "embedding"}
+            self.add(str(row["call_id"]), text, meta)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[Dict[str, Any], float]]:
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._doc_ids)
+            if not terms or not self._live_docs:
+                return []
+            avgdl = self._total_length / self._live_docs
+            lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32)[:n_docs]
+            norm = self.k1 * (1 - self.b + self.b * lengths / avgdl)
+            scores = np.zeros(n_docs, dtype=np.float32)
+
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                docs = np.frombuffer(postings[0], dtype=np.uint32)
+                tfs = np.frombuffer(postings[1], dtype=np.uint16).astype(np.float32)
+                if self._dead_docs:
+                    # Tombstoned documents have length 0, posted live ones at least 1
+                    live = lengths[docs] > 0
+                    docs, tfs = docs[live], tfs[live]
+                df = len(docs)
+                idf = math.log(1 + (self._live_docs - df + 0.5) / (df + 0.5))
+                scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm[docs])
+
+            k = min(k, n_docs)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                (self._rows[i] or {"call_id": self._doc_ids[i]}, float(scores[i]))
+                for i in top.tolist()
+                if scores[i] > 0
+            ]
+
+    def stats(self) -> Dict[str, Any]:
+        postings = sum(len(docs) for docs, _ in self._postings.values())
+        return {
+            "ready": self.ready,
+            "documents": self._live_docs,
+            "tombstones": self._dead_docs,
+            "terms": len(self._postings),
+            "postings": postings,
+            "postings_bytes": postings * 6,
+        }
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: List[List[Dict[str, Any]]], k: int = 60, limit: int = 5
+) -> List[Dict[str, Any]]:
+    """Fuse ranked row lists by summing 1 / (k + rank) per call_id."""
+    fused: Dict[str, Dict[str, Any]] = {}
+    scores: Dict[str, float] = {}
+    for ranked in ranked_lists:
+        for rank, row in enumerate(ranked, start=1):
+            call_id = str(row["call_id"])
+            scores[call_id] = scores.get(call_id, 0.0) + 1.0 / (k + rank)
+            fused[call_id] = {**row, **fused.get(call_id, {})}
+    ordered = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [{**fused[cid], "rrf_score": round(scores[cid], 6)} for cid in ordered]
@@ -0,0 +1,103 @@
+# clients.py - Registry of upstream clients shared for the life of the process
+import functools
+import inspect
+import ssl
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import certifi
+import httpx
+
+
+@functools.lru_cache(maxsize=None)
+def shared_ssl_context() -> ssl.SSLContext:
+    # Loading the CA bundle is most of the cost of creating an HTTP client, so
+    # every client verifies with this one context
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+def pool_limits(max_connections: int, keepalive_expiry: float) -> httpx.Limits:
+    # Keep as many idle connections as there can be concurrent requests, so a
+    # burst after a quiet spell does not pay for new TLS handshakes
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+
+
+class ClientRegistry:
+    """Named clients, each built on first use and closed at shutdown.
+
+    A client registered with ``per_thread=True`` gets one instance per thread,
+    for libraries whose connections must not be shared between threads.
+    Factories run once per client (or thread) even under concurrent first use.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Tuple[Callable[[], Any], Optional[Callable]]] = {}
+        self._clients: Dict[str, Any] = {}
+        self._thread_clients: Dict[str, threading.local] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        # Everything built here (not set from outside), in build order
+        self._built: List[Tuple[str, Any]] = []
+
+    def register(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        close: Optional[Callable[[Any], Any]] = None,
+        per_thread: bool = False,
+    ):
+        self._factories[name] = (factory, close)
+        self._locks[name] = threading.Lock()
+        if per_thread:
+            self._thread_clients[name] = threading.local()
+
+    def get(self, name: str) -> Any:
+        local = self._thread_clients.get(name)
+        if local is not None:
+            client = getattr(local, "client", None)
+            if client is None:
+                client = local.client = self._build(name)
+            return client
+        client = self._clients.get(name)
+        if client is None:
+            with self._locks[name]:
+                client = self._clients.get(name)
+                if client is None:
+                    client = self._clients[name] = self._build(name)
+        return client
+
+    def set(self, name: str, client: Any):
+        """Use ``client`` instead of building one; it is not closed at shutdown."""
+        self._clients[name] = client
+
+    def _build(self, name: str) -> Any:
+        factory, _ = self._factories[name]
+        client = factory()
+        self._built.append((name, client))
+        return client
+
+    def stats(self) -> Dict[str, int]:
+        built: Dict[str, int] = {}
+        for name, _ in self._built:
+            built[name] = built.get(name, 0) + 1
+        return built
+
+    async def aclose(self):
+        # Newest first: later clients may depend on earlier ones
+        for name, client in reversed(self._built):
+            _, close = self._factories[name]
+            if close is None:
+                continue
+            try:
+                result = close(client)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"Error closing {name} client: {e}")
+        self._built.clear()
+        self._clients.clear()
+        for name in self._thread_clients:
+            self._thread_clients[name] = threading.local()
@@ -0,0 +1,135 @@
+# context_packing.py - Token-budgeted packing of retrieved calls into a RAG prompt
+import json
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+from bm25 import tokenize
+
+try:
+    import tiktoken
+
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # optional; fall back to a ~4 chars/token estimate
+    _ENCODING = None
+
+# Fields carried into the prompt; everything else (embedding, scores) is dropped
+PACKED_FIELDS = (
+    "call_id",
+    "agent_id",
+    "call_timestamp",
+    "issue_type",
+    "sentiment",
+    "summary",
+)
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def count_tokens(text: str) -> int:
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def split_transcript(transcript: str) -> List[str]:
+    # Speaker turns are separated by blank lines; split long turns into sentences
+    sentences = []
+    for turn in transcript.split("\n\n"):
+        sentences.extend(s.strip() for s in _SENTENCE_RE.split(turn) if s.strip())
+    return sentences
+
+
+def _serialize(doc: Dict[str, Any]) -> str:
+    return json.dumps(doc, separators=(",", ":"), ensure_ascii=False)
+
+
+def pack_context(
+    question: str,
+    docs: List[Dict[str, Any]],
+    token_budget: int = 1500,
+    window: int = 1,
+) -> Tuple[str, Dict[str, Any]]:
+    """Serialize ``docs`` compactly, keeping only query-relevant transcript text.
+
+    Each call keeps its metadata plus the best-scoring transcript sentences
+    (with ``window`` neighbouring sentences for context) until its rank-weighted
+    share of ``token_budget`` is spent; unused budget rolls over to later calls.
+    Returns the packed text and a token usage report.
+    """
+    original_tokens = count_tokens(
+        "\n\n---\n\n".join(json.dumps(doc, indent=2, default=str) for doc in docs)
+    )
+    query_terms = set(tokenize(question))
+
+    # Chunk-level retrieval returns only the matched chunks instead of a transcript
+    split_docs = [
+        split_transcript(
+            doc.get("transcript") or "\n\n".join(doc.get("matched_chunks") or [])
+        )
+        for doc in docs
+    ]
+    sentence_freq = Counter(
+        tok for sentences in split_docs for s in sentences for tok in set(tokenize(s))
+    )
+    n_sentences = sum(len(sentences) for sentences in split_docs) or 1
+
+    def score(sentence: str) -> float:
+        counts = Counter(tokenize(sentence))
+        return sum(
+            (1 + math.log(counts[t])) * math.log(1 + n_sentences / sentence_freq[t])
+            for t in query_terms
+            if counts[t]
+        )
+
+    packed, used = [], 0
+    for rank, (doc, sentences) in enumerate(zip(docs, split_docs)):
+        meta = {k: doc[k] for k in PACKED_FIELDS if doc.get(k) is not None}
+        meta_tokens = count_tokens(_serialize(meta))
+        # Higher-ranked calls get a larger share of what is left of the budget
+        weights = [1.0 / (r + 1) for r in range(rank, len(docs))]
+        share = int((token_budget - used) * weights[0] / sum(weights))
+        remaining = share - meta_tokens
+        if remaining < 0 and packed:
+            break
+
+        ranked = sorted(range(len(sentences)), key=lambda i: (-score(sentences[i]), i))
+        chosen = set()
+        for i in ranked:
+            if not query_terms & set(tokenize(sentences[i])) and chosen:
+                break
+            window_ids = [
+                j
+                for j in range(max(0, i - window), min(len(sentences), i + window + 1))
+                if j not in chosen
+            ]
+            cost = sum(count_tokens(sentences[j]) + 1 for j in window_ids)
+            if cost > remaining:
+                continue
+            chosen.update(window_ids)
+            remaining -= cost
+
+        # Keep transcript order and mark gaps so the model sees excerpts as such
+        excerpts, previous = [], None
+        for j in sorted(chosen):
+            if previous is not None and j != previous + 1:
+                excerpts.append("...")
+            excerpts.append(sentences[j])
+            previous = j
+        if excerpts:
+            meta["transcript_excerpts"] = excerpts
+
+        line = _serialize(meta)
+        packed.append(line)
+        used += count_tokens(line)
+
+    text = "\n".join(packed)
+    return text, {
+        "token_budget": token_budget,
+        "tokens_used": used,
+        "tokens_original": original_tokens,
+        "tokens_saved": max(original_tokens - used, 0),
+        "calls_packed": len(packed),
+        "calls_retrieved": len(docs),
+    }
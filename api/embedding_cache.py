@@ -0,0 +1,193 @@
+# embedding_cache.py - Two-tier query embedding cache (in-process LRU + SQLite)
+import array
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def cache_key(text: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode()).hexdigest()
+
+
+def pack_vector(vector: List[float]) -> bytes:
+    return array.array("f", vector).tobytes()
+
+
+def unpack_vector(blob: bytes) -> List[float]:
+    values = array.array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """LRU + TTL memory tier in front of a persistent SQLite tier.
+
+    Vectors are stored as packed float32 bytes in both tiers. Pass ``path=None``
+    to run memory-only. The disk tier keeps at most ``disk_max_entries`` rows,
+    none older than ``disk_ttl_seconds``; it is pruned every ``prune_every``
+    writes. ``get_memory`` never touches the disk, so async callers can run
+    ``get_disk`` and ``put_disk`` in a worker thread.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = "embedding_cache.sqlite3",
+        max_entries: int = 10000,
+        ttl_seconds: float = 24 * 3600,
+        disk_max_entries: int = 200000,
+        disk_ttl_seconds: float = 30 * 24 * 3600,
+        prune_every: int = 500,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_max_entries = disk_max_entries
+        self.disk_ttl_seconds = disk_ttl_seconds
+        self.prune_every = prune_every
+        self._memory: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.pruned = 0
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    dims INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_created_at "
+                "ON embeddings (created_at)"
+            )
+            self._db.commit()
+            self.prune()
+
+    @property
+    def persistent(self) -> bool:
+        return self._db is not None
+
+    def _remember(self, key: str, blob: bytes):
+        self._memory[key] = (time.monotonic(), blob)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_memory(self, text: str, model: str) -> Optional[List[float]]:
+        """Memory tier only; a miss is not counted until ``get_disk`` has run."""
+        key = cache_key(text, model)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and time.monotonic() - entry[0] < self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return unpack_vector(entry[1])
+            if entry:
+                del self._memory[key]
+            if self._db is None:
+                self.misses += 1
+            return None
+
+    def get_disk(self, text: str, model: str) -> Optional[List[float]]:
+        """Disk tier only (blocking); a hit is promoted to the memory tier."""
+        if self._db is None:
+            return None
+        key = cache_key(text, model)
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT vector FROM embeddings WHERE key = ? AND created_at >= ?",
+                (key, time.time() - self.disk_ttl_seconds),
+            ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self._remember(key, row[0])
+            self.disk_hits += 1
+        return unpack_vector(row[0])
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        vector = self.get_memory(text, model)
+        if vector is None:
+            vector = self.get_disk(text, model)
+        return vector
+
+    def put_memory(self, text: str, model: str, vector: List[float]):
+        with self._lock:
+            self._remember(cache_key(text, model), pack_vector(vector))
+
+    def put_disk(self, text: str, model: str, vector: List[float]):
+        """Write to the disk tier (blocking), pruning it every ``prune_every`` writes."""
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)",
+                (
+                    cache_key(text, model),
+                    model,
+                    len(vector),
+                    pack_vector(vector),
+                    time.time(),
+                ),
+            )
+            self._db.commit()
+            self._writes += 1
+            due = self._writes % self.prune_every == 0
+        if due:
+            self.prune()
+
+    def put(self, text: str, model: str, vector: List[float]):
+        self.put_memory(text, model, vector)
+        self.put_disk(text, model, vector)
+
+    def prune(self):
+        """Drop expired disk rows, then the oldest beyond ``disk_max_entries``."""
+        if self._db is None:
+            return
+        with self._db_lock:
+            expired = self._db.execute(
+                "DELETE FROM embeddings WHERE created_at < ?",
+                (time.time() - self.disk_ttl_seconds,),
+            ).rowcount
+            overflow = self._db.execute(
+                """
+                DELETE FROM embeddings WHERE key IN (
+                    SELECT key FROM embeddings ORDER BY created_at DESC
+                    LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.disk_max_entries,),
+            ).rowcount
+            self._db.commit()
+            self.pruned += expired + overflow
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hits = self.memory_hits + self.disk_hits
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_pruned": self.pruned,
+        }
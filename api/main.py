@@ -1,26 +1,77 @@
 # main.py - FastAPI Call Center RAG Backend with SQL + RAG hybrid
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator, Tuple
+import httpx
 import openai
 import os
-from datetime import datetime, timedelta
-from supabase import create_client, Client
+from datetime import date, datetime, timedelta
+from supabase import create_client, Client, ClientOptions
 import asyncio
+import base64
+import functools
+import hashlib
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import json
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import time
+import uuid
+from router import LocalRouter, MODES
+from clients import ClientRegistry, pool_limits, shared_ssl_context
+from embedding_cache import EmbeddingCache, normalize_text
+from answer_cache import SemanticAnswerCache
+from vector_index import VectorIndex, MIRROR_COLUMNS
+from bm25 import BM25Index, BM25_COLUMNS, reciprocal_rank_fusion
+from context_packing import pack_context
+from sql_templates import (
+    SQLTemplateStore,
+    extract_slots,
+    mentions_relative_date,
+    question_shape,
+)
+from sql_guard import SQLGuardError, guard_sql
+from result_shaping import shape_result
+from single_flight import SingleFlight
+from telemetry import (
+    TimingMiddleware,
+    current_trace,
+    metrics,
+    record_tokens,
+    span,
+    upstream_call,
+)
 
 # Load environment variables from .env file
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = []
+    if VECTOR_INDEX_ENABLED or HYBRID_SEARCH_ENABLED:
+        tasks.append(asyncio.create_task(call_mirror_sync_loop()))
+    # Opens the first Supabase connection before any request needs it
+    tasks.append(asyncio.create_task(get_data_version()))
+    yield
+    for task in tasks:
+        task.cancel()
+    await clients.aclose()
+
+
 # Initialize FastAPI
 app = FastAPI(
     title="Call Center RAG API",
     description="RAG system for call center transcript analysis",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS configuration
@@ -30,6 +81,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Timing"],
 )
 
 # Environment variables
@@ -38,16 +90,239 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_KEY")
 GOOGLE_CALENDAR_CREDENTIALS = os.getenv("GOOGLE_CALENDAR_CREDENTIALS")
 CAL_ID = os.getenv("CALENDAR_ID")
+CALENDAR_SCOPES = ["https://www.googleapis.com/auth/calendar"]
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.7"))
+EMBEDDING_MODEL = "text-embedding-ada-002"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", str(24 * 3600)))
+EMBEDDING_CACHE_DISK_SIZE = int(os.getenv("EMBEDDING_CACHE_DISK_SIZE", "200000"))
+EMBEDDING_CACHE_DISK_TTL = float(
+    os.getenv("EMBEDDING_CACHE_DISK_TTL", str(30 * 24 * 3600))
+)
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+DATA_VERSION_TTL = float(os.getenv("DATA_VERSION_TTL", "5"))
+RAG_MATCH_THRESHOLD = float(os.getenv("RAG_MATCH_THRESHOLD", "0.7"))
+VECTOR_INDEX_ENABLED = os.getenv("VECTOR_INDEX_ENABLED", "false").lower() == "true"
+VECTOR_INDEX_HNSW_THRESHOLD = int(os.getenv("VECTOR_INDEX_HNSW_THRESHOLD", "50000"))
+VECTOR_INDEX_EF_SEARCH = int(os.getenv("VECTOR_INDEX_EF_SEARCH", "64"))
+VECTOR_INDEX_PAGE_SIZE = int(os.getenv("VECTOR_INDEX_PAGE_SIZE", "500"))
+VECTOR_INDEX_SYNC_INTERVAL = float(os.getenv("VECTOR_INDEX_SYNC_INTERVAL", "60"))
+# Each mirror sync re-reads this many seconds before the last row it saw: a row is
+# stamped when written but only visible once its transaction commits
+VECTOR_INDEX_SYNC_OVERLAP = float(os.getenv("VECTOR_INDEX_SYNC_OVERLAP", "120"))
+# Compact embedding tier: candidates by Hamming distance over 1-bit sign codes (the
+# embedding_bits column, or codes in the mirror), re-ranked with full vectors. The
+# mirror can keep its re-rank vectors as float16; scanning those without the binary
+# prefilter is slower than float32
+QUANTIZED_SEARCH_ENABLED = (
+    os.getenv("QUANTIZED_SEARCH_ENABLED", "false").lower() == "true"
+)
+QUANTIZED_RERANK_FACTOR = int(os.getenv("QUANTIZED_RERANK_FACTOR", "8"))
+VECTOR_INDEX_DTYPE = os.getenv("VECTOR_INDEX_DTYPE", "float32")
+# Candidate list size for filtered HNSW searches in Postgres: higher is slower but
+# finds more of the true nearest calls
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "100"))
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "false").lower() == "true"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "1500"))
+# "call" searches whole-transcript embeddings, "chunk" searches fact_call_chunks
+RAG_RETRIEVAL_UNIT = os.getenv("RAG_RETRIEVAL_UNIT", "call")
+CHUNK_POOLING = os.getenv("CHUNK_POOLING", "max")
+CHUNK_CANDIDATES_PER_CALL = int(os.getenv("CHUNK_CANDIDATES_PER_CALL", "4"))
+SQL_TEMPLATE_CACHE_SIZE = int(os.getenv("SQL_TEMPLATE_CACHE_SIZE", "256"))
+SQL_TEMPLATE_MIN_SIMILARITY = float(os.getenv("SQL_TEMPLATE_MIN_SIMILARITY", "0.6"))
+# Guardrails for generated SQL: row cap, retry cap when over budget, planner cost
+# ceiling and how long to wait for the database
+SQL_GUARD_MAX_ROWS = int(os.getenv("SQL_GUARD_MAX_ROWS", "5000"))
+SQL_GUARD_FALLBACK_ROWS = int(os.getenv("SQL_GUARD_FALLBACK_ROWS", "20"))
+SQL_GUARD_MAX_COST = float(os.getenv("SQL_GUARD_MAX_COST", "100000"))
+SQL_GUARD_TIMEOUT = float(os.getenv("SQL_GUARD_TIMEOUT", "5"))
+# Share one upstream call between concurrent identical requests
+COALESCING_ENABLED = os.getenv("COALESCING_ENABLED", "true").lower() == "true"
+# Results larger than this are summarized locally before the answer prompt
+SQL_RESULT_TOKEN_BUDGET = int(os.getenv("SQL_RESULT_TOKEN_BUDGET", "800"))
+# Upper bound on dashboard staleness; a data version change invalidates it sooner
+DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "300"))
+
+# Upstream concurrency limits and timeouts (seconds)
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "64"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+SUPABASE_MAX_CONCURRENCY = int(os.getenv("SUPABASE_MAX_CONCURRENCY", "16"))
+CALENDAR_TIMEOUT = float(os.getenv("CALENDAR_TIMEOUT", "15"))
+CALENDAR_MAX_CONCURRENCY = int(os.getenv("CALENDAR_MAX_CONCURRENCY", "4"))
+# How long idle upstream connections are kept open for reuse (seconds)
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+# Send the stage breakdown on every response, not only when asked with X-Timing
+TIMING_HEADERS = os.getenv("TIMING_HEADERS", "false").lower() == "true"
+
+app.add_middleware(TimingMiddleware, always=TIMING_HEADERS, skip_paths=("/metrics",))
+
 
 # Initialize clients
-openai_client = openai.OpenAI(api_key=OPENAI_API_KEY)
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+def build_openai_client() -> openai.AsyncOpenAI:
+    return openai.AsyncOpenAI(
+        api_key=OPENAI_API_KEY,
+        timeout=OPENAI_TIMEOUT,
+        max_retries=OPENAI_MAX_RETRIES,
+        http_client=openai.DefaultAsyncHttpxClient(
+            limits=pool_limits(OPENAI_MAX_CONCURRENCY, HTTP_KEEPALIVE_EXPIRY),
+            verify=shared_ssl_context(),
+        ),
+    )
+
+
+def build_supabase_client() -> Client:
+    # One keep-alive pool shared by every worker thread
+    http_client = httpx.Client(
+        limits=pool_limits(SUPABASE_MAX_CONCURRENCY, HTTP_KEEPALIVE_EXPIRY),
+        timeout=SUPABASE_TIMEOUT,
+        verify=shared_ssl_context(),
+        follow_redirects=True,
+        http2=True,
+    )
+    return create_client(
+        SUPABASE_URL, SUPABASE_ANON_KEY, options=ClientOptions(httpx_client=http_client)
+    )
+
+
+# The Google client libraries are imported on first use: most processes never
+# schedule anything and they take ~100 ms to import.
+def load_calendar_credentials():
+    from google.oauth2 import service_account
+
+    return service_account.Credentials.from_service_account_file(
+        GOOGLE_CALENDAR_CREDENTIALS, scopes=CALENDAR_SCOPES
+    )
+
+
+def build_calendar_service():
+    from googleapiclient.discovery import build
+
+    credentials = clients.get("calendar_credentials")
+    return build("calendar", "v3", credentials=credentials, cache_discovery=False)
+
+
+def build_calendar_http():
+    # httplib2 connections are not thread-safe, so each worker thread gets its own;
+    # the credentials (and their access token) are shared
+    import google_auth_httplib2
+    import httplib2
+
+    return google_auth_httplib2.AuthorizedHttp(
+        clients.get("calendar_credentials"),
+        http=httplib2.Http(timeout=CALENDAR_TIMEOUT),
+    )
+
+
+clients = ClientRegistry()
+clients.register("openai", build_openai_client, close=lambda c: c.close())
+clients.register(
+    "supabase", build_supabase_client, close=lambda c: c.options.httpx_client.close()
+)
+clients.register("calendar_credentials", load_calendar_credentials)
+clients.register("calendar", build_calendar_service, close=lambda c: c.close())
+clients.register(
+    "calendar_http", build_calendar_http, close=lambda c: c.close(), per_thread=True
+)
+openai_client = clients.get("openai")
+supabase: Client = clients.get("supabase")
+
+# The Supabase and Google clients are synchronous, so their calls run on a
+# dedicated thread pool sized to the upstream limits instead of on the event loop.
+blocking_executor = ThreadPoolExecutor(
+    max_workers=SUPABASE_MAX_CONCURRENCY + CALENDAR_MAX_CONCURRENCY,
+    thread_name_prefix="upstream",
+)
+openai_limiter = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+supabase_limiter = asyncio.Semaphore(SUPABASE_MAX_CONCURRENCY)
+calendar_limiter = asyncio.Semaphore(CALENDAR_MAX_CONCURRENCY)
+
+local_router = LocalRouter(min_confidence=ROUTER_MIN_CONFIDENCE)
+embedding_cache = EmbeddingCache(
+    path=EMBEDDING_CACHE_PATH or None,
+    max_entries=EMBEDDING_CACHE_SIZE,
+    ttl_seconds=EMBEDDING_CACHE_TTL,
+    disk_max_entries=EMBEDDING_CACHE_DISK_SIZE,
+    disk_ttl_seconds=EMBEDDING_CACHE_DISK_TTL,
+)
+answer_cache = SemanticAnswerCache(
+    threshold=ANSWER_CACHE_THRESHOLD,
+    max_entries=ANSWER_CACHE_SIZE,
+    ttl_seconds=ANSWER_CACHE_TTL,
+)
+data_version_state: Dict[str, Any] = {"version": None, "checked_at": 0.0}
+
+
+def new_vector_index() -> VectorIndex:
+    return VectorIndex(
+        hnsw_threshold=VECTOR_INDEX_HNSW_THRESHOLD,
+        ef_search=VECTOR_INDEX_EF_SEARCH,
+        dtype=VECTOR_INDEX_DTYPE,
+        binary_prefilter=QUANTIZED_SEARCH_ENABLED,
+        rerank_factor=QUANTIZED_RERANK_FACTOR,
+    )
+
+
+vector_index = new_vector_index()
+bm25_index = BM25Index()
+sql_templates = SQLTemplateStore(
+    max_entries=SQL_TEMPLATE_CACHE_SIZE, min_similarity=SQL_TEMPLATE_MIN_SIMILARITY
+)
+# Sync position of the local indexes: updated_at of the last row pulled, the calls
+# they hold, and the data version their deletes were last checked at
+mirror_state: Dict[str, Any] = {
+    "synced_through": None,
+    "call_ids": set(),
+    "checked_version": None,
+}
+dashboard_state: Dict[str, Any] = {
+    "payload": None,
+    "etag": None,
+    "version": None,
+    "built_at": 0.0,
+    "hits": 0,
+    "misses": 0,
+    "not_modified": 0,
+}
+dashboard_lock = asyncio.Lock()
+single_flight = SingleFlight(enabled=COALESCING_ENABLED)
+
+# KPI functions behind the dashboard and analytics pages (see supabase_functions/)
+DASHBOARD_RPCS = (
+    "get_call_summary",
+    "get_weekday_call_counts",
+    "get_issue_counts",
+    "get_issue_distribution",
+    "get_daily_resolution_status",
+    "get_daily_sentiment_pct",
+    "get_call_center_metrics",
+)
 
 
 # Pydantic models
+class SearchFilters(BaseModel):
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    agent_id: Optional[str] = None
+    issue_type: Optional[str] = None
+    sentiment: Optional[str] = None
+    resolved: Optional[bool] = None
+
+
 class ChatRequest(BaseModel):
     question: str
     conversation_history: Optional[List[Dict[str, str]]] = []
+    # Narrow transcript retrieval (RAG answers); SQL answers ignore them
+    filters: Optional[SearchFilters] = None
+
+    def active_filters(self) -> Dict[str, Any]:
+        return self.filters.dict(exclude_none=True) if self.filters else {}
 
 
 class ChatResponse(BaseModel):
@@ -55,6 +330,8 @@ class ChatResponse(BaseModel):
     sources: List[Dict[str, Any]] = []
     context_used: List[str] = []
     timestamp: str
+    metadata: Dict[str, Any] = {}
+    cached: bool = False
 
 
 class CallSource(BaseModel):
@@ -67,8 +344,109 @@ class CallSource(BaseModel):
     similarity: float
 
 
+def transcript_preview(call: Dict[str, Any], length: int = 200) -> str:
+    text = call.get("transcript") or " ".join(call.get("matched_chunks", []))
+    return text[:length] + "..."
+
+
+# --- Upstream Helpers ---
+async def chat_completion(**kwargs):
+    async with openai_limiter:
+        with upstream_call("openai_chat"):
+            response = await openai_client.chat.completions.create(**kwargs)
+    record_tokens(response.usage)
+    return response
+
+
+async def stream_completion(
+    prompt: str, temperature: float, model: str = "gpt-3.5-turbo"
+) -> AsyncIterator[str]:
+    # The limiter slot is held for the lifetime of the stream
+    async with openai_limiter:
+        with upstream_call("openai_chat"):
+            stream = await openai_client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                stream=True,
+                # Token usage arrives in a final chunk without choices
+                stream_options={"include_usage": True},
+            )
+            async for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    record_tokens(chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+
+async def create_embedding(**kwargs):
+    async with openai_limiter:
+        with upstream_call("openai_embeddings"):
+            response = await openai_client.embeddings.create(**kwargs)
+    record_tokens(response.usage)
+    return response
+
+
+async def run_blocking(
+    fn, *args, limiter: asyncio.Semaphore, timeout: float, upstream: str, **kwargs
+):
+    async with limiter:
+        loop = asyncio.get_running_loop()
+        try:
+            with upstream_call(upstream.lower().replace(" ", "_")):
+                return await asyncio.wait_for(
+                    loop.run_in_executor(
+                        blocking_executor, functools.partial(fn, *args, **kwargs)
+                    ),
+                    timeout=timeout,
+                )
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=504, detail=f"{upstream} request timed out"
+            )
+
+
+async def execute_supabase(query, timeout: float = SUPABASE_TIMEOUT):
+    return await run_blocking(
+        query.execute,
+        limiter=supabase_limiter,
+        timeout=timeout,
+        upstream="Supabase",
+    )
+
+
+async def get_data_version() -> Optional[int]:
+    # fact_calls version counter, bumped by a trigger on every write
+    now = time.monotonic()
+    if now - data_version_state["checked_at"] < DATA_VERSION_TTL:
+        return data_version_state["version"]
+    try:
+        with span("data_version"):
+            response = await execute_supabase(supabase.rpc("get_data_version", {}))
+        version = response.data
+    except Exception as e:
+        print(f"Data version error: {e}")
+        version = None
+    data_version_state.update(version=version, checked_at=now)
+    return version
+
+
 # --- Prompt Classifier ---
-async def classify_prompt(prompt: str) -> str:
+async def classify_prompt(
+    prompt: str, decision: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    start = time.perf_counter()
+    with span("classify"):
+        decision = dict(decision or local_router.route(prompt))
+        if not decision["confident"]:
+            decision["local_mode"] = decision["mode"]
+            decision["mode"] = await classify_prompt_llm(prompt)
+            decision["path"] = "llm"
+    decision["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return decision
+
+
+async def classify_prompt_llm(prompt: str) -> str:
     guide = f"""
 You are a classifier. Return one word only: "sql", "rag", or "schedule".
 
@@ -81,25 +459,56 @@ Prompt: "{prompt}"
 
 Classification:
 """
-    response = openai_client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[{"role": "user", "content": guide}],
-        temperature=0,
+    response = await single_flight.do(
+        "classify",
+        normalize_text(prompt),
+        lambda: chat_completion(
+            model="gpt-3.5-turbo",
+            messages=[{"role": "user", "content": guide}],
+            temperature=0,
+        ),
     )
-    return response.choices[0].message.content.strip().lower()
+    mode = response.choices[0].message.content.strip().strip('".').lower()
+    return mode if mode in MODES else "rag"
 
 
 # --- RAG Helpers ---
 async def get_embedding(text: str) -> List[float]:
+    cached = embedding_cache.get_memory(text, EMBEDDING_MODEL)
+    if cached is None and embedding_cache.persistent:
+        # SQLite reads and commits block, so they stay off the event loop
+        try:
+            cached = await asyncio.to_thread(
+                embedding_cache.get_disk, text, EMBEDDING_MODEL
+            )
+        except Exception as e:
+            print(f"Embedding cache read error: {e}")
+    if cached is not None:
+        return cached
     try:
-        response = openai_client.embeddings.create(
-            model="text-embedding-ada-002", input=text.strip()
-        )
-        return response.data[0].embedding
+        with span("embedding"):
+            # Keyed like the cache, so waiters get what the cache will hold
+            response = await single_flight.do(
+                "embedding",
+                normalize_text(text),
+                lambda: create_embedding(model=EMBEDDING_MODEL, input=text.strip()),
+            )
+        embedding = response.data[0].embedding
     except Exception as e:
         print(f"Embedding error: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate embedding")
 
+    embedding_cache.put_memory(text, EMBEDDING_MODEL, embedding)
+    if embedding_cache.persistent:
+        # A locked or full cache file must not fail a request that has its embedding
+        try:
+            await asyncio.to_thread(
+                embedding_cache.put_disk, text, EMBEDDING_MODEL, embedding
+            )
+        except Exception as e:
+            print(f"Embedding cache write error: {e}")
+    return embedding
+
 
 async def extract_datetime_from_prompt(prompt: str) -> Optional[datetime]:
     guide = f"""
@@ -120,7 +529,7 @@ Prompt: "{prompt}"
 
 Extracted datetime:
 """
-    response = openai_client.chat.completions.create(
+    response = await chat_completion(
         model="gpt-3.5-turbo",
         messages=[{"role": "user", "content": guide}],
         temperature=0,
@@ -150,7 +559,7 @@ Prompt: "{prompt}"
 
 Meeting title:
 """
-    response = openai_client.chat.completions.create(
+    response = await chat_completion(
         model="gpt-3.5-turbo",
         messages=[{"role": "user", "content": guide}],
         temperature=0,
@@ -159,37 +568,238 @@ Meeting title:
 
 
 async def search_call_database(
-    query_embedding: List[float], limit: int = 5
+    query_embedding: List[float],
+    limit: int = 5,
+    question: Optional[str] = None,
+    filters: Optional[Dict[str, Any]] = None,
+) -> List[Dict]:
+    async def search() -> List[Dict]:
+        if filters:
+            # The local mirror, BM25 index and chunk table hold no filter columns
+            return await filtered_search(
+                query_embedding, limit, RAG_MATCH_THRESHOLD, filters
+            )
+        if HYBRID_SEARCH_ENABLED and bm25_index.ready and question:
+            return await hybrid_search(question, query_embedding, limit)
+        return await vector_search(query_embedding, limit, RAG_MATCH_THRESHOLD)
+
+    # The question determines the embedding, so it is the cheaper key
+    key = normalize_text(question) if question else hash(tuple(query_embedding))
+    filter_key = tuple(sorted((filters or {}).items()))
+    with span("search"):
+        return await single_flight.do("search", (key, limit, filter_key), search)
+
+
+async def vector_search(
+    query_embedding: List[float], limit: int, threshold: float
+) -> List[Dict]:
+    if RAG_RETRIEVAL_UNIT == "chunk":
+        return await search_call_chunks(query_embedding, limit, threshold)
+    if vector_index.ready:
+        return vector_index.search(query_embedding, k=limit, threshold=threshold)
+    return await search_similar_calls_rpc(query_embedding, limit, threshold)
+
+
+async def search_similar_calls_rpc(
+    query_embedding: List[float], limit: int, threshold: float
 ) -> List[Dict]:
+    function = "search_similar_calls"
+    params = {
+        "query_embedding": query_embedding,
+        "match_threshold": threshold,
+        "match_count": limit,
+    }
+    if QUANTIZED_SEARCH_ENABLED:
+        function = "search_similar_calls_quantized"
+        params["candidate_count"] = limit * QUANTIZED_RERANK_FACTOR
     try:
-        response = supabase.rpc(
-            "search_similar_calls",
-            {
-                "query_embedding": query_embedding,
-                "match_threshold": 0.7,
-                "match_count": limit,
-            },
-        ).execute()
+        response = await execute_supabase(supabase.rpc(function, params))
         return response.data if response.data else []
     except Exception as e:
         print(f"Search error: {e}")
         return []
 
 
-def schedule_call_event(
-    start_dt: datetime, summary="Call with agent", timezone="America/New_York"
-):
-    from google.oauth2 import service_account
-    from googleapiclient.discovery import build
+async def filtered_search(
+    query_embedding: List[float],
+    limit: int,
+    threshold: float,
+    filters: Dict[str, Any],
+) -> List[Dict]:
+    params = {
+        "query_embedding": query_embedding,
+        "match_threshold": threshold,
+        "match_count": limit,
+        "ef_search": HNSW_EF_SEARCH,
+    }
+    for name, value in filters.items():
+        if isinstance(value, date):
+            value = value.isoformat()
+        params[f"filter_{name}"] = value
+    try:
+        response = await execute_supabase(
+            supabase.rpc("search_similar_calls_filtered", params)
+        )
+        return response.data if response.data else []
+    except HTTPException:
+        raise
+    except Exception as e:
+        # An empty list would read as "no matching calls"; a failure must not
+        print(f"Filtered search error: {e}")
+        raise HTTPException(status_code=502, detail=f"Filtered search failed: {e}")
+
+
+async def search_call_chunks(
+    query_embedding: List[float], limit: int, threshold: float
+) -> List[Dict]:
+    try:
+        response = await execute_supabase(
+            supabase.rpc(
+                "search_similar_chunks",
+                {
+                    "query_embedding": query_embedding,
+                    "match_threshold": threshold,
+                    "match_count": limit * CHUNK_CANDIDATES_PER_CALL,
+                },
+            )
+        )
+    except Exception as e:
+        print(f"Chunk search error: {e}")
+        return []
+
+    # Pool chunk hits back to their calls (max or sum of chunk similarities)
+    calls: Dict[str, Dict[str, Any]] = {}
+    for hit in response.data or []:
+        call = calls.get(hit["call_id"])
+        if call is None:
+            call = {
+                k: v for k, v in hit.items() if k not in ("chunk_index", "content")
+            }
+            call.update(pooled_score=0.0, chunks=[])
+            calls[hit["call_id"]] = call
+        call["similarity"] = max(call["similarity"], hit["similarity"])
+        if CHUNK_POOLING == "sum":
+            call["pooled_score"] += hit["similarity"]
+        else:
+            call["pooled_score"] = call["similarity"]
+        call["chunks"].append((hit["chunk_index"], hit["content"]))
+
+    ranked = sorted(calls.values(), key=lambda c: c["pooled_score"], reverse=True)
+    for call in ranked:
+        call["matched_chunks"] = [content for _, content in sorted(call.pop("chunks"))]
+    return ranked[:limit]
 
-    SERVICE_ACCOUNT_FILE = GOOGLE_CALENDAR_CREDENTIALS
-    CALENDAR_ID = CAL_ID
-    SCOPES = ["https://www.googleapis.com/auth/calendar"]
 
-    credentials = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=SCOPES
+async def hybrid_search(
+    question: str, query_embedding: List[float], limit: int
+) -> List[Dict]:
+    # Rank fusion only needs orderings, so the vector side skips the threshold
+    vector_hits = await vector_search(query_embedding, HYBRID_CANDIDATES, -1.0)
+    keyword_hits = [
+        {**row, "bm25_score": round(score, 4)}
+        for row, score in bm25_index.search(question, k=HYBRID_CANDIDATES)
+    ]
+    return reciprocal_rank_fusion(
+        [vector_hits, keyword_hits], k=HYBRID_RRF_K, limit=limit
+    )
+
+
+# --- Local Call Mirror (vector + BM25 indexes) ---
+def index_mirror_rows(rows: List[Dict[str, Any]], vector: VectorIndex, bm25: BM25Index):
+    if VECTOR_INDEX_ENABLED:
+        vector.add_rows(rows)
+    if HYBRID_SEARCH_ENABLED:
+        bm25.add_rows(rows)
+
+
+async def sync_call_mirror(
+    state: Dict[str, Any], vector: VectorIndex, bm25: BM25Index
+) -> int:
+    # Pull rows written since the last pass in (updated_at, call_id) order, page by
+    # page. updated_at is set by a trigger, so re-ingested calls come back too
+    columns = MIRROR_COLUMNS if VECTOR_INDEX_ENABLED else BM25_COLUMNS
+    cursor = None
+    added = 0
+    while True:
+        query = (
+            supabase.table("fact_calls")
+            .select(f"{columns}, updated_at")
+            .order("updated_at")
+            .order("call_id")
+            .limit(VECTOR_INDEX_PAGE_SIZE)
+        )
+        if cursor:
+            ts, call_id = cursor
+            query = query.or_(
+                f'updated_at.gt."{ts}",'
+                f'and(updated_at.eq."{ts}",call_id.gt.{call_id})'
+            )
+        elif state["synced_through"]:
+            since = datetime.fromisoformat(state["synced_through"]) - timedelta(
+                seconds=VECTOR_INDEX_SYNC_OVERLAP
+            )
+            query = query.gte("updated_at", since.isoformat())
+        response = await execute_supabase(query)
+        rows = response.data or []
+        # Parsing vectors and tokenizing transcripts is CPU work; keep it off the loop
+        await asyncio.to_thread(index_mirror_rows, rows, vector, bm25)
+        state["call_ids"].update(str(row["call_id"]) for row in rows)
+        added += len(rows)
+        if rows:
+            cursor = (rows[-1]["updated_at"], rows[-1]["call_id"])
+            state["synced_through"] = rows[-1]["updated_at"]
+        if len(rows) < VECTOR_INDEX_PAGE_SIZE:
+            return added
+
+
+async def mirror_has_deleted_calls() -> bool:
+    # Deletes leave no row to sync; they show as the mirror holding more calls
+    # than fact_calls. Only counted again once the data version has moved
+    version = await get_data_version()
+    if version is not None and version == mirror_state["checked_version"]:
+        return False
+    response = await execute_supabase(
+        supabase.table("fact_calls").select("call_id", count="exact").limit(1)
     )
-    service = build("calendar", "v3", credentials=credentials)
+    mirror_state["checked_version"] = version
+    return len(mirror_state["call_ids"]) > (response.count or 0)
+
+
+async def rebuild_call_mirror() -> int:
+    """Load fresh indexes from scratch, then swap them in for the live ones."""
+    global vector_index, bm25_index
+    state = {"synced_through": None, "call_ids": set()}
+    vector, bm25 = new_vector_index(), BM25Index()
+    loaded = await sync_call_mirror(state, vector, bm25)
+    vector.ready, bm25.ready = vector_index.ready, bm25_index.ready
+    vector_index, bm25_index = vector, bm25
+    mirror_state.update(state)
+    return loaded
+
+
+async def call_mirror_sync_loop():
+    while True:
+        try:
+            added = await sync_call_mirror(mirror_state, vector_index, bm25_index)
+            if not (vector_index.ready or bm25_index.ready):
+                print(f"Call mirror loaded: {added} calls")
+            elif added:
+                print(f"Call mirror synced: {added} calls added or updated")
+            vector_index.ready = VECTOR_INDEX_ENABLED
+            bm25_index.ready = HYBRID_SEARCH_ENABLED
+            if await mirror_has_deleted_calls():
+                loaded = await rebuild_call_mirror()
+                print(f"Call mirror rebuilt after deletes: {loaded} calls")
+        except Exception as e:
+            print(f"Call mirror sync error: {e}")
+        await asyncio.sleep(VECTOR_INDEX_SYNC_INTERVAL)
+
+
+def schedule_call_event(
+    start_dt: datetime, summary="Call with agent", timezone="America/New_York"
+):
+    # Credentials, their access token and the service are built once per process
+    service = clients.get("calendar")
 
     end_dt = start_dt + timedelta(minutes=30)
 
@@ -201,7 +811,8 @@ def schedule_call_event(
         "attendees": [],
     }
 
-    event_result = service.events().insert(calendarId=CALENDAR_ID, body=event).execute()
+    request = service.events().insert(calendarId=CAL_ID, body=event)
+    event_result = request.execute(http=clients.get("calendar_http"))
     return event_result.get("htmlLink")
 
 
@@ -217,58 +828,189 @@ Prompt: "{prompt}"
 
 SQL:
 """
-    response = openai_client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[{"role": "user", "content": sql_guide}],
-        temperature=0.1,
-    )
+    with span("sql_generate"):
+        response = await single_flight.do(
+            "sql_generate",
+            normalize_text(prompt),
+            lambda: chat_completion(
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": sql_guide}],
+                temperature=0.1,
+            ),
+        )
     return response.choices[0].message.content.strip()
 
 
-async def run_sql_query(sql: str):
-    try:
-        response = supabase.rpc("run_sql", {"query": sql}).execute()
-        return response.data[0]["result"]
-    except Exception as e:
-        return [{"error": str(e)}]
+async def run_sql_query(sql: str, question: str = "") -> Tuple[Any, int]:
+    """Run generated SQL through the guard; errors come back as [{"error": ...}].
+
+    Returns the rows and the row cap the query ran under.
+    """
+    max_rows = SQL_GUARD_MAX_ROWS
+    with span("sql_run"):
+        try:
+            while True:
+                guarded = guard_sql(sql, question, max_rows)
+                response = await execute_supabase(
+                    supabase.rpc(
+                        "run_sql_guarded",
+                        {
+                            "query": guarded.sql,
+                            "max_cost": SQL_GUARD_MAX_COST,
+                            "strip_columns": guarded.strip_columns,
+                        },
+                    ),
+                    timeout=SQL_GUARD_TIMEOUT,
+                )
+                payload = response.data
+                if not payload["rejected"]:
+                    return payload["result"], max_rows
+                # A smaller LIMIT lets the planner stop early; otherwise give up
+                if max_rows <= SQL_GUARD_FALLBACK_ROWS:
+                    error = (
+                        f"Query too expensive (estimated cost "
+                        f"{payload['cost']:.0f} > {SQL_GUARD_MAX_COST:.0f})"
+                    )
+                    return [{"error": error}], max_rows
+                max_rows = SQL_GUARD_FALLBACK_ROWS
+        except SQLGuardError as e:
+            return [{"error": f"Rejected SQL: {e}"}], max_rows
+        except HTTPException as e:
+            return [{"error": e.detail}], max_rows
+        except Exception as e:
+            # 57014: cancelled by run_sql_guarded's statement_timeout
+            if "57014" in str(e):
+                return [{"error": "Query took too long and was cancelled"}], max_rows
+            return [{"error": str(e)}], max_rows
+
+
+def sql_failed(result: Any) -> bool:
+    return isinstance(result, list) and bool(result) and "error" in result[0]
+
+
+async def answer_sql_question(question: str) -> Tuple[Any, Dict[str, Any]]:
+    """Run SQL for ``question``, from a learned template when one matches."""
+    match = sql_templates.match(question)
+    if match:
+        sql, key = match
+        result, row_limit = await run_sql_query(sql, question)
+        if not sql_failed(result):
+            return result, {"source": "template", "row_limit": row_limit}
+        sql_templates.evict(key)
+
+    sql = (await generate_sql(question)).rstrip(";")
+    result, row_limit = await run_sql_query(sql, question)
+    # Only SQL that ran cleanly is generalized into a template
+    if not sql_failed(result):
+        sql_templates.learn(question, sql)
+    return result, {"source": "llm", "row_limit": row_limit}
+
+
+SQL_ANSWER_JSON_FORMAT = """Return your response in this exact format:
+
+{
+    "answer": "provide a clear and concise answer to the user in plain English."
+}"""
 
+SQL_ANSWER_TEXT_FORMAT = "Return only the answer text, without JSON or markdown."
 
-async def answer_with_sql_result(
-    user_prompt: str, sql_result: List[Dict[str, Any]]
+
+def sql_answer_prompt(
+    user_prompt: str, result_text: str, summarized: bool, plain_text: bool = False
 ) -> str:
-    table_preview = json.dumps(sql_result, indent=2)
-    prompt = f"""
+    answer_format = SQL_ANSWER_TEXT_FORMAT if plain_text else SQL_ANSWER_JSON_FORMAT
+    if summarized:
+        heading = (
+            "The SQL query result was too large to show, so here is a summary of it "
+            "(row_count is the exact number of rows returned; per-column statistics, "
+            "most common values and a trend over time where there is a date column):"
+        )
+    else:
+        heading = "Here is the SQL query result:"
+    return f"""
 You are a helpful assistant. A user asked the following question:
 
 "{user_prompt}"
 
-Here is the SQL query result:
-{table_preview}
+{heading}
+{result_text}
 
 Based on this result, provide a clear and concise answer to the user in plain English. If possible, summarize in one or two sentences.
-Return your response in this exact format:
-
-{{
-    "answer": "provide a clear and concise answer to the user in plain English."
-}}
+{answer_format}
 
 DO NOT TALK ABOUT HOW YOU GOT THIS RESPONSE like "based on the SQL query result.".
 """
-    response = openai_client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.3,
+
+
+def shape_sql_result(
+    result: List[Dict[str, Any]], sql_meta: Dict[str, Any]
+) -> Tuple[str, bool]:
+    """Digest ``result`` for the answer prompt, recording the shape in ``sql_meta``."""
+    with span("sql_shape"):
+        text, shaping = shape_result(
+            result, SQL_RESULT_TOKEN_BUDGET, row_limit=sql_meta.get("row_limit")
+        )
+    sql_meta["result_shape"] = shaping
+    return text, shaping["summarized"]
+
+
+async def answer_completion(prompt: str) -> str:
+    # The prompt embeds the question and the data, so equal prompts get one answer
+    response = await single_flight.do(
+        "answer",
+        hashlib.sha256(prompt.encode()).hexdigest(),
+        lambda: chat_completion(
+            model="gpt-3.5-turbo",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3,
+        ),
     )
     return response.choices[0].message.content.strip()
 
 
+async def answer_with_sql_result(
+    user_prompt: str, result_text: str, summarized: bool
+) -> str:
+    prompt = sql_answer_prompt(user_prompt, result_text, summarized)
+    with span("answer"):
+        return await answer_completion(prompt)
+
+
 # --- RAG Answer Generator ---
-async def answer_with_rag(question: str, context_docs: List[Dict[str, Any]]) -> str:
-    # Serialize retrieved calls
-    context_json = "\n\n---\n\n".join(json.dumps(doc, indent=2) for doc in context_docs)
+RAG_ANSWER_JSON_FORMAT = """Respond in *valid JSON* using the format:
+
+{
+  "answer": "Your response here (2–4 paragraphs)",
+  "confidence": "high/medium/low",
+  "sources": [
+    {
+      "call_id": "string",
+      "agent_id": "string",
+      "agent_name":"string",
+      "customer_name":"string",
+      "call_timestamp": "ISO timestamp",
+      "issue_type": "string",
+      "sentiment": "string",
+      "summary": "short summary of the call",
+      "relevance": "why this call supports the answer",
+      "transcript_snippet": "most relevant part of the transcript"
+    }
+  ]
+}
 
-    prompt = f"""
-You are a helpful assistant analyzing customer service call center data. Below is a list of call records (in JSON format), each containing metadata and transcripts.
+Do NOT include any made-up data. Only use values present in the JSON above. Include only calls that are clearly relevant. Return valid JSON only."""
+
+RAG_ANSWER_TEXT_FORMAT = """Respond in plain text (no JSON or markdown), 2–4 paragraphs, referring to calls by call_id.
+
+Do NOT include any made-up data. Only use values present in the JSON above. Mention only calls that are clearly relevant."""
+
+
+def rag_answer_prompt(
+    question: str, context_json: str, plain_text: bool = False
+) -> str:
+    answer_format = RAG_ANSWER_TEXT_FORMAT if plain_text else RAG_ANSWER_JSON_FORMAT
+    return f"""
+You are a helpful assistant analyzing customer service call center data. Below is a list of call records (one JSON object per line), each containing metadata and the most relevant transcript excerpts.
 
 Your task:
 - Use this data to answer the user's question in a clear and informative way
@@ -294,36 +1036,14 @@ Instructions:
    - summary (shortened if necessary)
    - transcript snippet (first 1–2 sentences that are most relevant)
 
-Respond in *valid JSON* using the format:
-
-{{
-  "answer": "Your response here (2–4 paragraphs)",
-  "confidence": "high/medium/low",
-  "sources": [
-    {{
-      "call_id": "string",
-      "agent_id": "string",
-      "agent_name":"string",
-      "customer_name":"string",
-      "call_timestamp": "ISO timestamp",
-      "issue_type": "string",
-      "sentiment": "string",
-      "summary": "short summary of the call",
-      "relevance": "why this call supports the answer",
-      "transcript_snippet": "most relevant part of the transcript"
-    }}
-  ]
-}}
-
-Do NOT include any made-up data. Only use values present in the JSON above. Include only calls that are clearly relevant. Return valid JSON only.
+{answer_format}
 """
 
-    response = openai_client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.3,
-    )
-    return response.choices[0].message.content.strip()
+
+async def answer_with_rag(question: str, context_json: str) -> str:
+    prompt = rag_answer_prompt(question, context_json)
+    with span("answer"):
+        return await answer_completion(prompt)
 
 
 # --- API Endpoints ---
@@ -332,14 +1052,22 @@ async def root():
     return {
         "message": "Call Center RAG API",
         "status": "running",
-        "endpoints": {"chat": "/api/chat", "health": "/health"},
+        "endpoints": {
+            "chat": "/api/chat",
+            "chat_stream": "/api/chat/stream",
+            "dashboard": "/api/dashboard",
+            "health": "/health",
+            "metrics": "/metrics",
+        },
     }
 
 
 @app.get("/health")
 async def health_check():
     try:
-        result = supabase.table("fact_calls").select("call_id").limit(1).execute()
+        result = await execute_supabase(
+            supabase.table("fact_calls").select("call_id").limit(1)
+        )
         return {
             "status": "healthy",
             "timestamp": datetime.now().isoformat(),
@@ -353,141 +1081,650 @@ async def health_check():
         raise HTTPException(status_code=503, detail=f"Service unhealthy: {str(e)}")
 
 
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    return {
+        "embeddings": embedding_cache.stats(),
+        "answers": answer_cache.stats(),
+        "vector_index": vector_index.stats(),
+        "bm25_index": bm25_index.stats(),
+        "sql_templates": sql_templates.stats(),
+        "coalescing": single_flight.stats(),
+        "dashboard": {
+            k: dashboard_state[k]
+            for k in ("version", "etag", "hits", "misses", "not_modified")
+        },
+    }
+
+
+def cache_hit_ratios() -> List[Tuple[Dict[str, Any], float]]:
+    dashboard_lookups = dashboard_state["hits"] + dashboard_state["misses"]
+    return [
+        ({"cache": "embeddings"}, embedding_cache.stats()["hit_ratio"]),
+        ({"cache": "answers"}, answer_cache.stats()["hit_ratio"]),
+        ({"cache": "sql_templates"}, sql_templates.stats()["hit_ratio"]),
+        (
+            {"cache": "dashboard"},
+            (
+                round(dashboard_state["hits"] / dashboard_lookups, 4)
+                if dashboard_lookups
+                else 0.0
+            ),
+        ),
+    ]
+
+
+metrics.gauge(
+    "convolens_cache_hit_ratio", "Hit ratio of the in-process caches", cache_hit_ratios
+)
+
+
+def coalesced_calls() -> List[Tuple[Dict[str, Any], float]]:
+    stages = single_flight.stats()["stages"]
+    return [
+        ({"stage": stage, "role": role}, counts[key])
+        for stage, counts in stages.items()
+        for role, key in (("leader", "calls"), ("joined", "joined"))
+    ]
+
+
+metrics.gauge(
+    "convolens_coalesced_calls_total",
+    "Upstream calls by stage, run (leader) or shared from one in flight (joined)",
+    coalesced_calls,
+    metric_type="counter",
+)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+def question_literals(question: str) -> Tuple[Tuple[str, str], ...]:
+    # "May 21" and "May 22" embed alike; cached answers must match these exactly.
+    # "Yesterday" has no literal, so the date it is resolved against stands in
+    literals = [(slot.kind, slot.value.lower()) for slot in extract_slots(question)]
+    if mentions_relative_date(question):
+        literals.append(("today", date.today().isoformat()))
+    return tuple(sorted(literals))
+
+
+def answer_cache_key(question: str) -> Tuple[Any, ...]:
+    """Exact key for a confident SQL question: its wording minus fillers and literals."""
+    return (
+        question_shape(question, extract_slots(question)),
+        question_literals(question),
+    )
+
+
+def cached_chat_response(
+    cached_response: Dict[str, Any], data_version: int, similarity: float
+) -> ChatResponse:
+    return ChatResponse(
+        **{
+            **cached_response,
+            "timestamp": datetime.now().isoformat(),
+            "metadata": {
+                **cached_response["metadata"],
+                "cache": {
+                    "similarity": round(similarity, 4),
+                    "data_version": data_version,
+                    "cached_at": cached_response["timestamp"],
+                },
+            },
+        },
+        cached=True,
+    )
+
+
+async def lookup_answer_cache(
+    question: str,
+    local_route: Dict[str, Any],
+    filters: Optional[Dict[str, Any]] = None,
+) -> Tuple[Optional[List[float]], Optional[int], Optional[ChatResponse]]:
+    # Scheduling has side effects, so it is never answered from the cache
+    if local_route["mode"] == "schedule":
+        return None, None, None
+    # SQL questions the router is sure of use the exact key: no embedding needed
+    if local_route["mode"] == "sql" and local_route["confident"]:
+        if filters:
+            return None, None, None
+        data_version = await get_data_version()
+        cached_response = answer_cache.lookup_key(
+            answer_cache_key(question), data_version
+        )
+        if not cached_response:
+            return None, data_version, None
+        return (
+            None,
+            data_version,
+            cached_chat_response(cached_response, data_version, 1.0),
+        )
+    query_embedding = await get_embedding(question)
+    # Cached answers are keyed by the question alone, so filtered ones are not shared
+    if filters:
+        return query_embedding, None, None
+    data_version = await get_data_version()
+    hit = answer_cache.lookup(
+        query_embedding, data_version, question_literals(question)
+    )
+    if not hit:
+        return query_embedding, data_version, None
+    cached_response, similarity = hit
+    return (
+        query_embedding,
+        data_version,
+        cached_chat_response(cached_response, data_version, similarity),
+    )
+
+
+def call_sources(similar_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        CallSource(
+            call_id=call["call_id"],
+            agent_id=call.get("agent_id"),
+            summary=(
+                (call.get("summary")[:200] + "...") if call.get("summary") else None
+            ),
+            sentiment=call.get("sentiment"),
+            issue_type=call.get("issue_type"),
+            call_timestamp=call.get("call_timestamp"),
+            similarity=round(call.get("similarity", 0), 3),
+        ).dict()
+        for call in similar_calls
+    ]
+
+
+async def schedule_from_prompt(question: str) -> Tuple[str, str]:
+    dt = await extract_datetime_from_prompt(question)
+    if not dt:
+        raise HTTPException(
+            status_code=400, detail="Could not extract time from your prompt."
+        )
+
+    title = await extract_meeting_title(question)
+
+    try:
+        link = await run_blocking(
+            schedule_call_event,
+            start_dt=dt,
+            summary=title,
+            limiter=calendar_limiter,
+            timeout=CALENDAR_TIMEOUT,
+            upstream="Google Calendar",
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Scheduling failed: {str(e)}")
+    message = f"""Scheduled a meeting titled {title} at {dt.strftime('%I:%M %p on %B %d')}.\nHere's your event: {link}"""
+    return message, link
+
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat_with_calls(request: ChatRequest):
     try:
-        mode = await classify_prompt(request.question)
+        local_route = local_router.route(request.question)
+        filters = request.active_filters()
+        query_embedding, data_version, cached = await lookup_answer_cache(
+            request.question, local_route, filters
+        )
+        if cached:
+            return cached
+
+        route = await classify_prompt(request.question, local_route)
+        mode = route["mode"]
+        metadata = {"route": route}
 
         if mode == "sql":
-            sql = await generate_sql(request.question)
-            result = await run_sql_query(sql.rstrip(";"))
-            if isinstance(result, list) and result and "error" in result[0]:
+            result, metadata["sql"] = await answer_sql_question(request.question)
+            if sql_failed(result):
                 raise HTTPException(status_code=500, detail=result[0]["error"])
             if not result:
-                return ChatResponse(
+                response = ChatResponse(
                     answer="No data found for the query.",
                     sources=[],
                     context_used=[],
                     timestamp=datetime.now().isoformat(),
+                    metadata=metadata,
                 )
-            final_answer = await answer_with_sql_result(request.question, result)
-            return ChatResponse(
-                answer=final_answer,
-                sources=[],
-                context_used=[json.dumps(result[:1])],
-                timestamp=datetime.now().isoformat(),
-            )
-
-        elif mode == "schedule":
-            dt = await extract_datetime_from_prompt(request.question)
-            if not dt:
-                raise HTTPException(
-                    status_code=400, detail="Could not extract time from your prompt."
+            else:
+                result_text, summarized = shape_sql_result(result, metadata["sql"])
+                final_answer = await answer_with_sql_result(
+                    request.question, result_text, summarized
                 )
-
-            title = await extract_meeting_title(request.question)
-
-            try:
-                link = schedule_call_event(start_dt=dt, summary=title)
-                responseSchedule = f"""Scheduled a meeting titled {title} at {dt.strftime('%I:%M %p on %B %d')}.\nHere's your event: {link}"""
-
-                responseSchedule = json.dumps({"answer": responseSchedule})
-                sourcesString = json.dumps({"link": link})
-                return ChatResponse(
-                    answer=responseSchedule,
-                    # answer=
-                    sources=[{"link": link}],
-                    context_used=[request.question],
+                response = ChatResponse(
+                    answer=final_answer,
+                    sources=[],
+                    context_used=[json.dumps(result[:1])],
                     timestamp=datetime.now().isoformat(),
+                    metadata=metadata,
                 )
-            except Exception as e:
-                raise HTTPException(
-                    status_code=500, detail=f"Scheduling failed: {str(e)}"
-                )
+
+        elif mode == "schedule":
+            with span("schedule"):
+                message, link = await schedule_from_prompt(request.question)
+            return ChatResponse(
+                answer=json.dumps({"answer": message}),
+                sources=[{"link": link}],
+                context_used=[request.question],
+                timestamp=datetime.now().isoformat(),
+                metadata=metadata,
+            )
 
         else:
-            query_embedding = await get_embedding(request.question)
-            similar_calls = await search_call_database(query_embedding, limit=5)
+            if query_embedding is None:
+                query_embedding = await get_embedding(request.question)
+            similar_calls = await search_call_database(
+                query_embedding, limit=5, question=request.question, filters=filters
+            )
             if not similar_calls:
                 return ChatResponse(
                     answer="No relevant transcripts found.",
                     sources=[],
                     context_used=[],
                     timestamp=datetime.now().isoformat(),
+                    metadata=metadata,
                 )
-            final_answer = await answer_with_rag(request.question, similar_calls)
-            return ChatResponse(
+            with span("pack_context"):
+                context_json, packing = pack_context(
+                    request.question, similar_calls, RAG_CONTEXT_TOKEN_BUDGET
+                )
+            metadata["context_packing"] = packing
+            final_answer = await answer_with_rag(request.question, context_json)
+            response = ChatResponse(
                 answer=final_answer,
-                sources=[
-                    CallSource(
-                        call_id=call["call_id"],
-                        agent_id=call.get("agent_id"),
-                        summary=(
-                            (call.get("summary")[:200] + "...")
-                            if call.get("summary")
-                            else None
-                        ),
-                        sentiment=call.get("sentiment"),
-                        issue_type=call.get("issue_type"),
-                        call_timestamp=call.get("call_timestamp"),
-                        similarity=round(call.get("similarity", 0), 3),
-                    ).dict()
-                    for call in similar_calls
-                ],
-                context_used=[
-                    call.get("transcript", "")[:200] + "..." for call in similar_calls
-                ],
+                sources=call_sources(similar_calls),
+                context_used=[transcript_preview(call) for call in similar_calls],
                 timestamp=datetime.now().isoformat(),
+                metadata=metadata,
+            )
+
+        if filters:
+            # Cached answers are keyed by the question alone
+            return response
+        if query_embedding is not None:
+            answer_cache.store(
+                query_embedding,
+                response.dict(exclude={"cached"}),
+                data_version,
+                question_literals(request.question),
+            )
+        elif mode == "sql" and local_route["confident"]:
+            answer_cache.store_key(
+                answer_cache_key(request.question),
+                response.dict(exclude={"cached"}),
+                data_version,
             )
+        return response
     except Exception as e:
         print(f"Chat error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# --- Streaming Chat (SSE) ---
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def answer_text(answer: str) -> str:
+    # Non-streamed answers are JSON ({"answer": ...}); streams carry plain text
+    try:
+        return json.loads(answer).get("answer", answer)
+    except (ValueError, AttributeError):
+        return answer
+
+
+async def chat_event_stream(request: ChatRequest) -> AsyncIterator[str]:
+    start = time.perf_counter()
+    timing: Dict[str, Any] = {}
+
+    def elapsed_ms() -> float:
+        return round((time.perf_counter() - start) * 1000, 1)
+
+    def emit(event: str, data: Any) -> str:
+        timing.setdefault("ttfb_ms", elapsed_ms())
+        return sse_event(event, data)
+
+    try:
+        local_route = local_router.route(request.question)
+        filters = request.active_filters()
+        query_embedding, _, cached = await lookup_answer_cache(
+            request.question, local_route, filters
+        )
+        if cached:
+            answer = answer_text(cached.answer)
+            yield emit("route", {**local_route, "cached": True})
+            yield emit("token", {"text": answer})
+            timing["total_ms"] = elapsed_ms()
+            cached.answer = answer
+            cached.metadata = {**cached.metadata, "timing": timing}
+            yield emit("done", cached.dict())
+            return
+
+        route = await classify_prompt(request.question, local_route)
+        mode = route["mode"]
+        metadata: Dict[str, Any] = {"route": route}
+        yield emit("route", route)
+
+        sources: List[Dict[str, Any]] = []
+        context_used: List[str] = []
+        prompt = None
+        if mode == "sql":
+            result, metadata["sql"] = await answer_sql_question(request.question)
+            if sql_failed(result):
+                raise HTTPException(status_code=500, detail=result[0]["error"])
+            if result:
+                result_text, summarized = shape_sql_result(result, metadata["sql"])
+            yield emit("sql", {**metadata["sql"], "rows": len(result) if result else 0})
+            if result:
+                context_used = [json.dumps(result[:1])]
+                prompt = sql_answer_prompt(
+                    request.question, result_text, summarized, plain_text=True
+                )
+            else:
+                answer = "No data found for the query."
+        elif mode == "schedule":
+            with span("schedule"):
+                answer, link = await schedule_from_prompt(request.question)
+            sources = [{"link": link}]
+            context_used = [request.question]
+        else:
+            if query_embedding is None:
+                query_embedding = await get_embedding(request.question)
+            similar_calls = await search_call_database(
+                query_embedding, limit=5, question=request.question, filters=filters
+            )
+            sources = call_sources(similar_calls)
+            yield emit("sources", {"sources": sources})
+            if similar_calls:
+                with span("pack_context"):
+                    context_json, packing = pack_context(
+                        request.question, similar_calls, RAG_CONTEXT_TOKEN_BUDGET
+                    )
+                metadata["context_packing"] = packing
+                context_used = [transcript_preview(call) for call in similar_calls]
+                prompt = rag_answer_prompt(
+                    request.question, context_json, plain_text=True
+                )
+            else:
+                answer = "No relevant transcripts found."
+
+        if prompt is None:
+            yield emit("token", {"text": answer})
+        else:
+            parts = []
+            with span("answer"):
+                async for token in stream_completion(prompt, temperature=0.3):
+                    timing.setdefault("first_token_ms", elapsed_ms())
+                    parts.append(token)
+                    yield emit("token", {"text": token})
+            answer = "".join(parts).strip()
+
+        timing["total_ms"] = elapsed_ms()
+        trace = current_trace()
+        if trace:
+            # Headers went out with the first event, so the breakdown goes here
+            breakdown = trace.summary()
+            timing.update(stages=breakdown["stages"], tokens=breakdown["tokens"])
+        yield emit(
+            "done",
+            ChatResponse(
+                answer=answer,
+                sources=sources,
+                context_used=context_used,
+                timestamp=datetime.now().isoformat(),
+                metadata={**metadata, "timing": timing},
+            ).dict(),
+        )
+    except HTTPException as e:
+        yield emit("error", {"status_code": e.status_code, "detail": e.detail})
+    except Exception as e:
+        print(f"Chat stream error: {e}")
+        yield emit("error", {"status_code": 500, "detail": str(e)})
+    finally:
+        if "total_ms" in timing:
+            print(
+                f"Chat stream: ttfb={timing['ttfb_ms']}ms "
+                f"first_token={timing.get('first_token_ms', '-')}ms "
+                f"total={timing['total_ms']}ms"
+            )
+
+
+@app.post("/api/chat/stream")
+async def chat_with_calls_stream(request: ChatRequest):
+    return StreamingResponse(
+        chat_event_stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Column sets for call listings; embeddings are never returned and transcripts
+# only with "detail"
+CALL_COLUMN_SETS = {
+    "list": (
+        "call_id, agent_id, customer_id, date_id, call_timestamp, duration_seconds, "
+        "disposition, direction, issue_type, sentiment, resolved, audio_url"
+    ),
+}
+CALL_COLUMN_SETS["summary"] = CALL_COLUMN_SETS["list"] + ", summary"
+CALL_COLUMN_SETS["detail"] = CALL_COLUMN_SETS["summary"] + (
+    ", transcript, sentiment_score, agent_politeness, agent_professionalism, "
+    "process_adherence"
+)
+PARTY_COLUMNS = ", dim_agents(name, email), dim_customers(name, email)"
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    raw = json.dumps([row["call_timestamp"], row["call_id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    # Both parts are validated before they are spliced into a PostgREST filter
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        ts, call_id = json.loads(raw)
+        datetime.fromisoformat(ts)
+        return ts, str(uuid.UUID(call_id))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def call_select(columns: str, include_parties: bool) -> str:
+    if columns not in CALL_COLUMN_SETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"columns must be one of: {', '.join(CALL_COLUMN_SETS)}",
+        )
+    return CALL_COLUMN_SETS[columns] + (PARTY_COLUMNS if include_parties else "")
+
+
+def flatten_parties(row: Dict[str, Any]) -> Dict[str, Any]:
+    agent = row.pop("dim_agents", None) or {}
+    customer = row.pop("dim_customers", None) or {}
+    row.update(
+        agent_name=agent.get("name"),
+        agent_email=agent.get("email"),
+        customer_name=customer.get("name"),
+        customer_email=customer.get("email"),
+    )
+    return row
+
+
 @app.get("/api/calls")
-async def get_recent_calls(limit: int = 20):
+async def get_recent_calls(
+    limit: int = Query(20, ge=1, le=200),
+    cursor: Optional[str] = None,
+    columns: str = "summary",
+    include_parties: bool = False,
+    sentiment: Optional[str] = None,
+    issue_type: Optional[str] = None,
+    agent_id: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    """Newest calls first, paged by a (call_timestamp, call_id) keyset cursor."""
+    select = call_select(columns, include_parties)
     try:
-        response = (
+        # One extra row tells us whether there is a next page
+        query = (
             supabase.table("fact_calls")
-            .select(
-                "call_id, agent_id, customer_id, summary, sentiment, issue_type, call_timestamp"
-            )
+            .select(select)
+            .not_.is_("call_timestamp", "null")
             .order("call_timestamp", desc=True)
-            .limit(limit)
-            .execute()
+            .order("call_id", desc=True)
+            .limit(limit + 1)
         )
+        if sentiment:
+            query = query.eq("sentiment", sentiment)
+        if issue_type:
+            query = query.eq("issue_type", issue_type)
+        if agent_id:
+            query = query.eq("agent_id", agent_id)
+        if date_from:
+            query = query.gte("date_id", date_from.isoformat())
+        if date_to:
+            query = query.lte("date_id", date_to.isoformat())
+        if cursor:
+            ts, call_id = decode_cursor(cursor)
+            query = query.or_(
+                f'call_timestamp.lt."{ts}",'
+                f'and(call_timestamp.eq."{ts}",call_id.lt.{call_id})'
+            )
+
+        response = await execute_supabase(query)
+        rows = response.data or []
+        page = rows[:limit]
+        if include_parties:
+            page = [flatten_parties(row) for row in page]
         return {
-            "calls": response.data,
-            "count": len(response.data) if response.data else 0,
+            "calls": page,
+            "count": len(page),
+            "next_cursor": encode_cursor(page[-1]) if len(rows) > limit else None,
         }
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Get calls error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/stats")
-async def get_call_stats():
+@app.get("/api/calls/{call_id}")
+async def get_call(
+    call_id: uuid.UUID, columns: str = "detail", include_parties: bool = False
+):
+    select = call_select(columns, include_parties)
     try:
-        total_response = (
-            supabase.table("fact_calls").select("call_id", count="exact").execute()
+        response = await execute_supabase(
+            supabase.table("fact_calls").select(select).eq("call_id", str(call_id))
         )
-        total_calls = total_response.count if total_response.count else 0
+    except Exception as e:
+        print(f"Get call error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if not response.data:
+        raise HTTPException(status_code=404, detail="Call not found")
+    row = response.data[0]
+    return flatten_parties(row) if include_parties else row
+
 
-        embedded_response = (
+async def fetch_call_stats() -> Dict[str, Any]:
+    total_response, embedded_response = await asyncio.gather(
+        execute_supabase(supabase.table("fact_calls").select("call_id", count="exact")),
+        execute_supabase(
             supabase.table("fact_calls")
             .select("call_id", count="exact")
             .not_.is_("embedding", "null")
-            .execute()
+        ),
+    )
+    total_calls = total_response.count if total_response.count else 0
+    embedded_calls = embedded_response.count if embedded_response.count else 0
+
+    return {
+        "total_calls": total_calls,
+        "calls_with_embeddings": embedded_calls,
+        "embedding_coverage": (
+            round((embedded_calls / total_calls * 100), 2) if total_calls > 0 else 0
+        ),
+    }
+
+
+def dashboard_is_fresh(version: Optional[int]) -> bool:
+    return (
+        dashboard_state["payload"] is not None
+        and dashboard_state["version"] == version
+        and time.monotonic() - dashboard_state["built_at"] < DASHBOARD_CACHE_TTL
+    )
+
+
+async def get_dashboard() -> Tuple[Dict[str, Any], str]:
+    """All dashboard KPIs in one payload, rebuilt only when fact_calls changes."""
+    version = await get_data_version()
+    if dashboard_is_fresh(version):
+        dashboard_state["hits"] += 1
+        return dashboard_state["payload"], dashboard_state["etag"]
+
+    # One rebuild per version change; concurrent requests wait for it
+    async with dashboard_lock:
+        if dashboard_is_fresh(version):
+            dashboard_state["hits"] += 1
+            return dashboard_state["payload"], dashboard_state["etag"]
+
+        dashboard_state["misses"] += 1
+        with span("dashboard_rebuild"):
+            *rpc_results, stats = await asyncio.gather(
+                *(execute_supabase(supabase.rpc(name, {})) for name in DASHBOARD_RPCS),
+                fetch_call_stats(),
+            )
+        payload = {name: r.data for name, r in zip(DASHBOARD_RPCS, rpc_results)}
+        payload["stats"] = stats
+        payload["data_version"] = version
+
+        body = json.dumps(payload, sort_keys=True, default=str)
+        etag = '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
+        dashboard_state.update(
+            payload=payload, etag=etag, version=version, built_at=time.monotonic()
         )
-        embedded_calls = embedded_response.count if embedded_response.count else 0
+        return payload, etag
 
-        return {
-            "total_calls": total_calls,
-            "calls_with_embeddings": embedded_calls,
-            "embedding_coverage": (
-                round((embedded_calls / total_calls * 100), 2) if total_calls > 0 else 0
-            ),
-        }
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+@app.get("/api/dashboard")
+async def get_dashboard_data(if_none_match: Optional[str] = Header(None)):
+    try:
+        payload, etag = await get_dashboard()
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Dashboard error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # no-cache: browsers keep the body but revalidate, which is usually a 304
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        dashboard_state["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
+
+
+@app.get("/api/stats")
+async def get_call_stats():
+    try:
+        # Reuse a fresh dashboard payload, but a miss needs only the two counts,
+        # not a rebuild of every dashboard RPC
+        if dashboard_is_fresh(await get_data_version()):
+            return dashboard_state["payload"]["stats"]
+        return await fetch_call_stats()
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Stats error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,245 @@
+# result_shaping.py - Token-bounded digests of SQL results for the answer prompt
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from context_packing import count_tokens
+
+MAX_TEXT_CHARS = 80
+
+# Detail levels tried in order until the digest fits the budget:
+# (top-k values per text column, histogram bins, time series points, sample rows)
+DETAIL_LEVELS = (
+    (10, 8, 24, 5),
+    (5, 5, 12, 3),
+    (3, 0, 6, 1),
+    (1, 0, 0, 0),
+)
+
+
+def _serialize(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _round(value: float) -> Any:
+    if value is None or not np.isfinite(value):
+        return None
+    if float(value).is_integer():
+        return int(value)
+    return float(f"{value:.4g}")
+
+
+def _short(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        value = _serialize(value)
+    if isinstance(value, str) and len(value) > MAX_TEXT_CHARS:
+        return value[: MAX_TEXT_CHARS - 1] + "…"
+    return value
+
+
+def _parse_time(value: Any) -> Optional[datetime]:
+    if not isinstance(value, str) or len(value) < 10 or value[4] != "-":
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def _time_key(value: Any) -> float:
+    """Sort key for a time column: nulls last, naive times taken as UTC."""
+    parsed = _parse_time(value)
+    if parsed is None:
+        return float("inf")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _column_kind(values: List[Any]) -> str:
+    present = [v for v in values if v is not None]
+    if not present:
+        return "empty"
+    if all(isinstance(v, bool) for v in present):
+        return "boolean"
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return "number"
+    if all(_parse_time(v) is not None for v in present):
+        return "time"
+    return "text"
+
+
+def _summarize_column(values: List[Any], kind: str, top_k: int, bins: int):
+    present = [v for v in values if v is not None]
+    summary: Dict[str, Any] = {"type": kind, "nulls": len(values) - len(present)}
+    if kind == "number":
+        arr = np.asarray(present, dtype=float)
+        p25, p50, p75 = np.percentile(arr, [25, 50, 75])
+        summary.update(
+            min=_round(arr.min()),
+            max=_round(arr.max()),
+            sum=_round(arr.sum()),
+            mean=_round(arr.mean()),
+            p25=_round(p25),
+            p50=_round(p50),
+            p75=_round(p75),
+        )
+        if bins and np.unique(arr).size > bins:
+            counts, edges = np.histogram(arr, bins=bins)
+            summary["histogram"] = {
+                "edges": [_round(e) for e in edges],
+                "counts": counts.tolist(),
+            }
+    elif kind == "boolean":
+        summary.update(true=sum(present), false=len(present) - sum(present))
+    elif kind == "time":
+        times = sorted(present, key=_time_key)
+        summary.update(min=times[0], max=times[-1])
+    elif kind == "text":
+        keys = [_short(v if isinstance(v, str) else _serialize(v)) for v in present]
+        uniques, counts = np.unique(np.asarray(keys, dtype=object), return_counts=True)
+        summary["distinct"] = int(uniques.size)
+        if uniques.size == len(keys):
+            # Identifiers or free text: counting values says nothing
+            summary["examples"] = keys[: min(top_k, 3)]
+        else:
+            order = np.argsort(-counts, kind="stable")[:top_k]
+            summary["top"] = [[uniques[i], int(counts[i])] for i in order]
+    return summary
+
+
+def _series(
+    columns: Dict[str, List[Any]], kinds: Dict[str, str], time_col: str, points: int
+) -> Dict[str, Any]:
+    """Per numeric column: endpoints, extremes and a bucketed trend over time."""
+    # Rows without a time have no place in the trend
+    dated = [i for i, t in enumerate(columns[time_col]) if t is not None]
+    order = sorted(dated, key=lambda i: _time_key(columns[time_col][i]))
+    times = [columns[time_col][i] for i in order]
+    series: Dict[str, Any] = {
+        "time_column": time_col,
+        "from": times[0],
+        "to": times[-1],
+    }
+    buckets = np.array_split(np.arange(len(times)), min(points, len(times)) or 1)
+    for name, kind in kinds.items():
+        if kind != "number":
+            continue
+        # None becomes nan
+        arr = np.asarray([columns[name][i] for i in order], dtype=float)
+        if np.isnan(arr).all():
+            continue
+        entry: Dict[str, Any] = {
+            "first": _round(arr[~np.isnan(arr)][0]),
+            "last": _round(arr[~np.isnan(arr)][-1]),
+            "max_at": times[int(np.nanargmax(arr))],
+            "min_at": times[int(np.nanargmin(arr))],
+        }
+        if points:
+            entry["buckets"] = [
+                [times[b[0]], _round(np.nansum(arr[b])), _round(np.nanmean(arr[b]))]
+                for b in buckets
+                if b.size and not np.isnan(arr[b]).all()
+            ]
+        series[name] = entry
+    if points:
+        series["bucket_format"] = ["start", "sum", "mean"]
+    return series
+
+
+def _truncate(text: str, token_budget: int) -> str:
+    # Cut by characters in proportion to the overshoot until the tokens fit
+    while text and count_tokens(text) > token_budget:
+        keep = int(len(text) * token_budget / count_tokens(text) * 0.95)
+        text = text[: min(keep, len(text) - 1)]
+    return text
+
+
+def shape_result(
+    rows: List[Dict[str, Any]],
+    token_budget: int = 800,
+    row_limit: Optional[int] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """Turn a SQL result into prompt text of at most ``token_budget`` tokens.
+
+    Scalars and tables that fit are passed through as compact JSON; a scalar
+    over the budget is truncated, with a note saying so. Anything larger is
+    summarized column by column (numeric statistics and histograms,
+    top-k values, time ranges, and a bucketed trend when there is a time
+    column), always with the exact row count. Returns the text and a report.
+    """
+    row_count = len(rows)
+    report: Dict[str, Any] = {"rows": row_count}
+    # The guard's LIMIT may have cut the result short; the model must not report
+    # the row count as a total
+    capped = row_limit is not None and row_count >= row_limit
+
+    names: List[str] = list(dict.fromkeys(k for row in rows for k in row))
+    if row_count == 1 and len(names) == 1:
+        text = _serialize(rows[0])
+        tokens = count_tokens(text)
+        report.update(shape="scalar", tokens=tokens, summarized=False)
+        if tokens > token_budget:
+            # A single value can be a whole transcript or a string_agg of many
+            name, value = names[0], rows[0][names[0]]
+            value = value if isinstance(value, str) else _serialize(value)
+            note = f"value truncated from {tokens} tokens"
+            value = _truncate(value, token_budget - count_tokens(note) - 16)
+            text = _serialize({name: value + "…", "note": note})
+            report.update(tokens=count_tokens(text), truncated=True)
+        return text, report
+
+    columns = {name: [row.get(name) for row in rows] for name in names}
+    kinds = {name: _column_kind(values) for name, values in columns.items()}
+    time_col = next((n for n in names if kinds[n] == "time"), None)
+    numeric = [n for n in names if kinds[n] == "number"]
+
+    text = _serialize(rows)
+    if capped:
+        text = _serialize({"rows": rows, "note": f"capped at {row_limit} rows"})
+    if count_tokens(text) <= token_budget:
+        report.update(shape="small_table", tokens=count_tokens(text), summarized=False)
+        return text, report
+
+    shape = "time_series" if time_col and numeric and row_count > 2 else "long_table"
+    kept = names
+    for top_k, bins, points, samples in DETAIL_LEVELS:
+        while True:
+            digest: Dict[str, Any] = {"row_count": row_count}
+            if capped:
+                digest["note"] = (
+                    f"result capped at {row_limit} rows; the true count may be higher"
+                )
+            digest["columns"] = {
+                n: _summarize_column(columns[n], kinds[n], top_k, bins) for n in kept
+            }
+            if len(kept) < len(names):
+                digest["columns_omitted"] = [n for n in names if n not in kept]
+            if shape == "time_series":
+                digest["series"] = _series(
+                    columns,
+                    {n: kinds[n] for n in kept},
+                    time_col,
+                    points,
+                )
+            if samples:
+                digest["sample_rows"] = [
+                    {k: _short(v) for k, v in row.items() if k in kept}
+                    for row in rows[:samples]
+                ]
+            text = _serialize(digest)
+            tokens = count_tokens(text)
+            # Only at the lowest detail level do whole columns get dropped
+            droppable = [n for n in kept if n != time_col]
+            if tokens <= token_budget or top_k > 1 or len(droppable) <= 1:
+                break
+            kept = [n for n in kept if n != droppable[-1]]
+        if tokens <= token_budget:
+            break
+
+    report.update(shape=shape, tokens=tokens, summarized=True)
+    if len(kept) < len(names):
+        report["columns_omitted"] = len(names) - len(kept)
+    return text, report
@@ -0,0 +1,175 @@
+# router.py - Local fast-path prompt router (keyword rules + nearest centroid)
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+MODES = ("sql", "rag", "schedule")
+
+# Labeled examples used to build one TF-IDF centroid per mode
+LABELED_EXAMPLES: Dict[str, List[str]] = {
+    "sql": [
+        "How many calls took place on May 21st 2025?",
+        "How many calls were there yesterday?",
+        "What is the average call duration?",
+        "What was the average sentiment score last week?",
+        "Which agent handled the most calls?",
+        "Count the unresolved calls by issue type",
+        "What percentage of calls were resolved?",
+        "Show the total number of calls per day",
+        "List the top 5 agents by total call time",
+        "How many negative calls did Vincent Bailey have?",
+        "What is the average politeness score for each agent?",
+        "Which issue type is the most common?",
+        "How many Returns & Refunds calls were unresolved?",
+        "Give me the number of inbound and outbound calls",
+    ],
+    "rag": [
+        "Were there any calls about cancellations?",
+        "What did customers say about shipping delays?",
+        "Why are customers unhappy with their orders?",
+        "Find calls where the customer was frustrated",
+        "What problems do people have with the GPS?",
+        "Did anyone complain about the navigation system?",
+        "Summarize the conversations about yacht listings",
+        "What are customers asking about membership?",
+        "Tell me about calls where the agent was rude",
+        "Were there any calls mentioning a wrong item?",
+        "What do customers think about our return process?",
+        "Describe a call where the issue was not resolved",
+        "Any conversations about privacy or data concerns?",
+    ],
+    "schedule": [
+        "Can you schedule a call with ralph tomorrow at 6pm?",
+        "Schedule a meeting with the sales team on Friday",
+        "Book a call with Ann at 3pm today",
+        "Set up a sync with Alice and Bob tomorrow morning",
+        "Put a follow-up call with John on my calendar",
+        "Create a calendar event for a planning meeting next Monday",
+        "Arrange a quick chat with HR at 4 PM",
+        "Schedule a callback for the customer at 10:30am",
+        "Book a yacht viewing appointment for Saturday at noon",
+        "Set a reminder meeting with marketing next week",
+    ],
+}
+
+# (mode, pattern, weight) keyword rules; weights are added to centroid similarity
+RULES: List[Tuple[str, "re.Pattern[str]", float]] = [
+    (
+        "schedule",
+        re.compile(
+            r"\b(schedule|book|set ?up|arrange|put)\b.*\b(call|meeting|sync|chat|"
+            r"appointment|event|callback|reminder)\b",
+            re.I,
+        ),
+        1.0,
+    ),
+    ("schedule", re.compile(r"\b(calendar|invite|reschedule)\b", re.I), 0.6),
+    (
+        "schedule",
+        re.compile(r"\b(at|by) \d{1,2}(:\d{2})?\s*(am|pm)\b", re.I),
+        0.4,
+    ),
+    (
+        "sql",
+        re.compile(
+            r"\b(how many|how much|count|number of|total|average|avg|mean|sum|"
+            r"percentage|percent|ratio|rate)\b",
+            re.I,
+        ),
+        0.8,
+    ),
+    (
+        "sql",
+        re.compile(
+            r"\b(top \d+|most|least|highest|lowest|per (day|agent|week|month)|"
+            r"by (agent|day|issue|sentiment|date))\b",
+            re.I,
+        ),
+        0.5,
+    ),
+    (
+        "rag",
+        re.compile(
+            r"\b(any calls|calls (about|where|mentioning)|talk(ed)? about|"
+            r"complain\w*|mention\w*|say about|said about|think about|why|"
+            r"describe|examples? of|tell me about|summari[sz]e the)\b",
+            re.I,
+        ),
+        0.6,
+    ),
+]
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _normalize(vec: Dict[str, float]) -> Dict[str, float]:
+    norm = math.sqrt(sum(v * v for v in vec.values()))
+    return {k: v / norm for k, v in vec.items()} if norm else vec
+
+
+class LocalRouter:
+    def __init__(
+        self,
+        examples: Optional[Dict[str, List[str]]] = None,
+        min_confidence: float = 0.7,
+        temperature: float = 0.15,
+    ):
+        examples = examples or LABELED_EXAMPLES
+        self.min_confidence = min_confidence
+        self.temperature = temperature
+
+        docs = [
+            (mode, tokenize(text)) for mode, texts in examples.items() for text in texts
+        ]
+        doc_freq = Counter(tok for _, toks in docs for tok in set(toks))
+        self.idf = {
+            tok: math.log((1 + len(docs)) / (1 + df)) + 1.0
+            for tok, df in doc_freq.items()
+        }
+
+        self.centroids: Dict[str, Dict[str, float]] = {}
+        for mode in examples:
+            total: Counter = Counter()
+            for doc_mode, toks in docs:
+                if doc_mode == mode:
+                    for tok, weight in self._vectorize(toks).items():
+                        total[tok] += weight
+            self.centroids[mode] = _normalize(dict(total))
+
+    def _vectorize(self, tokens: List[str]) -> Dict[str, float]:
+        tf = Counter(tok for tok in tokens if tok in self.idf)
+        return _normalize({tok: n * self.idf[tok] for tok, n in tf.items()})
+
+    def route(self, prompt: str) -> Dict:
+        vec = self._vectorize(tokenize(prompt))
+        scores = {
+            mode: sum(w * centroid.get(tok, 0.0) for tok, w in vec.items())
+            for mode, centroid in self.centroids.items()
+        }
+
+        matched_rules = []
+        for mode, pattern, weight in RULES:
+            if mode in scores and pattern.search(prompt):
+                scores[mode] += weight
+                if mode not in matched_rules:
+                    matched_rules.append(mode)
+
+        # Softmax over combined scores gives a comparable confidence value
+        top = max(scores.values())
+        exps = {m: math.exp((s - top) / self.temperature) for m, s in scores.items()}
+        total = sum(exps.values())
+        mode = max(exps, key=exps.get)
+        confidence = exps[mode] / total
+
+        return {
+            "mode": mode,
+            "confidence": round(confidence, 3),
+            "path": "rules+centroid" if matched_rules else "centroid",
+            "matched_rules": matched_rules,
+            "confident": confidence >= self.min_confidence,
+        }
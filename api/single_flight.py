@@ -0,0 +1,94 @@
+# single_flight.py - Coalesce concurrent identical upstream calls into one
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """Concurrent calls with the same stage and key share one execution.
+
+    The first caller (the leader) runs ``fn``; callers arriving while it runs
+    wait for its result instead of repeating the upstream call. A leader's
+    failure or cancellation is not handed to its waiters: they try again,
+    coalesced among themselves, and only an error from that retry reaches
+    them. Results are shared, not copied, so treat them as read-only.
+    """
+
+    def __init__(self, enabled: bool = True, max_joins: int = 2):
+        self.enabled = enabled
+        # Flights a caller may wait on; when they all fail, the last error is real
+        self.max_joins = max_joins
+        self._inflight: Dict[Tuple[str, Hashable], asyncio.Future] = {}
+        self.leaders: Dict[str, int] = {}
+        self.joined: Dict[str, int] = {}
+        self.failed_joins: Dict[str, int] = {}
+
+    async def do(
+        self, stage: str, key: Hashable, fn: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        if not self.enabled:
+            return await fn()
+        flight_key = (stage, key)
+        error = None
+        for _ in range(self.max_joins):
+            future = self._inflight.get(flight_key)
+            if future is None:
+                break
+            error = None
+            try:
+                # shield: a waiter that goes away must not cancel the leader
+                result = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # this caller was cancelled, not the leader
+            except Exception as e:
+                error = e
+            else:
+                self._count(self.joined, stage)
+                return result
+            self._count(self.failed_joins, stage)
+        else:
+            if error is not None:
+                raise error
+        return await self._lead(stage, flight_key, fn)
+
+    async def _lead(self, stage: str, flight_key: Tuple[str, Hashable], fn) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[flight_key] = future
+        self._count(self.leaders, stage)
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark it retrieved: waiters retry rather than read it, and asyncio
+            # would otherwise log it as never retrieved
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(flight_key) is future:
+                del self._inflight[flight_key]
+        future.set_result(result)
+        return result
+
+    @staticmethod
+    def _count(counts: Dict[str, int], stage: str):
+        counts[stage] = counts.get(stage, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        stages = sorted(set(self.leaders) | set(self.joined))
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._inflight),
+            # Every joined call is an upstream call that did not happen
+            "calls_saved": sum(self.joined.values()),
+            "stages": {
+                stage: {
+                    "calls": self.leaders.get(stage, 0),
+                    "joined": self.joined.get(stage, 0),
+                    "failed_joins": self.failed_joins.get(stage, 0),
+                }
+                for stage in stages
+            },
+        }
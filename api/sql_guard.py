@@ -0,0 +1,240 @@
+# sql_guard.py - Read-only checks and rewrites for LLM-generated SQL before it runs
+import re
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+# Columns that are never returned unless the question names them: a transcript
+# is kilobytes and an embedding is 1536 floats per row.
+HEAVY_COLUMNS = ("embedding", "transcript")
+
+FACT_CALLS_COLUMNS = (
+    "call_id agent_id customer_id date_id duration_seconds call_timestamp "
+    "disposition direction transcript summary embedding audio_url issue_type "
+    "sentiment sentiment_score resolved agent_politeness agent_professionalism "
+    "process_adherence"
+).split()
+
+# Statements are already limited to SELECT/WITH by their first word; these are
+# what can still modify data from inside one (data-modifying CTEs, SELECT INTO).
+FORBIDDEN_KEYWORDS = frozenset(
+    "insert update delete merge truncate drop alter create grant revoke copy into".split()
+)
+FORBIDDEN_FUNCTIONS = frozenset(
+    """pg_sleep pg_sleep_for pg_sleep_until pg_terminate_backend pg_cancel_backend
+    pg_reload_conf set_config pg_read_file pg_read_binary_file pg_ls_dir
+    pg_stat_file lo_import lo_export lo_unlink dblink dblink_exec nextval setval
+    pg_advisory_lock pg_advisory_xact_lock pg_try_advisory_lock
+    pg_notify""".split()
+)
+
+_FENCE_RE = re.compile(r"^```(?:sql)?\s*|\s*```$", re.IGNORECASE)
+_WORD_RE = re.compile(r"[a-z_][a-z0-9_$]*")
+_CALL_RE = re.compile(r"\b([a-z_][a-z0-9_]*)\s*\(")
+_ROW_LOCK_RE = re.compile(r"\bfor\s+(?:no\s+key\s+)?(?:update|share|key\s+share)\b")
+_LIMIT_RE = re.compile(r"\s*(\d+|all)\b")
+_CLAUSE_WORDS = (
+    "where|group|order|limit|offset|having|window|fetch|union|intersect|except|"
+    "join|inner|left|right|full|cross|natural|on|using"
+)
+_FROM_FACT_CALLS_RE = re.compile(
+    rf"\s*(?:public\.)?fact_calls\b(?:\s+(?:as\s+)?(?!(?:{_CLAUSE_WORDS})\b)"
+    r"([a-z_][a-z0-9_]*))?"
+)
+# A select item that returns a column as is: [alias.]column [[AS] name]
+_BARE_COLUMN_RE = re.compile(
+    r"^(?:[a-z_][a-z0-9_]*\.)?([a-z_][a-z0-9_]*)(?:\s+(?:as\s+)?[a-z_][a-z0-9_]*)?$"
+)
+
+
+class SQLGuardError(ValueError):
+    pass
+
+
+@dataclass
+class GuardedSQL:
+    sql: str
+    limit: int
+    strip_columns: List[str]
+    rewrites: List[str] = field(default_factory=list)
+
+
+def _mask(sql: str) -> str:
+    """Blank out comments, string literals and quoted identifiers.
+
+    The result has the same length as ``sql`` and is lowercased, so positions
+    found in it can be used to rewrite the original text.
+    """
+    out = list(sql.lower())
+    i, n = 0, len(sql)
+    while i < n:
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+            blank, i = (i, n if end < 0 else end), n if end < 0 else end
+        elif sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            if end < 0:
+                raise SQLGuardError("unterminated comment")
+            blank, i = (i, end + 2), end + 2
+        elif sql[i] in "'\"":
+            quote, end = sql[i], i + 1
+            while True:
+                end = sql.find(quote, end)
+                if end < 0:
+                    raise SQLGuardError("unterminated quoted string")
+                if not sql.startswith(quote * 2, end):
+                    break
+                end += 2
+            # Keep a literal's quotes so it still separates the words around it
+            blank = (i + 1, end) if quote == "'" else (i, end + 1)
+            i = end + 1
+        elif sql[i] == "$" and re.match(r"\$\w*\$", sql[i:]):
+            raise SQLGuardError("dollar-quoted strings are not allowed")
+        else:
+            i += 1
+            continue
+        out[blank[0] : blank[1]] = " " * (blank[1] - blank[0])
+    return "".join(out)
+
+
+def _depths(masked: str) -> List[int]:
+    depth, depths = 0, []
+    for ch in masked:
+        if ch == ")":
+            depth -= 1
+        depths.append(depth)
+        if ch == "(":
+            depth += 1
+    if depth != 0:
+        raise SQLGuardError("unbalanced parentheses")
+    return depths
+
+
+def _top_level_words(masked: str, depths: List[int]) -> List[Tuple[str, int, int]]:
+    return [
+        (m.group(0), m.start(), m.end())
+        for m in _WORD_RE.finditer(masked)
+        if depths[m.start()] == 0
+        and (m.start() == 0 or not masked[m.start() - 1].isalnum())
+    ]
+
+
+def _split_top_level(text: str, masked: str) -> List[Tuple[int, int]]:
+    spans, start, depth = [], 0, 0
+    for i, ch in enumerate(masked):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            spans.append((start, i))
+            start = i + 1
+    spans.append((start, len(text)))
+    return spans
+
+
+def check_read_only(sql: str) -> str:
+    """Return the masked SQL, or raise SQLGuardError if it could modify anything."""
+    masked = _mask(sql)
+    if ";" in masked:
+        raise SQLGuardError("only a single statement is allowed")
+    words = _WORD_RE.findall(masked)
+    if not words or words[0] not in ("select", "with"):
+        raise SQLGuardError("only SELECT queries are allowed")
+    forbidden = sorted(FORBIDDEN_KEYWORDS.intersection(words))
+    if forbidden:
+        raise SQLGuardError(f"forbidden keyword: {forbidden[0].upper()}")
+    called = FORBIDDEN_FUNCTIONS.intersection(_CALL_RE.findall(masked))
+    if called:
+        raise SQLGuardError(f"forbidden function: {sorted(called)[0]}")
+    if _ROW_LOCK_RE.search(masked):
+        raise SQLGuardError("row locks are not allowed")
+    return masked
+
+
+def _project(
+    sql: str, masked: str, depths: List[int], strip: List[str], rewrites: List[str]
+) -> str:
+    """Rewrite the outer select list so heavy columns are never read."""
+    words = _top_level_words(masked, depths)
+    names = [w for w, _, _ in words]
+    if "select" not in names or {"union", "intersect", "except"} & set(names):
+        return sql
+    # The outer query is the last top-level SELECT (anything before it is a CTE)
+    select = len(names) - 1 - names[::-1].index("select")
+    list_start = words[select][2]
+    if names[select + 1 : select + 2] in (["distinct"], ["all"]):
+        list_start = words[select + 1][2]
+    from_index = next(
+        (i for i in range(select + 1, len(names)) if names[i] == "from"), None
+    )
+    list_end = len(sql) if from_index is None else words[from_index][1]
+
+    # Only a lone fact_calls in FROM says which columns a star stands for
+    stars = set()
+    if from_index is not None:
+        m = _FROM_FACT_CALLS_RE.match(masked, words[from_index][2])
+        rest = names[from_index + 1 :]
+        if m and not masked[m.end() :].lstrip().startswith(",") and "join" not in rest:
+            alias = m.group(1) or "fact_calls"
+            stars = {"*", f"{alias}.*"}
+
+    select_list, masked_list = sql[list_start:list_end], masked[list_start:list_end]
+    kept: List[str] = []
+    for start, end in _split_top_level(select_list, masked_list):
+        item, masked_item = select_list[start:end].strip(), masked_list[start:end].strip()
+        bare = _BARE_COLUMN_RE.match(masked_item)
+        if masked_item in stars:
+            prefix = masked_item[:-1]
+            kept.extend(prefix + c for c in FACT_CALLS_COLUMNS if c not in strip)
+            rewrites.append(f"expanded {item} without {', '.join(strip)}")
+        elif bare and bare.group(1) in strip:
+            rewrites.append(f"dropped {item}")
+        else:
+            kept.append(item)
+    if not kept:
+        raise SQLGuardError(f"query only selects {', '.join(strip)}")
+    if not rewrites:
+        return sql
+    return f"{sql[:list_start]} {', '.join(kept)} {sql[list_end:].lstrip()}".rstrip()
+
+
+def _apply_limit(sql: str, max_rows: int, rewrites: List[str]) -> str:
+    masked = _mask(sql)
+    words = _top_level_words(masked, _depths(masked))
+    names = [w for w, _, _ in words]
+    if "fetch" in names:
+        return sql
+    for word, _, end in reversed(words):
+        if word != "limit":
+            continue
+        m = _LIMIT_RE.match(masked, end)
+        if m and (m.group(1) == "all" or int(m.group(1)) > max_rows):
+            rewrites.append(f"LIMIT {m.group(1).upper()} -> {max_rows}")
+            return f"{sql[: m.start(1)]}{max_rows}{sql[m.end(1):]}"
+        return sql
+    rewrites.append(f"added LIMIT {max_rows}")
+    # On its own line in case the query ends in a -- comment
+    return f"{sql}\nLIMIT {max_rows}"
+
+
+def guard_sql(sql: str, question: str = "", max_rows: int = 200) -> GuardedSQL:
+    """Check ``sql`` is a single read-only SELECT and make it cheap to return.
+
+    Heavy columns not mentioned in ``question`` are projected away from the
+    outer select list, and the outer query is capped at ``max_rows``. Columns
+    that cannot be removed by rewriting (``SELECT *`` over a join or CTE) are
+    listed in ``strip_columns`` for the database function to drop.
+    """
+    sql = _FENCE_RE.sub("", sql.strip()).strip().rstrip(";").strip()
+    if not sql:
+        raise SQLGuardError("empty query")
+    masked = check_read_only(sql)
+    depths = _depths(masked)
+
+    asked = question.lower()
+    strip = [c for c in HEAVY_COLUMNS if c not in asked]
+    rewrites: List[str] = []
+    if strip:
+        sql = _project(sql, masked, depths, strip, rewrites)
+    sql = _apply_limit(sql, max_rows, rewrites)
+    return GuardedSQL(sql=sql, limit=max_rows, strip_columns=strip, rewrites=rewrites)
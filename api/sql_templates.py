@@ -0,0 +1,264 @@
+# sql_templates.py - Parameterized NL-to-SQL templates learned from validated LLM SQL
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+ISSUE_TYPES = (
+    "Returns & Refunds",
+    "Shipping & Logistics",
+    "Order Issues",
+    "Equipment Support",
+    "Business Services",
+    "Account Management",
+    "Appointments & Scheduling",
+)
+SENTIMENTS = ("positive", "negative", "neutral")
+MONTHS = (
+    "january february march april may june july august september october "
+    "november december"
+).split()
+
+# Words that never change what a question asks for. Negations, comparisons and
+# question words are deliberately kept: they change the SQL.
+FILLER = frozenset(
+    """a an the is are was were there please me can could you would do does did i
+    we our us tell show give""".split()
+)
+
+# Near-matches may differ from a template only in these words. Anything else
+# (a question or aggregate word, a negation, a comparison, another table or
+# metric) needs its own template: "how many" and "what" ask for different SQL.
+SOFT_WORDS = frozenset(
+    """took place happened occurred made received handled had have has get got
+    of in on during at for with""".split()
+)
+
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_ISO_DATE_RE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+_MONTH = r"(" + "|".join(m[:3] + r"(?:" + m[3:] + r")?" for m in MONTHS) + r")\.?"
+_MONTH_DAY_RE = re.compile(
+    _MONTH + r"\s+(\d{1,2})(?:st|nd|rd|th)?(?:,?\s+(\d{4}))?\b", re.IGNORECASE
+)
+_DAY_MONTH_RE = re.compile(
+    r"\b(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?" + _MONTH + r"(?:,?\s+(\d{4}))?\b",
+    re.IGNORECASE,
+)
+_QUOTED_RE = re.compile(r"[\"']([^\"']{2,})[\"']")
+_NAME_RE = re.compile(r"\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)+\b")
+_NUMBER_RE = re.compile(r"(?<![\w.])\d+(?:\.\d+)?(?![\w.])")
+_WORD_RE = re.compile(r"<\w+>|[a-z0-9&']+")
+# Dates relative to today: the question means something else tomorrow
+_RELATIVE_DATE_RE = re.compile(
+    r"\b(?:today|tonight|yesterday|tomorrow|ago|recent(?:ly)?|so far|to date"
+    r"|(?:this|last|past|previous|next)\s+(?:\d+\s+)?"
+    r"(?:days?|weeks?|months?|quarters?|years?|monday|tuesday|wednesday|thursday"
+    r"|friday|saturday|sunday)"
+    r"|(?:mon|tues|wednes|thurs|fri|satur|sun)day)\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class Slot:
+    kind: str
+    value: str
+    start: int
+    end: int
+
+
+@dataclass
+class SQLTemplate:
+    kinds: Tuple[str, ...]
+    tokens: frozenset
+    sql: str
+    hits: int = 0
+
+
+def _month_number(name: str) -> int:
+    return next(i for i, m in enumerate(MONTHS, 1) if m.startswith(name.lower()[:3]))
+
+
+def extract_slots(question: str) -> List[Slot]:
+    """Find the literal values in ``question`` (dates, issue types, names, ...)."""
+    found: List[Slot] = []
+
+    def add(kind: str, value: str, start: int, end: int):
+        if not any(s.start < end and start < s.end for s in found):
+            found.append(Slot(kind, value, start, end))
+
+    for m in _EMAIL_RE.finditer(question):
+        add("email", m.group(0), m.start(), m.end())
+    for m in _ISO_DATE_RE.finditer(question):
+        add("date", m.group(0), m.start(), m.end())
+    for regex, month_group, day_group in ((_MONTH_DAY_RE, 1, 2), (_DAY_MONTH_RE, 2, 1)):
+        for m in regex.finditer(question):
+            month, day = _month_number(m.group(month_group)), int(m.group(day_group))
+            if not 1 <= day <= 31:
+                continue
+            if m.group(3):
+                add("date", f"{m.group(3)}-{month:02d}-{day:02d}", m.start(), m.end())
+            else:
+                # No year: only the month-day part is a slot, the year stays in the SQL
+                add("monthday", f"{month:02d}-{day:02d}", m.start(), m.end())
+    lowered = question.lower()
+    for issue in ISSUE_TYPES:
+        start = lowered.find(issue.lower())
+        if start >= 0:
+            add("issue_type", issue, start, start + len(issue))
+    for sentiment in SENTIMENTS:
+        for m in re.finditer(rf"\b{sentiment}\b", lowered):
+            add("sentiment", sentiment, m.start(), m.end())
+    for m in _QUOTED_RE.finditer(question):
+        add("text", m.group(1), m.start(), m.end())
+    for m in _NAME_RE.finditer(question):
+        # A capitalized first word is just the start of the sentence
+        words = m.group(0).split()
+        start = m.start()
+        if start == 0 or question[:start].rstrip().endswith((".", "?", "!")):
+            start += len(words[0]) + 1
+            words = words[1:]
+        if len(words) >= 2 and not any(w.lower() in MONTHS for w in words):
+            add("name", " ".join(words), start, m.end())
+    for m in _NUMBER_RE.finditer(question):
+        add("number", m.group(0), m.start(), m.end())
+
+    return sorted(found, key=lambda s: s.start)
+
+
+def mentions_relative_date(question: str) -> bool:
+    return bool(_RELATIVE_DATE_RE.search(question))
+
+
+def question_shape(question: str, slots: List[Slot]) -> Tuple[str, ...]:
+    parts, last = [], 0
+    for slot in slots:
+        parts.append(question[last : slot.start])
+        parts.append(f" <{slot.kind}> ")
+        last = slot.end
+    parts.append(question[last:])
+    words = _WORD_RE.findall("".join(parts).lower())
+    return tuple(w for w in words if w not in FILLER)
+
+
+def _placeholder(i: int) -> str:
+    return f"{{{{slot{i}}}}}"
+
+
+def _literal_pattern(slot: Slot) -> "re.Pattern[str]":
+    if slot.kind == "number":
+        return re.compile(rf"(?<![\w.]){re.escape(slot.value)}(?![\w.])")
+    return re.compile(re.escape(slot.value), re.IGNORECASE)
+
+
+def _sql_literal(slot: Slot) -> str:
+    if slot.kind == "number":
+        return slot.value
+    return slot.value.replace("'", "''")
+
+
+class SQLTemplateStore:
+    """LRU of question shapes -> SQL with slots, filled without an LLM call.
+
+    ``learn`` generalizes a question and the validated SQL generated for it:
+    every literal found in the question must appear in the SQL (numbers exactly
+    once) or nothing is stored. ``match`` finds a template whose shape equals
+    the new question's, or one with the same slot kinds in the same order that
+    differs only in ``SOFT_WORDS`` and has at least ``min_similarity`` token
+    Jaccard, and fills in the new values.
+    """
+
+    def __init__(self, max_entries: int = 256, min_similarity: float = 0.6):
+        self.max_entries = max_entries
+        self.min_similarity = min_similarity
+        self._templates: "OrderedDict[Tuple[str, ...], SQLTemplate]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.learned = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    def match(self, question: str) -> Optional[Tuple[str, Tuple[str, ...]]]:
+        """Return (filled SQL, template key) or None."""
+        slots = extract_slots(question)
+        shape = question_shape(question, slots)
+        kinds = tuple(s.kind for s in slots)
+        with self._lock:
+            key, template = shape, self._templates.get(shape)
+            if template is None:
+                tokens = frozenset(shape)
+                best = 0.0
+                for k, t in self._templates.items():
+                    if t.kinds != kinds or (tokens ^ t.tokens) - SOFT_WORDS:
+                        continue
+                    score = len(tokens & t.tokens) / (len(tokens | t.tokens) or 1)
+                    if score > best:
+                        key, template, best = k, t, score
+                if best < self.min_similarity:
+                    template = None
+                else:
+                    self.similar_hits += 1
+            if template is None:
+                self.misses += 1
+                return None
+            self._templates.move_to_end(key)
+            template.hits += 1
+            self.hits += 1
+
+        sql = template.sql
+        for i, slot in enumerate(slots):
+            sql = sql.replace(_placeholder(i), _sql_literal(slot))
+        return sql, key
+
+    def learn(self, question: str, sql: str) -> bool:
+        slots = extract_slots(question)
+        template_sql = sql
+        for i, slot in enumerate(slots):
+            pattern = _literal_pattern(slot)
+            occurrences = len(pattern.findall(template_sql))
+            values = [s.value.lower() for s in slots]
+            if (
+                occurrences == 0
+                or (slot.kind == "number" and occurrences > 1)
+                or values.count(slot.value.lower()) > 1
+            ):
+                with self._lock:
+                    self.rejected += 1
+                return False
+            template_sql = pattern.sub(_placeholder(i), template_sql)
+
+        shape = question_shape(question, slots)
+        with self._lock:
+            self._templates[shape] = SQLTemplate(
+                kinds=tuple(s.kind for s in slots),
+                tokens=frozenset(shape),
+                sql=template_sql,
+            )
+            self._templates.move_to_end(shape)
+            while len(self._templates) > self.max_entries:
+                self._templates.popitem(last=False)
+            self.learned += 1
+        return True
+
+    def evict(self, key: Tuple[str, ...]):
+        # Called when SQL filled from this template fails to run
+        with self._lock:
+            if self._templates.pop(key, None) is not None:
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "templates": len(self._templates),
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "learned": self.learned,
+                "rejected": self.rejected,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,318 @@
+# telemetry.py - Per-request stage traces and Prometheus text-format metrics
+import asyncio
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Seconds; chat stages range from sub-ms cache lookups to multi-second completions
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> LabelSet:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: LabelSet, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name, self.help, self.type = name, help, "counter"
+        self._values: Dict[LabelSet, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.type = name, help, "histogram"
+        self.buckets = tuple(sorted(buckets))
+        # label set -> (per-bucket counts, sum, count)
+        self._values: Dict[LabelSet, Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            empty = ([0] * len(self.buckets), 0.0, 0)
+            counts, total, n = self._values.get(key) or empty
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value, n + 1)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, (list(c), s, n)) for k, (c, s, n) in self._values.items()]
+        items.sort(key=lambda item: item[0])
+        lines = []
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = _format_labels(key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {n}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {n}")
+        return lines
+
+
+class Gauge:
+    """Read at scrape time from ``fn``, which returns (labels, value) pairs.
+
+    With ``metric_type="counter"`` it exposes a running total kept elsewhere.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        fn: Callable[[], List[Tuple[Dict[str, Any], float]]],
+        metric_type: str = "gauge",
+    ):
+        self.name, self.help, self.type = name, help, metric_type
+        self.fn = fn
+
+    def samples(self) -> List[str]:
+        try:
+            values = self.fn()
+        except Exception as e:
+            print(f"Gauge {self.name} error: {e}")
+            return []
+        return [
+            f"{self.name}{_format_labels(_labels(labels))} {_format_value(value)}"
+            for labels, value in values
+        ]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self.register(Counter(name, help))
+
+    def histogram(self, name: str, help: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, buckets))
+
+    def gauge(self, name: str, help: str, fn, metric_type: str = "gauge") -> Gauge:
+        return self.register(Gauge(name, help, fn, metric_type))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+REQUEST_SECONDS = metrics.histogram(
+    "convolens_request_duration_seconds", "HTTP request latency by route"
+)
+REQUESTS_TOTAL = metrics.counter(
+    "convolens_requests_total", "HTTP requests by route and status code"
+)
+STAGE_SECONDS = metrics.histogram(
+    "convolens_stage_duration_seconds", "Pipeline stage latency by route and stage"
+)
+TOKENS_TOTAL = metrics.counter(
+    "convolens_tokens_total", "OpenAI tokens by stage and kind (prompt/completion)"
+)
+UPSTREAM_SECONDS = metrics.histogram(
+    "convolens_upstream_duration_seconds", "Upstream call latency by upstream"
+)
+UPSTREAM_TOTAL = metrics.counter(
+    "convolens_upstream_requests_total",
+    "Upstream calls by upstream and outcome (ok/error/timeout/cancelled)",
+)
+
+
+# --- Request traces ---
+class Trace:
+    """Stage timings and token counts for one request."""
+
+    def __init__(self, scope: Optional[Dict[str, Any]] = None):
+        self.scope = scope
+        self.start = time.perf_counter()
+        self.stages: Dict[str, List[float]] = {}  # stage -> [seconds, count]
+        self.tokens: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def route(self) -> str:
+        # The router stores the matched route in the scope; until then (and for
+        # 404s) use a fixed label so unknown paths cannot blow up cardinality
+        route = (self.scope or {}).get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+    def add_stage(self, stage: str, seconds: float):
+        entry = self.stages.setdefault(stage, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+    def add_tokens(self, stage: str, kind: str, count: int):
+        stage_tokens = self.tokens.setdefault(stage, {})
+        stage_tokens[kind] = stage_tokens.get(kind, 0) + count
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 1),
+            "stages": {
+                stage: {"ms": round(seconds * 1000, 1), "count": count}
+                for stage, (seconds, count) in self.stages.items()
+            },
+            "tokens": self.tokens,
+        }
+
+    def server_timing(self) -> str:
+        parts = [
+            f"{stage};dur={seconds * 1000:.1f}"
+            for stage, (seconds, _) in self.stages.items()
+        ]
+        parts.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_current_stage: ContextVar[Optional[str]] = ContextVar("stage", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a pipeline stage; tokens recorded inside it are attributed to it."""
+    trace = _current_trace.get()
+    parent = _current_stage.get()
+    _current_stage.set(stage)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        # set() rather than reset(): async generators may resume in another context
+        _current_stage.set(parent)
+        route = trace.route if trace else "background"
+        STAGE_SECONDS.observe(elapsed, route=route, stage=stage)
+        if trace:
+            trace.add_stage(stage, elapsed)
+
+
+def record_tokens(usage: Any):
+    """Count an OpenAI ``usage`` object against the current stage."""
+    if usage is None:
+        return
+    stage = _current_stage.get() or "unknown"
+    trace = _current_trace.get()
+    for kind in ("prompt", "completion"):
+        count = getattr(usage, f"{kind}_tokens", None) or 0
+        if not count:
+            continue
+        TOKENS_TOTAL.inc(count, stage=stage, kind=kind)
+        if trace:
+            trace.add_tokens(stage, kind, count)
+
+
+@contextmanager
+def upstream_call(upstream: str) -> Iterator[None]:
+    """Time one upstream call and count it by outcome."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    except BaseException as e:
+        # asyncio and OpenAI timeouts (APITimeoutError) are not one exception type
+        if isinstance(e, TimeoutError) or "Timeout" in type(e).__name__:
+            outcome = "timeout"
+        elif isinstance(e, (asyncio.CancelledError, GeneratorExit)):
+            # The client went away (e.g. closed a stream); not an upstream failure
+            outcome = "cancelled"
+        raise
+    finally:
+        UPSTREAM_SECONDS.observe(time.perf_counter() - start, upstream=upstream)
+        UPSTREAM_TOTAL.inc(upstream=upstream, outcome=outcome)
+
+
+class TimingMiddleware:
+    """ASGI middleware that traces each HTTP request.
+
+    Records request latency and status per route template, and adds
+    ``Server-Timing`` and ``X-Timing`` (JSON) headers with the stage breakdown
+    when ``always`` is set or the request carries an ``X-Timing`` header.
+    Streamed responses send headers before any stage has run, so their
+    breakdown is only in the metrics (and the stream's own ``done`` event).
+    """
+
+    def __init__(self, app, always: bool = False, skip_paths: Tuple[str, ...] = ()):
+        self.app = app
+        self.always = always
+        self.skip_paths = skip_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(scope)
+        token = _current_trace.set(trace)
+        wants_headers = self.always or any(
+            name == b"x-timing" for name, _ in scope.get("headers", [])
+        )
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if wants_headers:
+                    summary = json.dumps(trace.summary(), separators=(",", ":"))
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", trace.server_timing().encode()))
+                    headers.append((b"x-timing", summary.encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+            route = trace.route
+            REQUEST_SECONDS.observe(time.perf_counter() - trace.start, route=route)
+            REQUESTS_TOTAL.inc(route=route, status=status)
@@ -0,0 +1,206 @@
+# vector_index.py - In-process mirror of fact_calls embeddings for RAG retrieval
+import json
+import threading
+from typing import Any, Dict, List
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:  # optional, only needed for large corpora
+    hnswlib = None
+
+MIRROR_COLUMNS = (
+    "call_id, agent_id, transcript, summary, sentiment, issue_type, "
+    "call_timestamp, embedding"
+)
+
+
+def parse_embedding(value: Any) -> np.ndarray:
+    # PostgREST returns pgvector columns as their text form, e.g. "[0.1,0.2]"
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
+
+
+def sign_codes(vectors: np.ndarray) -> np.ndarray:
+    """1-bit codes (one bit per dimension, set when positive), packed 8 per byte.
+
+    Matches pgvector's ``binary_quantize``, so Hamming distances agree with
+    the ``embedding_bits`` column.
+    """
+    return np.packbits(vectors > 0, axis=-1)
+
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    return np.bitwise_count(codes ^ query_code).sum(axis=1, dtype=np.int32)
+
+
+class VectorIndex:
+    """Cosine top-k search over a local copy of call embeddings.
+
+    Small corpora use an exact NumPy matrix product. Once the mirror holds
+    ``hnsw_threshold`` rows and ``hnswlib`` is installed, queries go through an
+    HNSW graph instead; the normalized matrix is kept as the source of truth.
+
+    ``dtype="float16"`` halves the matrix. With ``binary_prefilter`` the exact
+    path scans 1-bit sign codes (dims / 8 bytes per row) by Hamming distance
+    and re-ranks only the ``k * rerank_factor`` nearest with the matrix.
+    """
+
+    def __init__(
+        self,
+        dims: int = 1536,
+        hnsw_threshold: int = 50000,
+        ef_search: int = 64,
+        hnsw_m: int = 16,
+        ef_construction: int = 200,
+        dtype: str = "float32",
+        binary_prefilter: bool = False,
+        rerank_factor: int = 8,
+    ):
+        self.dims = dims
+        self.hnsw_threshold = hnsw_threshold
+        self.ef_search = ef_search
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.dtype = np.dtype(dtype)
+        self.binary_prefilter = binary_prefilter
+        self.rerank_factor = rerank_factor
+
+        self._matrix = np.zeros((0, dims), dtype=self.dtype)
+        self._codes = np.zeros((0, (dims + 7) // 8), dtype=np.uint8)
+        self._size = 0
+        self._rows: List[Dict[str, Any]] = []
+        self._positions: Dict[str, int] = {}
+        self._hnsw = None
+        self._lock = threading.RLock()
+        self.ready = False
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _grow(self, needed: int):
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        matrix = np.zeros((new_capacity, self.dims), dtype=self.dtype)
+        matrix[: self._size] = self._matrix[: self._size]
+        self._matrix = matrix
+        if self.binary_prefilter:
+            codes = np.zeros((new_capacity, self._codes.shape[1]), dtype=np.uint8)
+            codes[: self._size] = self._codes[: self._size]
+            self._codes = codes
+        if self._hnsw is not None:
+            self._hnsw.resize_index(new_capacity)
+
+    def _build_hnsw(self):
+        index = hnswlib.Index(space="ip", dim=self.dims)
+        index.init_index(
+            max_elements=self._matrix.shape[0],
+            ef_construction=self.ef_construction,
+            M=self.hnsw_m,
+        )
+        vectors = self._matrix[: self._size].astype(np.float32, copy=False)
+        index.add_items(vectors, np.arange(self._size))
+        index.set_ef(self.ef_search)
+        self._hnsw = index
+
+    def add_rows(self, rows: List[Dict[str, Any]]):
+        """Insert or update rows fetched from fact_calls (with embedding)."""
+        rows = [row for row in rows if row.get("embedding") is not None]
+        if not rows:
+            return
+        vectors = np.stack([parse_embedding(row["embedding"]) for row in rows])
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1.0, norms)
+        codes = sign_codes(vectors) if self.binary_prefilter else None
+
+        with self._lock:
+            self._grow(self._size + len(rows))
+            labels = []
+            for i, (row, vector) in enumerate(zip(rows, vectors)):
+                call_id = str(row["call_id"])
+                meta = {k: v for k, v in row.items() if k != "embedding"}
+                pos = self._positions.get(call_id)
+                if pos is None:
+                    pos = self._size
+                    self._size += 1
+                    self._positions[call_id] = pos
+                    self._rows.append(meta)
+                else:
+                    self._rows[pos] = meta
+                self._matrix[pos] = vector
+                if codes is not None:
+                    self._codes[pos] = codes[i]
+                labels.append(pos)
+
+            if self._hnsw is not None:
+                self._hnsw.add_items(vectors, np.asarray(labels))
+            elif hnswlib is not None and self._size >= self.hnsw_threshold:
+                self._build_hnsw()
+
+    def search(
+        self, query_embedding: List[float], k: int = 5, threshold: float = -1.0
+    ) -> List[Dict[str, Any]]:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        with self._lock:
+            if self._size == 0:
+                return []
+            k = min(k, self._size)
+            if self._hnsw is not None:
+                labels, distances = self._hnsw.knn_query(query, k=k)
+                hits = zip(labels[0].tolist(), (1.0 - distances[0]).tolist())
+            else:
+                if self.binary_prefilter:
+                    candidates = self._prefilter(query, k * self.rerank_factor)
+                    scores = self._scores(self._matrix[candidates], query)
+                else:
+                    candidates = None
+                    scores = self._scores(self._matrix[: self._size], query)
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[np.argsort(-scores[top])]
+                positions = top if candidates is None else candidates[top]
+                hits = zip(positions.tolist(), scores[top].tolist())
+
+            return [
+                {**self._rows[pos], "similarity": float(score)}
+                for pos, score in hits
+                if score > threshold
+            ]
+
+    @staticmethod
+    def _scores(matrix: np.ndarray, query: np.ndarray, block: int = 4096) -> np.ndarray:
+        if matrix.dtype == np.float32:
+            return matrix @ query
+        # Widen half-precision rows a block at a time: a float32 copy of the whole
+        # matrix per query would cost the memory the smaller dtype saves
+        scores = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), block):
+            rows = matrix[start : start + block].astype(np.float32)
+            scores[start : start + block] = rows @ query
+        return scores
+
+    def _prefilter(self, query: np.ndarray, count: int) -> np.ndarray:
+        """Positions of the ``count`` rows nearest to ``query`` by Hamming distance."""
+        distances = hamming_distances(self._codes[: self._size], sign_codes(query))
+        if count >= self._size:
+            return np.arange(self._size)
+        return np.argpartition(distances, count - 1)[:count]
+
+    def stats(self) -> Dict[str, Any]:
+        if self._hnsw is not None:
+            engine = "hnsw"
+        else:
+            engine = "binary+rerank" if self.binary_prefilter else "exact"
+        vector_bytes = self._size * self._matrix.itemsize * self.dims
+        code_bytes = self._size * self._codes.shape[1] if self.binary_prefilter else 0
+        return {
+            "ready": self.ready,
+            "rows": self._size,
+            "engine": engine,
+            "dtype": self.dtype.name,
+            "vector_bytes": vector_bytes + code_bytes,
+        }
@@ -0,0 +1,366 @@
+"""Filtered vector search in Postgres: latency and recall by filter and ef_search.
+
+Loads ``--rows`` synthetic calls (100k by default) into a scratch schema and
+applies the repository's search_similar_calls and search_similar_calls_filtered
+SQL there, so the functions and indexes measured are the ones that ship. For
+each filter scenario it reports:
+
+- ``matching_rows``: how selective the filters are, and ``plan``: the index the
+  planner picks for the nearest-calls scan (HNSW or a btree pre-filter)
+- ``exact``: latency of an exact scan with the same filters (the reference)
+- ``post_filter``: the previous behaviour, the global top-k from
+  search_similar_calls filtered afterwards
+- ``ef_search``: per value, recall@k, mean rows returned and p50/p95 latency of
+  search_similar_calls_filtered
+
+Vectors and queries come from bench_quantized_search (``--vectors`` loads real
+embeddings from an (n, 1536) ``.npy`` array instead). Needs psycopg 3 and a
+Postgres database with pgvector 0.8+ in which the user may create a schema;
+use a scratch database rather than the production one.
+
+Usage (from the repository root):
+    python benchmarks/bench_filtered_search.py --dsn postgresql://postgres@localhost/bench
+    python benchmarks/bench_filtered_search.py --dsn ... --rows 200000 --keep
+    python benchmarks/bench_filtered_search.py --dsn ... --reuse --ef-search 40,400
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+
+import numpy as np
+
+from bench_quantized_search import make_corpus
+from offline_stubs import ISSUE_TYPES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FUNCTIONS_DIR = os.path.join(ROOT, "supabase", "supabase_functions")
+FUNCTION_FILES = ("search_similar_calls.sql", "search_similar_calls_filtered.sql")
+SCHEMA = "bench_filtered_search"
+END_DATE = date(2025, 12, 31)
+
+# The fact_calls columns the search functions read, and the schema.sql indexes
+# the planner can pre-filter with
+TABLE_SQL = """
+CREATE TABLE fact_calls (
+  call_id uuid primary key,
+  agent_id text,
+  date_id date,
+  call_timestamp timestamptz,
+  transcript text,
+  summary text,
+  issue_type text,
+  sentiment text,
+  resolved boolean,
+  embedding vector(1536)
+);
+create index idx_fact_calls_sentiment_ts_id
+  on fact_calls (sentiment, call_timestamp desc, call_id desc);
+create index idx_fact_calls_agent_ts_id
+  on fact_calls (agent_id, call_timestamp desc, call_id desc);
+create index idx_fact_calls_date
+  on fact_calls (date_id);
+-- Stands in for the ivfflat index search_similar_calls.sql drops, so that
+-- unqualified drop finds this one rather than one in public
+create index idx_fact_calls_embedding
+  on fact_calls (call_id);
+"""
+
+SCENARIOS = {
+    "none": {},
+    "issue_type": {"issue_type": "Returns & Refunds"},
+    "negative_refunds_last_week": {
+        "issue_type": "Returns & Refunds",
+        "sentiment": "negative",
+        "date_from": END_DATE - timedelta(days=6),
+        "date_to": END_DATE,
+    },
+    "last_30_days": {"date_from": END_DATE - timedelta(days=29)},
+    "one_agent": {"agent_id": "agent-007"},
+    "unresolved": {"resolved": False},
+}
+# Filter name -> predicate on fact_calls fc
+PREDICATES = {
+    "date_from": "fc.date_id >= %s",
+    "date_to": "fc.date_id <= %s",
+    "agent_id": "fc.agent_id = %s",
+    "issue_type": "fc.issue_type = %s",
+    "sentiment": "fc.sentiment = %s",
+    "resolved": "fc.resolved = %s",
+}
+
+
+def elapsed_ms(start):
+    return (time.perf_counter() - start) * 1000
+
+
+def percentile(samples, pct):
+    return round(float(np.percentile(samples, pct)), 3) if samples else None
+
+
+def vector_text(vector):
+    return "[" + ",".join(f"{x:.6g}" for x in vector.tolist()) + "]"
+
+
+def where(filters):
+    clauses = ["fc.embedding IS NOT NULL"]
+    clauses += [PREDICATES[name] for name in filters]
+    return " AND ".join(clauses), list(filters.values())
+
+
+def load(conn, vectors, args):
+    rng = np.random.default_rng(args.seed)
+    # Skewed like real call mixes: a few issue types, agents and days dominate
+    issue_weights = np.linspace(2.0, 0.5, len(ISSUE_TYPES))
+    issues = rng.choice(
+        ISSUE_TYPES, len(vectors), p=issue_weights / issue_weights.sum()
+    )
+    agents = rng.zipf(1.3, len(vectors)) % args.agents
+    days = rng.integers(0, args.days, len(vectors))
+    negative = rng.random(len(vectors)) < 0.4
+    resolved = rng.random(len(vectors)) < 0.75
+
+    start = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute(TABLE_SQL)
+        columns = (
+            "call_id, agent_id, date_id, call_timestamp, summary, issue_type, "
+            "sentiment, resolved, embedding"
+        )
+        with cur.copy(f"COPY fact_calls ({columns}) FROM STDIN") as copy:
+            for i, vector in enumerate(vectors):
+                day = END_DATE - timedelta(days=int(days[i]))
+                copy.write_row(
+                    (
+                        uuid.UUID(int=i + 1),
+                        f"agent-{agents[i]:03d}",
+                        day,
+                        datetime.combine(day, dt_time(12), timezone.utc),
+                        f"Synthetic call {i}",
+                        issues[i],
+                        "negative" if negative[i] else "positive",
+                        bool(resolved[i]),
+                        vector_text(vector),
+                    )
+                )
+                if i and i % 20000 == 0:
+                    print(f"loaded {i} rows", file=sys.stderr)
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'")
+        for name in FUNCTION_FILES:
+            with open(os.path.join(FUNCTIONS_DIR, name)) as f:
+                cur.execute(f.read())
+        cur.execute("ANALYZE fact_calls")
+    return {
+        "load_s": round(load_s, 1),
+        "index_s": round(time.perf_counter() - start, 1),
+    }
+
+
+def first_scan(plan):
+    """Index (or relation, for a sequential scan) of the first scan in a plan."""
+    if "Index Name" in plan:
+        return plan["Index Name"]
+    if plan.get("Node Type") == "Seq Scan":
+        return f"seq scan on {plan['Relation Name']}"
+    for child in plan.get("Plans", []):
+        found = first_scan(child)
+        if found:
+            return found
+    return None
+
+
+def scan_plan(conn, query_text, filters, k, ef_search):
+    # The filtered function's inner query, planned with the same settings
+    conditions, values = where(filters)
+    with conn.transaction(), conn.cursor() as cur:
+        cur.execute("SELECT set_config('hnsw.ef_search', %s, TRUE)", (str(ef_search),))
+        # As in the function: the parameter only exists from pgvector 0.8
+        cur.execute(
+            "SELECT set_config('hnsw.iterative_scan', 'relaxed_order', TRUE) "
+            "FROM pg_extension WHERE extname = 'vector' "
+            "AND string_to_array(extversion, '.')::int[] >= ARRAY[0, 8]"
+        )
+        cur.execute(
+            f"EXPLAIN (FORMAT JSON) SELECT fc.call_id FROM fact_calls fc "
+            f"WHERE {conditions} ORDER BY fc.embedding <=> %s::vector LIMIT %s",
+            [*values, query_text, k],
+        )
+        return first_scan(cur.fetchone()[0][0]["Plan"])
+
+
+def exact_search(conn, query_text, filters, k):
+    conditions, values = where(filters)
+    with conn.transaction(), conn.cursor() as cur:
+        cur.execute("SET LOCAL enable_indexscan = off")
+        cur.execute("SET LOCAL enable_bitmapscan = off")
+        cur.execute(
+            f"SELECT fc.call_id FROM fact_calls fc WHERE {conditions} "
+            f"ORDER BY fc.embedding <=> %s::vector LIMIT %s",
+            [*values, query_text, k],
+        )
+        return [row[0] for row in cur.fetchall()]
+
+
+def post_filter_search(conn, query_text, filters, k, ef_search):
+    conditions, values = where(filters)
+    with conn.transaction(), conn.cursor() as cur:
+        cur.execute("SELECT set_config('hnsw.ef_search', %s, TRUE)", (str(ef_search),))
+        cur.execute(
+            f"SELECT s.call_id FROM search_similar_calls(%s::vector, -1, %s) s "
+            f"JOIN fact_calls fc ON fc.call_id = s.call_id WHERE {conditions}",
+            [query_text, k, *values],
+        )
+        return [row[0] for row in cur.fetchall()]
+
+
+def filtered_search(conn, query_text, filters, k, ef_search):
+    named = ", ".join(f"filter_{name} => %s" for name in filters)
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT call_id FROM search_similar_calls_filtered("
+            "query_embedding => %s::vector, match_threshold => -1, match_count => %s, "
+            f"ef_search => %s{', ' + named if named else ''})",
+            [query_text, k, ef_search, *filters.values()],
+        )
+        return [row[0] for row in cur.fetchall()]
+
+
+def timed(fn, queries, *args):
+    hits, samples = [], []
+    for query_text in queries:
+        start = time.perf_counter()
+        hits.append(fn(query_text, *args))
+        samples.append(elapsed_ms(start))
+    return hits, samples
+
+
+def recall(hits, exact, k):
+    found = sum(len(set(h) & set(e)) for h, e in zip(hits, exact))
+    possible = sum(min(k, len(e)) for e in exact)
+    return round(found / possible, 4) if possible else None
+
+
+def run(conn, args):
+    vectors, queries = make_corpus(args)
+    queries = [vector_text(q) for q in queries]
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT count(*) FROM information_schema.tables "
+            "WHERE table_schema = %s AND table_name = 'fact_calls'",
+            (SCHEMA,),
+        )
+        exists = cur.fetchone()[0] > 0
+        if exists and not args.reuse:
+            cur.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+            exists = False
+        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}")
+        # Supabase installs pgvector into "extensions"
+        cur.execute(f"SET search_path = {SCHEMA}, public, extensions")
+
+    results = {
+        "config": {
+            "rows": len(vectors),
+            "queries": len(queries),
+            "k": args.k,
+            "ef_search": args.ef_search,
+        }
+    }
+    if not exists:
+        results["load"] = load(conn, vectors, args)
+
+    k, warm_ef = args.k, args.ef_search[0]
+    results["scenarios"] = {}
+    for name, filters in SCENARIOS.items():
+        conditions, values = where(filters)
+        with conn.cursor() as cur:
+            cur.execute(
+                f"SELECT count(*) FROM fact_calls fc WHERE {conditions}", values
+            )
+            matching = cur.fetchone()[0]
+
+        exact, exact_ms = timed(lambda q: exact_search(conn, q, filters, k), queries)
+        scenario = {
+            "filters": {f: str(v) for f, v in filters.items()},
+            "matching_rows": matching,
+            "plan": scan_plan(conn, queries[0], filters, k, warm_ef),
+            "exact": {"p50_ms": percentile(exact_ms, 50)},
+        }
+        hits, samples = timed(
+            lambda q: post_filter_search(conn, q, filters, k, warm_ef), queries
+        )
+        scenario["post_filter"] = {
+            "recall_at_k": recall(hits, exact, k),
+            "rows_returned": round(float(np.mean([len(h) for h in hits])), 2),
+            "p50_ms": percentile(samples, 50),
+        }
+        scenario["ef_search"] = {}
+        for ef_search in args.ef_search:
+            hits, samples = timed(
+                lambda q: filtered_search(conn, q, filters, k, ef_search), queries
+            )
+            scenario["ef_search"][str(ef_search)] = {
+                "recall_at_k": recall(hits, exact, k),
+                "rows_returned": round(float(np.mean([len(h) for h in hits])), 2),
+                "p50_ms": percentile(samples, 50),
+                "p95_ms": percentile(samples, 95),
+            }
+        results["scenarios"][name] = scenario
+        print(f"scenario {name} done", file=sys.stderr)
+
+    if not args.keep:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument(
+        "--ef-search",
+        type=lambda value: [int(v) for v in value.split(",")],
+        default=[40, 100, 200],
+        help="comma-separated hnsw.ef_search values",
+    )
+    parser.add_argument("--agents", type=int, default=50)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--spread", type=float, default=1.0)
+    parser.add_argument("--offset", type=float, default=0.5)
+    parser.add_argument("--query-noise", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--vectors", help=".npy array of embeddings to use instead")
+    parser.add_argument("--maintenance-work-mem", default="1GB")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema")
+    parser.add_argument(
+        "--reuse", action="store_true", help="measure a schema kept with --keep"
+    )
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("--dsn (or DATABASE_URL) is required")
+    if args.vectors:
+        args.vectors = os.path.abspath(args.vectors)
+
+    import psycopg
+
+    with psycopg.connect(args.dsn, autocommit=True) as conn:
+        results = run(conn, args)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
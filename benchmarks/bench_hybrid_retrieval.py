@@ -0,0 +1,223 @@
+"""Compare BM25, vector-only and hybrid (RRF) retrieval on the tadhack-2025 vCons.
+
+Recall@k is measured on the bundled corpus with two query sets: exact-term
+questions (customer names and terms that occur in a single transcript) and
+semantic questions built from each call's summary. Latency is measured on the
+corpus replicated ``--scale`` times with perturbed vectors.
+
+Usage (from the repository root):
+    python benchmarks/bench_hybrid_retrieval.py --embeddings openai --scale 200
+    python benchmarks/bench_hybrid_retrieval.py --embeddings hashed --output out.json
+
+``--embeddings openai`` needs OPENAI_API_KEY and caches vectors in
+.bench_embeddings.sqlite3; ``hashed`` uses a deterministic character-trigram
+stand-in so the script runs offline (vector numbers are then only indicative).
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "api"))
+
+from bm25 import BM25Index, reciprocal_rank_fusion, tokenize  # noqa: E402
+from embedding_cache import EmbeddingCache  # noqa: E402
+from vector_index import VectorIndex  # noqa: E402
+
+VCON_GLOB = os.path.join(ROOT, "db_ingestion", "tadhack-2025", "*", "*.vcon.json")
+DIMS = 1536
+
+
+def load_calls():
+    calls = []
+    for path in sorted(glob.glob(VCON_GLOB)):
+        with open(path) as f:
+            data = json.load(f)
+        transcript, summary = "", ""
+        for analysis in data.get("analysis", []):
+            if analysis["type"] == "transcript":
+                transcript = analysis["body"].get("transcript", "")
+            elif analysis["type"] == "summary":
+                summary = analysis["body"]
+        customer = next((p for p in data["parties"] if p["role"] == "customer"), {})
+        calls.append(
+            {
+                "call_id": data["uuid"],
+                "call_timestamp": data["created_at"],
+                "transcript": transcript,
+                "summary": summary,
+                "customer_name": customer.get("name", ""),
+            }
+        )
+    return calls
+
+
+def build_queries(calls):
+    names = Counter(c["customer_name"] for c in calls)
+    doc_freq = Counter(t for c in calls for t in set(tokenize(c["transcript"])))
+    exact, semantic = [], []
+    for call in calls:
+        if call["customer_name"] and names[call["customer_name"]] == 1:
+            exact.append((f"Calls with {call['customer_name']}", call["call_id"]))
+        rare = [
+            t
+            for t in tokenize(call["transcript"])
+            if doc_freq[t] == 1 and len(t) > 5 and t.isalpha()
+        ]
+        if rare:
+            question = f"Were there any calls mentioning {rare[0]}?"
+            exact.append((question, call["call_id"]))
+        # Drop the names so the semantic set is not trivially lexical
+        topic = re.sub(r"[A-Z][a-z]+ [A-Z][a-z]+", "someone", call["summary"])
+        semantic.append((topic, call["call_id"]))
+    return {"exact_term": exact, "semantic": semantic}
+
+
+def hashed_embedding(text):
+    vec = np.zeros(DIMS, dtype=np.float32)
+    text = f"  {text.lower()}  "
+    for i in range(len(text) - 2):
+        h = int.from_bytes(hashlib.md5(text[i : i + 3].encode()).digest()[:4], "little")
+        vec[h % DIMS] += 1.0 if h & 1 << 31 else -1.0
+    return vec.tolist()
+
+
+def make_embedder(kind):
+    if kind == "hashed":
+        return lambda texts: [hashed_embedding(t) for t in texts]
+
+    from openai import OpenAI
+
+    client = OpenAI()
+    cache = EmbeddingCache(path=os.path.join(ROOT, ".bench_embeddings.sqlite3"))
+    model = "text-embedding-ada-002"
+
+    def embed(texts):
+        out = [cache.get(t, model) for t in texts]
+        missing = [i for i, v in enumerate(out) if v is None]
+        for start in range(0, len(missing), 64):
+            batch = missing[start : start + 64]
+            response = client.embeddings.create(
+                model=model, input=[texts[i][:8000] for i in batch]
+            )
+            for i, item in zip(batch, response.data):
+                out[i] = item.embedding
+                cache.put(texts[i], model, item.embedding)
+        return out
+
+    return embed
+
+
+def percentile(samples, pct):
+    return round(float(np.percentile(samples, pct)) * 1000, 3) if samples else None
+
+
+def run(args):
+    calls = load_calls()
+    queries = build_queries(calls)
+    embed = make_embedder(args.embeddings)
+
+    call_vectors = embed([c["transcript"] for c in calls])
+    query_vectors = {name: embed([q for q, _ in qs]) for name, qs in queries.items()}
+
+    def build(scale):
+        rng = np.random.default_rng(7)
+        vindex, bindex = VectorIndex(dims=DIMS), BM25Index()
+        for rep in range(scale):
+            rows = []
+            for call, vector in zip(calls, call_vectors):
+                vector = np.asarray(vector, dtype=np.float32)
+                call_id = call["call_id"]
+                if rep:
+                    call_id = f"{call_id}-{rep}"
+                    vector = vector + rng.normal(0, 0.01, DIMS).astype(np.float32)
+                rows.append({**call, "call_id": call_id, "embedding": vector})
+            vindex.add_rows(rows)
+            bindex.add_rows(rows)
+        return vindex, bindex
+
+    def retrieve(method, vindex, bindex, question, vector, k):
+        if method == "bm25":
+            return [row for row, _ in bindex.search(question, k=k)]
+        if method == "vector":
+            return vindex.search(vector, k=k)
+        return reciprocal_rank_fusion(
+            [
+                vindex.search(vector, k=args.candidates),
+                [row for row, _ in bindex.search(question, k=args.candidates)],
+            ],
+            limit=k,
+        )
+
+    methods = ("bm25", "vector", "hybrid")
+    results = {"embeddings": args.embeddings, "calls": len(calls), "k": args.k}
+
+    vindex, bindex = build(1)
+    recall = {}
+    for name, qs in queries.items():
+        recall[name] = {}
+        for method in methods:
+            found = sum(
+                target
+                in {
+                    str(r["call_id"])
+                    for r in retrieve(method, vindex, bindex, q, v, args.k)
+                }
+                for (q, target), v in zip(qs, query_vectors[name])
+            )
+            recall[name][method] = round(found / len(qs), 4) if qs else None
+    results["recall_at_k"] = recall
+
+    vindex, bindex = build(args.scale)
+    results["scaled_calls"] = len(vindex)
+    results["bm25_postings_bytes"] = bindex.stats()["postings_bytes"]
+    latency = {}
+    all_queries = [
+        (q, v)
+        for name, qs in queries.items()
+        for (q, _), v in zip(qs, query_vectors[name])
+    ]
+    for method in methods:
+        samples = []
+        for q, v in all_queries:
+            start = time.perf_counter()
+            retrieve(method, vindex, bindex, q, v, args.k)
+            samples.append(time.perf_counter() - start)
+        latency[method] = {
+            "p50_ms": percentile(samples, 50),
+            "p95_ms": percentile(samples, 95),
+        }
+    results["latency"] = latency
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--embeddings",
+        choices=("openai", "hashed"),
+        default="openai" if os.getenv("OPENAI_API_KEY") else "hashed",
+    )
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--scale", type=int, default=100)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = run(args)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,481 @@
+"""Offline end-to-end benchmark of ingestion, /api/chat and the dashboard.
+
+Everything runs in-process against the deterministic stand-ins in
+offline_stubs.py, so no OpenAI or Supabase requests are made and the same
+arguments give comparable numbers from run to run. The bundled tadhack-2025
+vCons are replicated ``--scale`` times (new uuids, shifted dates), ingested
+with db_ingestion/ingest_vcons.py into the SQLite stand-in, and then served by
+api/main.py. Reported:
+
+- ingestion files/sec and OpenAI requests/tokens
+- p50/p95/p99 latency and throughput per /api/chat mode (sql, rag, schedule),
+  plus time to first token for /api/chat/stream
+- a burst of one new question sent by every client at once, with the OpenAI
+  calls it made and the calls that request coalescing saved
+- /api/dashboard latency on a rebuild and on a cache hit, and the time of each
+  dashboard RPC
+
+Usage (from the repository root):
+    python benchmarks/bench_offline.py --scale 20 --output bench.json
+    python benchmarks/bench_offline.py --baseline bench.json --fail-on-regression
+
+With ``--baseline`` every latency (``*_ms``, lower is better) and throughput
+(``*per_sec``, higher is better) is compared against the earlier run and
+changes beyond ``--tolerance`` are listed as regressions.
+"""
+import argparse
+import asyncio
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "api"))
+sys.path.insert(0, os.path.join(ROOT, "db_ingestion"))
+
+from bench_hybrid_retrieval import VCON_GLOB, percentile  # noqa: E402
+from offline_stubs import (  # noqa: E402
+    ISSUE_TYPES,
+    FakeAsyncOpenAI,
+    FakeModel,
+    FakeOpenAI,
+    FakeSupabase,
+    Usage,
+)
+
+SCHEDULE_NAMES = ("Ralph", "Alice", "Marcus", "Priya", "Dana", "Tom")
+
+
+def configure_environment(args):
+    # main.py and ingest_vcons.py read these at import time; nothing may reach a real service
+    os.environ.update(
+        SUPABASE_URL="http://offline.invalid",
+        SUPABASE_KEY="offline",
+        OPENAI_API_KEY="offline",
+        EMBEDDING_CACHE_PATH="",
+        # Hashed stand-in embeddings are less similar than real ones
+        RAG_MATCH_THRESHOLD="0",
+        VECTOR_INDEX_ENABLED="false",
+        HYBRID_SEARCH_ENABLED="false",
+    )
+    if args.no_answer_cache:
+        os.environ["ANSWER_CACHE_THRESHOLD"] = "2"
+
+
+def scaled_vcons(scale):
+    originals = []
+    for path in sorted(glob.glob(VCON_GLOB)):
+        with open(path) as f:
+            originals.append(json.load(f))
+    for rep in range(scale):
+        for data in originals:
+            if rep:
+                data = json.loads(json.dumps(data))
+                data["uuid"] = str(
+                    uuid.uuid5(uuid.NAMESPACE_URL, f"{data['uuid']}/{rep}")
+                )
+                created = datetime.fromisoformat(
+                    data["created_at"].replace("Z", "+00:00")
+                )
+                data["created_at"] = (created + timedelta(days=7 * rep)).isoformat()
+                for party in data["parties"]:
+                    if party.get("role") == "customer" and party.get("mailto"):
+                        local, _, domain = party["mailto"].partition("@")
+                        party["mailto"] = f"{local}+{rep}@{domain}"
+            yield data
+
+
+def latency_summary(samples, wall):
+    return {
+        "requests": len(samples),
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3) if samples else None,
+        "per_sec": round(len(samples) / wall, 2) if wall else None,
+    }
+
+
+def run_ingestion(args, supabase, workdir):
+    import ingest_vcons
+
+    source = os.path.join(workdir, "vcons.ndjson")
+    with open(source, "w") as f:
+        files = 0
+        for data in scaled_vcons(args.scale):
+            f.write(json.dumps(data) + "\n")
+            files += 1
+
+    usage = Usage()
+    ingest_vcons.client = FakeOpenAI(
+        FakeModel(
+            chat_ms=args.chat_latency_ms,
+            token_ms=args.token_latency_ms,
+            embedding_ms=args.embedding_latency_ms,
+            usage=usage,
+        )
+    )
+    ingest_vcons.supabase = supabase
+    argv = sys.argv
+    sys.argv = [
+        "ingest_vcons.py",
+        source,
+        "--manifest",
+        os.path.join(workdir, "manifest.sqlite3"),
+        "--embedding-rpm",
+        "0",
+        "--chat-rpm",
+        "0",
+    ]
+    try:
+        start = time.perf_counter()
+        # One line per file otherwise
+        with contextlib.redirect_stdout(io.StringIO()):
+            ingest_vcons.main()
+        elapsed = time.perf_counter() - start
+    finally:
+        sys.argv = argv
+
+    written = supabase.count("fact_calls")
+    return {
+        "files": files,
+        "written": written,
+        "chunks": supabase.count("fact_call_chunks"),
+        "elapsed_s": round(elapsed, 3),
+        "files_per_sec": round(written / elapsed, 2) if elapsed else None,
+        "openai": usage.snapshot(),
+    }
+
+
+def build_questions(supabase, n):
+    dates = [
+        r["date_id"]
+        for r in supabase.query(
+            "SELECT DISTINCT date_id FROM fact_calls ORDER BY date_id"
+        )
+    ]
+    summaries = [
+        r["summary"]
+        for r in supabase.query(
+            "SELECT summary FROM fact_calls WHERE summary != '' ORDER BY call_id"
+        )
+    ]
+
+    sql = []
+    for i in range(n):
+        kind = i % 4
+        if kind == 0 and dates:
+            day = datetime.fromisoformat(dates[i // 4 % len(dates)])
+            sql.append(
+                f"How many calls took place on {day.strftime('%B')} {day.day} {day.year}?"
+            )
+        elif kind == 1:
+            sql.append(
+                f"How many {ISSUE_TYPES[i // 4 % len(ISSUE_TYPES)]} calls were there?"
+            )
+        elif kind == 2:
+            issue = ISSUE_TYPES[i // 4 % len(ISSUE_TYPES)]
+            sql.append(f"What was the average call duration for {issue} calls?")
+        else:
+            # Long result: exercises local result summarization
+            sql.append("Show me a list of all calls with their sentiment")
+    rag = (
+        [
+            "Were there any calls about " + " ".join(s.split()[:8]).rstrip(".,") + "?"
+            for s in (summaries[i % len(summaries)] for i in range(n))
+        ]
+        if summaries
+        else []
+    )
+    schedule = [
+        f"Can you schedule a call with {SCHEDULE_NAMES[i % len(SCHEDULE_NAMES)]} "
+        f"tomorrow at {1 + i % 11}pm?"
+        for i in range(n)
+    ]
+    return {"sql": sql, "rag": rag, "schedule": schedule}
+
+
+async def run_requests(client, path, questions, concurrency, stream=None):
+    """POST each question to ``path``; with ``stream`` (main.chat_event_stream) the
+    SSE generator is consumed directly, since httpx's ASGI transport buffers whole
+    responses and would hide the time to first token."""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples, first_tokens, modes, errors, cached = [], [], {}, 0, 0
+    stage_ms = {}
+
+    async def one(question):
+        nonlocal errors, cached
+        async with semaphore:
+            start = time.perf_counter()
+            if stream:
+                first, ok = None, True
+                async for event in stream(question):
+                    if first is None and event.startswith("event: token"):
+                        first = time.perf_counter() - start
+                    ok = ok and not event.startswith("event: error")
+                ok = ok and first is not None
+                if first is not None:
+                    first_tokens.append(first)
+            else:
+                r = await client.post(
+                    path, json={"question": question}, headers={"X-Timing": "1"}
+                )
+                ok = r.status_code == 200
+                if ok:
+                    body = r.json()
+                    stages = json.loads(r.headers["X-Timing"])["stages"]
+                    for stage, entry in stages.items():
+                        stage_ms.setdefault(stage, []).append(entry["ms"])
+                    cached += bool(body.get("cached"))
+                    mode = body["metadata"].get("route", {}).get("mode", "cached")
+                    modes[mode] = modes.get(mode, 0) + 1
+            samples.append(time.perf_counter() - start)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in questions))
+    result = latency_summary(samples, time.perf_counter() - start)
+    result.update(errors=errors)
+    if stream:
+        result["first_token_p50_ms"] = percentile(first_tokens, 50)
+        result["first_token_p95_ms"] = percentile(first_tokens, 95)
+    else:
+        result.update(cached=cached, routed=modes)
+        # Where the time went, from the API's own X-Timing breakdown
+        result["stage_mean_ms"] = {
+            stage: round(sum(ms) / len(ms), 3) for stage, ms in sorted(stage_ms.items())
+        }
+    return result
+
+
+async def run_api(args, supabase, usage):
+    import httpx
+
+    import main
+
+    main.openai_client = FakeAsyncOpenAI(
+        FakeModel(
+            chat_ms=args.chat_latency_ms,
+            token_ms=args.token_latency_ms,
+            embedding_ms=args.embedding_latency_ms,
+            answer_tokens=args.answer_tokens,
+            usage=usage,
+        )
+    )
+    main.supabase = supabase
+
+    def schedule_call_event(start_dt, summary="Call with agent", timezone=None):
+        time.sleep(args.calendar_latency_ms / 1000)
+        return f"https://calendar.invalid/event?title={summary.replace(' ', '+')}"
+
+    main.schedule_call_event = schedule_call_event
+
+    questions = build_questions(supabase, args.requests)
+    results = {"chat": {}, "openai": {}}
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=120
+    ) as client:
+        for mode, qs in questions.items():
+            usage.reset()
+            results["chat"][mode] = await run_requests(
+                client, "/api/chat", qs, args.concurrency
+            )
+            results["openai"][mode] = usage.snapshot()
+        usage.reset()
+        results["chat"]["rag_stream"] = await run_requests(
+            client,
+            "/api/chat/stream",
+            [q.replace("Were there", "Have there been") for q in questions["rag"]],
+            args.concurrency,
+            stream=lambda q: main.chat_event_stream(main.ChatRequest(question=q)),
+        )
+        results["openai"]["rag_stream"] = usage.snapshot()
+
+        # The same new question from several clients at once (voice assistant
+        # plus dashboard tabs); coalescing lets them share each upstream call
+        usage.reset()
+        burst = [f"Quick check: {questions['rag'][0]}"] * args.concurrency
+        results["chat"]["burst"] = await run_requests(
+            client, "/api/chat", burst, args.concurrency
+        )
+        results["openai"]["burst"] = usage.snapshot()
+        results["coalescing"] = main.single_flight.stats()
+
+        # Dashboard: every rebuild runs all RPCs; a hit is served from the payload cache
+        for name in main.DASHBOARD_RPCS:
+            supabase.timings.pop(name, None)
+        rebuild, hit = [], []
+        for _ in range(args.dashboard_requests):
+            supabase.version += 1
+            main.data_version_state["checked_at"] = 0.0
+            start = time.perf_counter()
+            r = await client.get("/api/dashboard")
+            rebuild.append(time.perf_counter() - start)
+            assert r.status_code == 200, r.text
+            start = time.perf_counter()
+            await client.get("/api/dashboard")
+            hit.append(time.perf_counter() - start)
+        results["dashboard"] = {
+            "rebuild": latency_summary(rebuild, sum(rebuild)),
+            "cache_hit": latency_summary(hit, sum(hit)),
+            "rpcs": {
+                name: latency_summary(
+                    supabase.timings[name], sum(supabase.timings[name])
+                )
+                for name in main.DASHBOARD_RPCS
+            },
+        }
+        results["sql_templates"] = main.sql_templates.stats()
+    return results
+
+
+def flatten(tree, prefix=""):
+    flat = {}
+    for key, value in tree.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    current, previous = flatten(results), flatten(baseline)
+    regressions, improvements = [], []
+    for metric, new in current.items():
+        old = previous.get(metric)
+        lower_is_better = metric.endswith("_ms")
+        if not old or not (lower_is_better or metric.endswith("per_sec")):
+            continue
+        # Sub-millisecond timings (and throughputs derived from them) are noise
+        mean = metric.rsplit(".", 1)[0] + ".mean_ms"
+        if lower_is_better and abs(new - old) < min_delta_ms:
+            continue
+        if (
+            not lower_is_better
+            and max(current.get(mean, 0), previous.get(mean, 0)) < min_delta_ms
+        ):
+            continue
+        change = (new - old) / old
+        entry = {
+            "metric": metric,
+            "baseline": old,
+            "current": new,
+            "change_pct": round(change * 100, 1),
+        }
+        worse = change > tolerance if lower_is_better else change < -tolerance
+        better = change < -tolerance if lower_is_better else change > tolerance
+        if worse:
+            regressions.append(entry)
+        elif better:
+            improvements.append(entry)
+    return {
+        "tolerance": tolerance,
+        "regressions": regressions,
+        "improvements": improvements,
+    }
+
+
+def run(args):
+    configure_environment(args)
+    supabase = FakeSupabase()
+    results = {
+        "config": {
+            key: getattr(args, key)
+            for key in (
+                "scale",
+                "requests",
+                "concurrency",
+                "dashboard_requests",
+                "chat_latency_ms",
+                "token_latency_ms",
+                "embedding_latency_ms",
+                "calendar_latency_ms",
+                "answer_tokens",
+                "no_answer_cache",
+            )
+        },
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        results["ingestion"] = run_ingestion(args, supabase, workdir)
+    # The API logs to stdout; keep stdout for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        results.update(asyncio.run(run_api(args, supabase, Usage())))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scale",
+        type=int,
+        default=10,
+        help="copies of the bundled vCons to ingest and serve",
+    )
+    parser.add_argument(
+        "--requests", type=int, default=40, help="requests per chat mode"
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--dashboard-requests", type=int, default=20)
+    parser.add_argument("--chat-latency-ms", type=float, default=200.0)
+    parser.add_argument(
+        "--token-latency-ms",
+        type=float,
+        default=1.0,
+        help="extra chat latency per completion token",
+    )
+    parser.add_argument("--embedding-latency-ms", type=float, default=40.0)
+    parser.add_argument("--calendar-latency-ms", type=float, default=150.0)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument(
+        "--no-answer-cache",
+        action="store_true",
+        help="disable the semantic answer cache",
+    )
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="earlier --output to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.10,
+        help="relative change that counts as a regression",
+    )
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=1.0,
+        help="ignore latency changes smaller than this",
+    )
+    parser.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        help="exit with status 1 when any metric regressed",
+    )
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.baseline:
+        with open(args.baseline) as f:
+            results["comparison"] = compare(
+                results, json.load(f), args.tolerance, args.min_delta_ms
+            )
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.fail_on_regression and results.get("comparison", {}).get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Compact embedding tier: memory, recall@k and latency of quantized vector search.
+
+Each configuration of the in-process VectorIndex is built over the same
+corpus and measured against exact float32 search:
+
+- ``exact/float32``: the full matrix product (the reference)
+- ``exact/float16``: the same over half-precision vectors
+- ``binary+rerank/<dtype>/x<factor>``: Hamming distance over 1-bit sign codes
+  picks ``k * factor`` candidates, which are re-ranked with the stored vectors
+
+Reported per configuration: bytes held per million calls, recall@k against
+the exact top-k, and p50/p95 query latency. The ``postgres`` section gives the
+per-row size of the ``embedding`` and ``embedding_bits`` columns that
+search_similar_calls_quantized reads.
+
+The synthetic corpus is clustered (``--clusters``) around a shared offset,
+like OpenAI embeddings, whose components are not centred on zero; queries are
+corpus vectors with noise added. Sign-code recall depends on how much closer
+true neighbours are than the rest (try ``--spread 3 --query-noise 3``), so
+check it on real embeddings too: ``--vectors`` loads an (n, 1536) ``.npy``
+array, e.g. a dump of fact_calls.embedding, in place of the synthetic rows.
+
+Usage (from the repository root):
+    python benchmarks/bench_quantized_search.py --rows 100000 --output quant.json
+    python benchmarks/bench_quantized_search.py --rows 20000 --rerank-factors 4,16
+    python benchmarks/bench_quantized_search.py --vectors embeddings.npy
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "api"))
+
+from vector_index import VectorIndex  # noqa: E402
+
+DIMS = 1536
+
+
+def make_corpus(args):
+    rng = np.random.default_rng(args.seed)
+    if args.vectors:
+        vectors = np.load(args.vectors).astype(np.float32)
+        args.rows = len(vectors)
+    else:
+        vectors = synthetic_vectors(args, rng)
+    picks = rng.integers(0, args.rows, args.queries)
+    noise = rng.normal(0, args.query_noise, (args.queries, DIMS)).astype(np.float32)
+    # Noise relative to the vector length, so real and synthetic rows compare
+    scale = np.linalg.norm(vectors[picks], axis=1, keepdims=True) / np.sqrt(DIMS)
+    queries = vectors[picks] + noise * scale
+    return vectors, queries
+
+
+def synthetic_vectors(args, rng):
+    offset = rng.normal(0, args.offset, DIMS).astype(np.float32)
+    centers = rng.normal(0, 1, (args.clusters, DIMS)).astype(np.float32)
+    vectors = np.empty((args.rows, DIMS), dtype=np.float32)
+    for start in range(0, args.rows, 10000):
+        n = min(10000, args.rows - start)
+        members = centers[rng.integers(0, args.clusters, n)]
+        noise = rng.normal(0, args.spread, (n, DIMS)).astype(np.float32)
+        vectors[start : start + n] = offset + members + noise
+    return vectors
+
+
+def build(vectors, **options):
+    index = VectorIndex(dims=DIMS, hnsw_threshold=len(vectors) + 1, **options)
+    for start in range(0, len(vectors), 5000):
+        rows = [
+            {"call_id": start + i, "embedding": vector}
+            for i, vector in enumerate(vectors[start : start + 5000])
+        ]
+        index.add_rows(rows)
+    return index
+
+
+def percentile(samples, pct):
+    return round(float(np.percentile(samples, pct)) * 1000, 3) if samples else None
+
+
+def measure(index, queries, k):
+    hits, samples = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results = index.search(query.copy(), k=k)
+        samples.append(time.perf_counter() - start)
+        hits.append([row["call_id"] for row in results])
+    return hits, samples
+
+
+def run(args):
+    vectors, queries = make_corpus(args)
+    configs = [("exact/float32", {}), ("exact/float16", {"dtype": "float16"})]
+    for dtype in ("float32", "float16"):
+        for factor in args.rerank_factors:
+            options = {
+                "dtype": dtype,
+                "binary_prefilter": True,
+                "rerank_factor": factor,
+            }
+            configs.append((f"binary+rerank/{dtype}/x{factor}", options))
+
+    results = {
+        "config": {
+            "rows": args.rows,
+            "queries": args.queries,
+            "k": args.k,
+            "clusters": args.clusters,
+        },
+        "postgres": {
+            # varlena header + payload: vector is 4 bytes a dimension, bit 1 bit
+            "embedding_bytes_per_row": 8 + 4 * DIMS,
+            "embedding_bits_bytes_per_row": 8 + DIMS // 8,
+        },
+        "configs": {},
+    }
+    exact = None
+    for name, options in configs:
+        index = build(vectors, **options)
+        hits, samples = measure(index, queries, args.k)
+        if exact is None:
+            exact = hits
+        found = sum(len(set(h) & set(e)) for h, e in zip(hits, exact))
+        stats = index.stats()
+        results["configs"][name] = {
+            "mb_per_million_calls": round(
+                stats["vector_bytes"] / stats["rows"] * 1e6 / 2**20, 1
+            ),
+            "recall_at_k": round(found / (len(exact) * args.k), 4),
+            "p50_ms": percentile(samples, 50),
+            "p95_ms": percentile(samples, 95),
+        }
+        del index
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument(
+        "--rerank-factors",
+        type=lambda value: [int(v) for v in value.split(",")],
+        default=[4, 8, 16],
+        help="comma-separated candidate multipliers for the binary prefilter",
+    )
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--spread", type=float, default=1.0)
+    parser.add_argument("--offset", type=float, default=0.5)
+    parser.add_argument("--query-noise", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--vectors", help=".npy array of embeddings to use instead")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = run(args)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""Cold-start benchmark: import time, startup, first request and Calendar setup.
+
+Every sample runs in a fresh interpreter, so module caches and warm
+connections from one sample never help the next. Reported (median of
+``--runs`` samples):
+
+- ``import``: time to ``import main``, whether the Google client libraries were
+  loaded by it, and the slowest top-level imports (from ``-X importtime``)
+- ``first_request``: import plus lifespan startup, then the first and second
+  ``GET /health`` against the offline Supabase stand-in
+- ``calendar``: what preparing the Google Calendar service costs (library
+  import, service-account key parsing and discovery document build), which
+  the API used to pay on every scheduling request; when main.py has a client
+  registry, the first and a cached ``clients.get("calendar")`` as well. Token
+  requests to Google are not made, so the per-request OAuth round trip that
+  caching also saves is not part of these numbers.
+
+Usage (from the repository root):
+    python benchmarks/bench_startup.py --runs 7 --output startup.json
+    python benchmarks/bench_startup.py --baseline startup.json
+
+To compare against another revision, check its api/ directory out somewhere
+and point ``--api-dir`` at it:
+    git worktree add /tmp/before HEAD~1
+    python benchmarks/bench_startup.py --api-dir /tmp/before/api --output before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(ROOT, "api")
+
+PROBE_ENV = {
+    "SUPABASE_URL": "http://offline.invalid",
+    "SUPABASE_KEY": "offline",
+    "OPENAI_API_KEY": "offline",
+    "EMBEDDING_CACHE_PATH": "",
+    "VECTOR_INDEX_ENABLED": "false",
+    "HYBRID_SEARCH_ENABLED": "false",
+}
+IMPORT_TIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+
+def elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+def write_service_account_key(path):
+    # A throwaway key: parsing it costs the same as a real one
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "type": "service_account",
+                "project_id": "offline",
+                "private_key_id": "offline",
+                "private_key": pem,
+                "client_email": "bench@offline.iam.gserviceaccount.com",
+                "client_id": "0",
+                "token_uri": "https://oauth2.googleapis.com/token",
+            },
+            f,
+        )
+
+
+# --- Probes (each runs in its own interpreter and prints one JSON object) ---
+def probe_import():
+    start = time.perf_counter()
+    import main  # noqa: F401
+
+    return {
+        "import_ms": elapsed_ms(start),
+        "google_loaded": "googleapiclient.discovery" in sys.modules,
+        "modules_loaded": len(sys.modules),
+    }
+
+
+def probe_first_request():
+    start = time.perf_counter()
+    import httpx
+
+    import main
+    from offline_stubs import FakeSupabase
+
+    import_ms = elapsed_ms(start)
+    main.supabase = FakeSupabase()
+
+    async def requests():
+        transport = httpx.ASGITransport(app=main.app)
+        async with main.lifespan(main.app), httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            started_ms = elapsed_ms(start)
+            timings = {}
+            for name in ("first_request_ms", "second_request_ms"):
+                t = time.perf_counter()
+                r = await client.get("/health")
+                assert r.status_code == 200, r.text
+                timings[name] = elapsed_ms(t)
+            return started_ms, timings
+
+    started_ms, timings = asyncio.run(requests())
+    return {"import_ms": import_ms, "startup_ms": started_ms, **timings}
+
+
+def probe_calendar():
+    import main
+
+    results = {}
+    start = time.perf_counter()
+    from google.oauth2 import service_account
+    from googleapiclient.discovery import build
+
+    results["google_import_ms"] = elapsed_ms(start)
+
+    start = time.perf_counter()
+    credentials = service_account.Credentials.from_service_account_file(
+        os.environ["GOOGLE_CALENDAR_CREDENTIALS"],
+        scopes=["https://www.googleapis.com/auth/calendar"],
+    )
+    build("calendar", "v3", credentials=credentials, cache_discovery=False)
+    results["service_setup_ms"] = elapsed_ms(start)
+
+    if hasattr(main, "clients"):
+        for name in ("first_get_ms", "cached_get_ms"):
+            start = time.perf_counter()
+            main.clients.get("calendar")
+            results[name] = elapsed_ms(start)
+    return results
+
+
+PROBES = {
+    "import": probe_import,
+    "first_request": probe_first_request,
+    "calendar": probe_calendar,
+}
+
+
+def run_probe(name, api_dir, extra_env=None):
+    env = {**os.environ, **PROBE_ENV, **(extra_env or {})}
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--probe", name],
+        env=env,
+        cwd=api_dir,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    # main.py may print while starting; the probe's JSON is the last line
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def median_of(samples):
+    summary = {}
+    for key, value in samples[0].items():
+        values = [s[key] for s in samples]
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            summary[key] = value
+        else:
+            summary[key] = round(statistics.median(values), 3)
+            if key.endswith("_ms"):
+                summary[key.replace("_ms", "_min_ms")] = round(min(values), 3)
+    return summary
+
+
+def slowest_imports(api_dir, top):
+    """Top-level imports of main by cumulative time, from ``-X importtime``."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env={**os.environ, **PROBE_ENV},
+        cwd=api_dir,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports = []
+    for line in proc.stderr.splitlines():
+        m = IMPORT_TIME_RE.match(line)
+        # Two spaces of indentation: imported directly by main
+        if m and len(m.group(3)) == 3:
+            imports.append((m.group(4), int(m.group(2)) / 1000))
+    imports.sort(key=lambda item: item[1], reverse=True)
+    return {name: round(ms, 1) for name, ms in imports[:top]}
+
+
+def run(args):
+    api_dir = os.path.abspath(args.api_dir)
+    results = {"config": {"runs": args.runs, "api_dir": api_dir}}
+    results["import"] = median_of(
+        [run_probe("import", api_dir) for _ in range(args.runs)]
+    )
+    results["import"]["slowest_ms"] = slowest_imports(api_dir, args.top_imports)
+    results["first_request"] = median_of(
+        [run_probe("first_request", api_dir) for _ in range(args.runs)]
+    )
+    with tempfile.TemporaryDirectory() as workdir:
+        key_path = os.path.join(workdir, "service-account.json")
+        write_service_account_key(key_path)
+        env = {"GOOGLE_CALENDAR_CREDENTIALS": key_path, "CALENDAR_ID": "offline"}
+        results["calendar"] = median_of(
+            [run_probe("calendar", api_dir, env) for _ in range(args.runs)]
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per probe")
+    parser.add_argument("--top-imports", type=int, default=8)
+    parser.add_argument("--api-dir", default=API_DIR, help="api/ directory to measure")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="earlier --output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--min-delta-ms", type=float, default=2.0)
+    parser.add_argument("--probe", choices=PROBES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        # Probes run with the measured api/ directory as their working directory
+        sys.path.insert(0, os.getcwd())
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        result = PROBES[args.probe]()
+        print(json.dumps(result))
+        return
+
+    results = run(args)
+    if args.baseline:
+        from bench_offline import compare
+
+        with open(args.baseline) as f:
+            results["comparison"] = compare(
+                results, json.load(f), args.tolerance, args.min_delta_ms
+            )
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Measure how much RAG evidence survives token-budgeted context packing.
+
+For each question in context_packing_eval.json the top-k calls are retrieved
+with BM25 over the bundled vCons, packed at several token budgets, and checked
+for the expected evidence phrase. The unpacked (indent=2 JSON) prompt size is
+reported alongside so savings can be compared against evidence retention.
+
+Usage (from the repository root):
+    python benchmarks/eval_context_packing.py --budgets 300 600 1500
+"""
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "api"))
+
+from bench_hybrid_retrieval import load_calls  # noqa: E402
+from bm25 import BM25Index  # noqa: E402
+from context_packing import pack_context  # noqa: E402
+
+EVAL_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "context_packing_eval.json"
+)
+
+
+def run(args):
+    with open(EVAL_PATH) as f:
+        items = json.load(f)
+    calls = load_calls()
+    index = BM25Index()
+    index.add_rows(calls)
+
+    retrieved = {}
+    for item in items:
+        retrieved[item["question"]] = [
+            row for row, _ in index.search(item["question"], k=args.k)
+        ]
+    hit_rate = sum(
+        item["call_id"] in {r["call_id"] for r in retrieved[item["question"]]}
+        for item in items
+    ) / len(items)
+
+    budgets = {}
+    for budget in args.budgets:
+        kept, used, original = 0, 0, 0
+        for item in items:
+            docs = retrieved[item["question"]]
+            text, report = pack_context(item["question"], docs, budget)
+            kept += item["evidence"].lower() in text.lower()
+            used += report["tokens_used"]
+            original += report["tokens_original"]
+        budgets[str(budget)] = {
+            "evidence_retained": round(kept / len(items), 4),
+            "avg_tokens_used": round(used / len(items), 1),
+            "avg_tokens_original": round(original / len(items), 1),
+            "tokens_saved_pct": round(100 * (1 - used / original), 1),
+        }
+
+    return {
+        "questions": len(items),
+        "k": args.k,
+        "retrieval_hit_rate": round(hit_rate, 4),
+        "budgets": budgets,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[300, 600, 1500])
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = run(args)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
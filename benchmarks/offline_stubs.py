@@ -0,0 +1,664 @@
+"""Deterministic local stand-ins for OpenAI and Supabase, used by bench_offline.py.
+
+FakeOpenAI / FakeAsyncOpenAI answer embeddings and chat completions (streamed
+or not) after a configurable latency, and count requests and tokens. Answers
+are picked from the prompt, so the API and the ingester take their real code
+paths: the SQL assistant gets runnable SQL, the ingestion classifier gets the
+JSON it expects, and so on.
+
+FakeSupabase keeps the schema's tables in SQLite and implements the part of
+the PostgREST query builder and the RPCs that api/main.py and
+db_ingestion/ingest_vcons.py call. Its numbers are indicative of the Python
+side of each path, not of Postgres.
+"""
+import asyncio
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import defaultdict
+from types import SimpleNamespace
+
+import numpy as np
+
+from context_packing import count_tokens
+
+DIMS = 1536
+ISSUE_TYPES = (
+    "Returns & Refunds",
+    "Shipping & Logistics",
+    "Order Issues",
+    "Equipment Support",
+    "Business Services",
+    "Account Management",
+    "Appointments & Scheduling",
+)
+MONTHS = (
+    "january february march april may june july august september october "
+    "november december"
+).split()
+
+
+def hashed_embedding(text):
+    # Signed word hashing: texts sharing words get a positive cosine similarity
+    vec = np.zeros(DIMS, dtype=np.float32)
+    for word in re.findall(r"[a-z0-9']+", text.lower()):
+        h = zlib.crc32(word.encode())
+        vec[h % DIMS] += 1.0 if h & 1 << 31 else -1.0
+    norm = np.linalg.norm(vec)
+    return (vec / norm if norm else vec).tolist()
+
+
+def _stable_random(text):
+    return random.Random(zlib.crc32(text.encode()))
+
+
+class Usage:
+    """Request, token and latency counters shared by the fake clients."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = defaultdict(int)
+            self.prompt_tokens = defaultdict(int)
+            self.completion_tokens = defaultdict(int)
+            self.inputs = 0
+
+    def add(self, kind, prompt_tokens, completion_tokens=0, inputs=0):
+        with self._lock:
+            self.requests[kind] += 1
+            self.prompt_tokens[kind] += prompt_tokens
+            self.completion_tokens[kind] += completion_tokens
+            self.inputs += inputs
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = {
+                kind: {
+                    "requests": self.requests[kind],
+                    "prompt_tokens": self.prompt_tokens[kind],
+                    "completion_tokens": self.completion_tokens[kind],
+                }
+                for kind in sorted(self.requests)
+            }
+            snapshot["embedding_inputs"] = self.inputs
+            return snapshot
+
+
+class FakeModel:
+    """Latency model and canned answers shared by the sync and async clients.
+
+    A chat completion takes ``chat_ms`` plus ``token_ms`` per completion token;
+    an embeddings request takes ``embedding_ms``.
+    """
+
+    def __init__(
+        self,
+        chat_ms=200.0,
+        token_ms=1.0,
+        embedding_ms=40.0,
+        answer_tokens=120,
+        usage=None,
+    ):
+        self.chat_ms = chat_ms
+        self.token_ms = token_ms
+        self.embedding_ms = embedding_ms
+        self.answer_tokens = answer_tokens
+        self.usage = usage or Usage()
+
+    def embed(self, inputs):
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        tokens = sum(count_tokens(text) for text in inputs)
+        self.usage.add("embeddings", tokens, inputs=len(inputs))
+        data = [
+            SimpleNamespace(embedding=hashed_embedding(t), index=i)
+            for i, t in enumerate(inputs)
+        ]
+        response = SimpleNamespace(
+            data=data, usage=SimpleNamespace(prompt_tokens=tokens, total_tokens=tokens)
+        )
+        return response, self.embedding_ms / 1000
+
+    def complete(self, messages):
+        prompt = messages[-1]["content"]
+        kind, content = self.reply(prompt)
+        prompt_tokens = count_tokens(prompt)
+        completion_tokens = count_tokens(content)
+        self.usage.add(kind, prompt_tokens, completion_tokens)
+        delay = (self.chat_ms + self.token_ms * completion_tokens) / 1000
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        )
+        return content, usage, delay
+
+    def reply(self, prompt):
+        quoted = re.search(r'Prompt: "(.*)"', prompt)
+        question = quoted.group(1) if quoted else ""
+        if "You are a classifier" in prompt:
+            return "route", route_for_question(question)
+        if "You are an SQL assistant" in prompt:
+            return "sql", sql_for_question(question)
+        if "extracts datetime" in prompt:
+            return "schedule", "2025-06-02T15:00:00"
+        if "meeting title" in prompt:
+            name = re.search(r"with ([A-Z]\w+)", question)
+            return "schedule", f"Call with {name.group(1) if name else 'Agent'}"
+        if "You are analyzing a transcript" in prompt:
+            return "classify", json.dumps(classification_for(prompt))
+        text = self.answer_text(prompt)
+        if '"confidence"' in prompt:
+            return "answer", json.dumps(
+                {"answer": text, "confidence": "high", "sources": []}
+            )
+        if "exact format" in prompt:
+            return "answer", json.dumps({"answer": text})
+        return "answer", text
+
+    def answer_text(self, prompt):
+        rng = _stable_random(prompt)
+        words = re.findall(r"[A-Za-z]{4,}", prompt) or ["calls"]
+        # ~4 chars per token; answer_tokens words is close enough for latency purposes
+        return " ".join(rng.choice(words) for _ in range(self.answer_tokens)) + "."
+
+
+def route_for_question(question):
+    lowered = question.lower()
+    if re.search(r"\b(schedule|book|set up)\b", lowered):
+        return "schedule"
+    if re.search(r"\b(how many|count|average|total|list|show)\b", lowered):
+        return "sql"
+    return "rag"
+
+
+def sql_for_question(question):
+    """SQL the fake SQL assistant writes; literals come from the question."""
+    lowered = question.lower()
+    m = re.search(
+        r"\b(" + "|".join(MONTHS) + r")\s+(\d{1,2})(?:st|nd|rd|th)?,?\s+(\d{4})",
+        lowered,
+    )
+    if m:
+        date = f"{m.group(3)}-{MONTHS.index(m.group(1)) + 1:02d}-{int(m.group(2)):02d}"
+        return f"SELECT COUNT(*) AS calls FROM fact_calls WHERE date_id = '{date}'"
+    issue = next((i for i in ISSUE_TYPES if i.lower() in lowered), None)
+    if issue and "average" in lowered:
+        return (
+            "SELECT AVG(duration_seconds) AS avg_duration FROM fact_calls "
+            f"WHERE issue_type = '{issue}'"
+        )
+    if issue:
+        return f"SELECT COUNT(*) AS calls FROM fact_calls WHERE issue_type = '{issue}'"
+    if "list" in lowered or "show" in lowered:
+        return (
+            "SELECT call_id, agent_id, call_timestamp, issue_type, sentiment, "
+            "duration_seconds FROM fact_calls ORDER BY call_timestamp"
+        )
+    return "SELECT issue_type, COUNT(*) AS calls FROM fact_calls GROUP BY issue_type"
+
+
+def classification_for(prompt):
+    rng = _stable_random(prompt)
+    score = round(rng.random(), 2)
+    return {
+        "issue_type": rng.choice(ISSUE_TYPES),
+        "sentiment": "positive" if score >= 0.5 else "negative",
+        "sentiment_score": score,
+        "resolved": rng.random() < 0.7,
+        "agent_politeness": round(rng.uniform(0.5, 1.0), 2),
+        "agent_professionalism": round(rng.uniform(0.5, 1.0), 2),
+        "process_adherence": round(rng.uniform(0.4, 1.0), 2),
+    }
+
+
+def _message_response(content, usage):
+    message = SimpleNamespace(role="assistant", content=content)
+    return SimpleNamespace(
+        choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+        usage=usage,
+    )
+
+
+def _stream_pieces(content, size=4):
+    words = content.split(" ")
+    for i in range(0, len(words), size):
+        piece = " ".join(words[i : i + size]) + (" " if i + size < len(words) else "")
+        delta = SimpleNamespace(content=piece)
+        yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta)])
+
+
+class _AsyncStream:
+    def __init__(self, content, delay, first_token_ms, usage=None):
+        self._chunks = list(_stream_pieces(content))
+        if usage is not None:
+            # stream_options={"include_usage": True}: a last chunk without choices
+            self._chunks.append(SimpleNamespace(choices=[], usage=usage))
+        self._first = first_token_ms / 1000
+        self._gap = max(delay - self._first, 0.0) / max(len(self._chunks), 1)
+
+    async def __aiter__(self):
+        await asyncio.sleep(self._first)
+        for chunk in self._chunks:
+            await asyncio.sleep(self._gap)
+            yield chunk
+
+
+class FakeOpenAI:
+    """Synchronous client (db_ingestion uses ``OpenAI``)."""
+
+    def __init__(self, model=None):
+        self.model = model or FakeModel()
+        self.embeddings = SimpleNamespace(create=self._embed)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+
+    def _embed(self, model, input, **kwargs):
+        response, delay = self.model.embed(input)
+        time.sleep(delay)
+        return response
+
+    def _chat(self, messages, stream=False, **kwargs):
+        content, usage, delay = self.model.complete(messages)
+        time.sleep(delay)
+        return _message_response(content, usage)
+
+
+class FakeAsyncOpenAI:
+    """Asynchronous client (api/main.py uses ``AsyncOpenAI``)."""
+
+    def __init__(self, model=None):
+        self.model = model or FakeModel()
+        self.embeddings = SimpleNamespace(create=self._embed)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+
+    async def _embed(self, model, input, **kwargs):
+        response, delay = self.model.embed(input)
+        await asyncio.sleep(delay)
+        return response
+
+    async def _chat(self, messages, stream=False, stream_options=None, **kwargs):
+        content, usage, delay = self.model.complete(messages)
+        if stream:
+            # The first token arrives after the fixed part of the latency
+            include_usage = (stream_options or {}).get("include_usage")
+            return _AsyncStream(
+                content, delay, self.model.chat_ms, usage if include_usage else None
+            )
+        await asyncio.sleep(delay)
+        return _message_response(content, usage)
+
+
+# --- Supabase stand-in ---
+SCHEMA = """
+CREATE TABLE dim_agents (agent_id TEXT PRIMARY KEY, name TEXT, email TEXT);
+CREATE TABLE dim_customers (customer_id TEXT PRIMARY KEY, name TEXT, email TEXT, phone TEXT);
+CREATE TABLE fact_calls (
+    call_id TEXT PRIMARY KEY, agent_id TEXT, customer_id TEXT, date_id TEXT,
+    duration_seconds INTEGER, call_timestamp TEXT, disposition TEXT, direction TEXT,
+    transcript TEXT, summary TEXT, embedding TEXT, embedding_bits TEXT, audio_url TEXT,
+    issue_type TEXT, sentiment TEXT, sentiment_score REAL, resolved BOOLEAN,
+    agent_politeness REAL, agent_professionalism REAL, process_adherence REAL,
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+CREATE INDEX idx_fact_calls_date ON fact_calls (date_id);
+CREATE TABLE fact_call_chunks (
+    call_id TEXT, chunk_index INTEGER, turn_start INTEGER, turn_end INTEGER,
+    content TEXT, token_count INTEGER, embedding TEXT,
+    PRIMARY KEY (call_id, chunk_index)
+);
+"""
+PRIMARY_KEYS = {
+    "dim_agents": ("agent_id",),
+    "dim_customers": ("customer_id",),
+    "fact_calls": ("call_id",),
+    "fact_call_chunks": ("call_id", "chunk_index"),
+}
+
+# The dashboard functions as they read before the rollup tables, in SQLite
+DASHBOARD_SQL = {
+    "get_call_summary": """
+        WITH fact_data AS (
+            SELECT COUNT(*) AS total_calls, AVG(duration_seconds) AS avg_duration,
+                   AVG(sentiment_score) AS avg_sentiment,
+                   SUM(duration_seconds) AS total_duration
+            FROM fact_calls),
+        freq_sentiment AS (
+            SELECT sentiment_score FROM fact_calls GROUP BY sentiment_score
+            ORDER BY COUNT(*) DESC LIMIT 1),
+        freq_issue AS (
+            SELECT issue_type, COUNT(issue_type) AS issue_count FROM fact_calls
+            GROUP BY issue_type ORDER BY COUNT(issue_type) DESC LIMIT 1),
+        busy_agents AS (
+            SELECT a.name, SUM(f.duration_seconds) AS total_duration FROM fact_calls f
+            JOIN dim_agents a ON f.agent_id = a.agent_id
+            GROUP BY a.name ORDER BY SUM(f.duration_seconds) DESC LIMIT 1),
+        pct_positive AS (
+            SELECT 100.0 * (SUM(sentiment = 'positive') - SUM(sentiment = 'negative'))
+                   / COUNT(*) AS pct FROM fact_calls)
+        SELECT f.total_calls, ROUND(f.avg_duration, 2) AS avg_duration_in_sec,
+               ROUND(f.avg_sentiment, 2) AS avg_sentiment,
+               s.sentiment_score AS frequent_sentiment, i.issue_type AS top_issue,
+               i.issue_count, a.name AS busiest_agent,
+               a.total_duration AS total_duration_in_sec,
+               ROUND(p.pct, 2) AS pct_positive
+        FROM fact_data f, freq_sentiment s, freq_issue i, busy_agents a, pct_positive p
+    """,
+    "get_weekday_call_counts": """
+        SELECT CASE CAST(strftime('%w', date_id) AS INTEGER)
+                   WHEN 0 THEN 'Sunday' WHEN 1 THEN 'Monday' WHEN 2 THEN 'Tuesday'
+                   WHEN 3 THEN 'Wednesday' WHEN 4 THEN 'Thursday' WHEN 5 THEN 'Friday'
+                   ELSE 'Saturday' END AS weekday,
+               COUNT(*) AS call_count
+        FROM fact_calls GROUP BY strftime('%w', date_id) ORDER BY strftime('%w', date_id)
+    """,
+    "get_issue_counts": """
+        SELECT issue_type, COUNT(*) AS issue_count FROM fact_calls GROUP BY issue_type
+    """,
+    "get_issue_distribution": """
+        SELECT issue_type, 100.0 * COUNT(*) / SUM(COUNT(*)) OVER () AS issue_dist
+        FROM fact_calls GROUP BY issue_type
+    """,
+    "get_daily_resolution_status": """
+        SELECT date_id, SUM(resolved = 1) AS resolved, SUM(resolved = 0) AS unresolved
+        FROM fact_calls GROUP BY date_id ORDER BY date_id
+    """,
+    "get_daily_sentiment_pct": """
+        SELECT date_id, SUM(sentiment = 'positive') * 100.0 / COUNT(*) AS positive_pct,
+               SUM(sentiment = 'negative') * 100.0 / COUNT(*) AS negative_pct
+        FROM fact_calls GROUP BY date_id ORDER BY date_id
+    """,
+    "get_call_center_metrics": """
+        SELECT COUNT(*) AS total_conversations,
+               (SELECT COUNT(*) FROM fact_calls
+                WHERE date_id = (SELECT MAX(date_id) FROM fact_calls)) AS latest_agent_count,
+               ROUND(AVG(duration_seconds), 2) AS avg_handle_time,
+               ROUND(AVG(sentiment_score), 2) AS avg_sentiment_score
+        FROM fact_calls
+    """,
+}
+
+
+class _Matrix:
+    """Embeddings of one table, reloaded from SQLite after writes."""
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.version = -1
+        self.rows = []
+        self.vectors = np.zeros((0, DIMS), dtype=np.float32)
+
+
+class FakeSupabase:
+    def __init__(self, path=":memory:", rpc_ms=0.0):
+        self.rpc_ms = rpc_ms
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.version = 0
+        self.timings = defaultdict(list)
+        self._matrices = {
+            "search_similar_calls": _Matrix(
+                "SELECT call_id, agent_id, transcript, summary, sentiment, issue_type, "
+                "call_timestamp, embedding FROM fact_calls WHERE embedding IS NOT NULL"
+            ),
+            "search_similar_calls_filtered": _Matrix(
+                "SELECT call_id, agent_id, transcript, summary, sentiment, issue_type, "
+                "call_timestamp, date_id, resolved, embedding FROM fact_calls "
+                "WHERE embedding IS NOT NULL"
+            ),
+            "search_similar_chunks": _Matrix(
+                "SELECT c.call_id, c.chunk_index, c.content, f.agent_id, f.summary, "
+                "f.sentiment, f.issue_type, f.call_timestamp, c.embedding "
+                "FROM fact_call_chunks c JOIN fact_calls f ON f.call_id = c.call_id "
+                "WHERE c.embedding IS NOT NULL"
+            ),
+        }
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def rpc(self, name, params=None):
+        return _RPC(self, name, params or {})
+
+    def query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params).fetchall()]
+
+    def write(self, sql, rows, table):
+        with self._lock:
+            self._db.executemany(sql, rows)
+            self._db.commit()
+            if table in ("fact_calls", "fact_call_chunks"):
+                self.version += 1
+
+    def count(self, table):
+        return self.query(f"SELECT COUNT(*) AS n FROM {table}")[0]["n"]
+
+    # --- RPCs ---
+    def call_rpc(self, name, params):
+        if name == "get_data_version":
+            return self.version
+        if name in DASHBOARD_SQL:
+            return self.query(DASHBOARD_SQL[name])
+        if name == "search_similar_calls_quantized":
+            # Answered exactly; bench_quantized_search measures what quantizing costs
+            return self._search("search_similar_calls", params)
+        if name in self._matrices:
+            return self._search(name, params)
+        if name == "run_sql_guarded":
+            rows = self.query(f"SELECT * FROM ({params['query']})")
+            strip = set(params.get("strip_columns") or ())
+            result = [{k: v for k, v in row.items() if k not in strip} for row in rows]
+            return {"rejected": False, "cost": 0.0, "result": result}
+        raise ValueError(f"unknown rpc {name}")
+
+    def _search(self, name, params):
+        matrix = self._matrices[name]
+        if matrix.version != self.version:
+            rows = self.query(matrix.sql)
+            matrix.vectors = np.asarray(
+                [json.loads(row.pop("embedding")) for row in rows], dtype=np.float32
+            ).reshape(len(rows), DIMS)
+            matrix.rows, matrix.version = rows, self.version
+        if not matrix.rows:
+            return []
+        query = np.asarray(params["query_embedding"], dtype=np.float32)
+        norms = np.linalg.norm(matrix.vectors, axis=1) * (np.linalg.norm(query) or 1.0)
+        scores = matrix.vectors @ query / np.where(norms == 0, 1.0, norms)
+        if name == "search_similar_calls_filtered":
+            keep = [matches_filters(row, params) for row in matrix.rows]
+            scores = np.where(keep, scores, -np.inf)
+        order = np.argsort(-scores)[: params["match_count"]]
+        return [
+            {**matrix.rows[i], "similarity": float(scores[i])}
+            for i in order
+            if scores[i] > params["match_threshold"]
+        ]
+
+
+# search_similar_calls_filtered parameters: (column, test against the row value)
+FILTER_TESTS = {
+    "filter_date_from": ("date_id", lambda value, bound: value >= bound),
+    "filter_date_to": ("date_id", lambda value, bound: value <= bound),
+    "filter_agent_id": ("agent_id", lambda value, bound: value == bound),
+    "filter_issue_type": ("issue_type", lambda value, bound: value == bound),
+    "filter_sentiment": ("sentiment", lambda value, bound: value == bound),
+    "filter_resolved": ("resolved", lambda value, bound: bool(value) == bound),
+}
+
+
+def matches_filters(row, params):
+    for param, (column, test) in FILTER_TESTS.items():
+        bound = params.get(param)
+        if bound is None:
+            continue
+        if row[column] is None or not test(row[column], bound):
+            return False
+    return True
+
+
+class _RPC:
+    def __init__(self, db, name, params):
+        self.db = db
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        start = time.perf_counter()
+        if self.db.rpc_ms:
+            time.sleep(self.db.rpc_ms / 1000)
+        data = self.db.call_rpc(self.name, self.params)
+        self.db.timings[self.name].append(time.perf_counter() - start)
+        return SimpleNamespace(data=data, count=None)
+
+
+class _Query:
+    """The PostgREST builder calls used by the API and the ingester."""
+
+    def __init__(self, db, table):
+        self.db = db
+        self.table_name = table
+        self.action = "select"
+        self.columns = "*"
+        self.want_count = False
+        self.filters = []
+        self.params = []
+        self.orders = []
+        self.limit_n = None
+        self.rows = None
+        self._negate = False
+
+    @property
+    def not_(self):
+        self._negate = True
+        return self
+
+    def _filter(self, clause, *params):
+        if self._negate:
+            clause, self._negate = f"NOT ({clause})", False
+        self.filters.append(clause)
+        self.params.extend(params)
+        return self
+
+    def select(self, columns="*", count=None):
+        # Embedded resources (dim_agents(name)) are not joined by the stand-in
+        names = [c.strip() for c in re.sub(r"\w+\([^)]*\)", "", columns).split(",")]
+        self.columns = ", ".join(c for c in names if c) or "*"
+        self.want_count = count == "exact"
+        return self
+
+    def eq(self, column, value):
+        return self._filter(f"{column} = ?", value)
+
+    def gt(self, column, value):
+        return self._filter(f"{column} > ?", value)
+
+    def gte(self, column, value):
+        return self._filter(f"{column} >= ?", value)
+
+    def lt(self, column, value):
+        return self._filter(f"{column} < ?", value)
+
+    def lte(self, column, value):
+        return self._filter(f"{column} <= ?", value)
+
+    def in_(self, column, values):
+        values = list(values)
+        return self._filter(f"{column} IN ({', '.join('?' * len(values))})", *values)
+
+    def is_(self, column, value):
+        return self._filter(f"{column} IS {'NULL' if value == 'null' else value}")
+
+    def order(self, column, desc=False):
+        self.orders.append(f"{column} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def upsert(self, rows, **kwargs):
+        self.action, self.rows = "upsert", rows if isinstance(rows, list) else [rows]
+        return self
+
+    def insert(self, rows, **kwargs):
+        self.action, self.rows = "insert", rows if isinstance(rows, list) else [rows]
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    def _where(self):
+        return f" WHERE {' AND '.join(self.filters)}" if self.filters else ""
+
+    def execute(self):
+        start = time.perf_counter()
+        result = getattr(self, f"_execute_{self.action}")()
+        self.db.timings[f"{self.action}:{self.table_name}"].append(
+            time.perf_counter() - start
+        )
+        return result
+
+    def _execute_select(self):
+        sql = f"SELECT {self.columns} FROM {self.table_name}{self._where()}"
+        if self.orders:
+            sql += " ORDER BY " + ", ".join(self.orders)
+        if self.limit_n is not None:
+            sql += f" LIMIT {int(self.limit_n)}"
+        data = self.db.query(sql, self.params)
+        count = None
+        if self.want_count:
+            count = self.db.query(
+                f"SELECT COUNT(*) AS n FROM {self.table_name}{self._where()}",
+                self.params,
+            )[0]["n"]
+        return SimpleNamespace(data=data, count=count)
+
+    def _write(self, upsert):
+        if not self.rows:
+            return SimpleNamespace(data=[], count=None)
+        columns = list(self.rows[0])
+        sql = (
+            f"INSERT INTO {self.table_name} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})"
+        )
+        if upsert:
+            keys = PRIMARY_KEYS[self.table_name]
+            updates = [c for c in columns if c not in keys]
+            sql += f" ON CONFLICT ({', '.join(keys)}) DO " + (
+                "UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in updates)
+                if updates
+                else "NOTHING"
+            )
+        values = [
+            [
+                json.dumps(v) if isinstance(v, (list, dict)) else v
+                for v in (row.get(c) for c in columns)
+            ]
+            for row in self.rows
+        ]
+        self.db.write(sql, values, self.table_name)
+        return SimpleNamespace(data=self.rows, count=None)
+
+    def _execute_upsert(self):
+        return self._write(upsert=True)
+
+    def _execute_insert(self):
+        return self._write(upsert=False)
+
+    def _execute_delete(self):
+        self.db.write(
+            f"DELETE FROM {self.table_name}{self._where()}",
+            [self.params],
+            self.table_name,
+        )
+        return SimpleNamespace(data=[], count=None)
@@ -0,0 +1,81 @@
+import math
+import re
+
+try:
+    import tiktoken
+
+    # text-embedding-ada-002's encoding
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # optional; truncation falls back to a character estimate
+    _ENCODING = None
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / 4)
+
+
+def truncate_tokens(text, max_tokens):
+    """Cut ``text`` to at most ``max_tokens`` tokens.
+
+    Without tiktoken the cut is at 3 characters a token, below the ~4 of
+    English text, so it errs towards keeping inputs under the limit.
+    """
+    if _ENCODING is None:
+        return text[: max_tokens * 3]
+    tokens = _ENCODING.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return _ENCODING.decode(tokens[:max_tokens])
+
+
+def split_turns(transcript, max_tokens):
+    # Speaker turns are separated by blank lines; oversized turns are split by sentence
+    turns = []
+    for index, turn in enumerate(t.strip() for t in transcript.split("\n\n")):
+        if not turn:
+            continue
+        if estimate_tokens(turn) <= max_tokens:
+            turns.append((index, turn))
+            continue
+        piece = ""
+        for sentence in _SENTENCE_RE.split(turn):
+            if piece and estimate_tokens(piece + " " + sentence) > max_tokens:
+                turns.append((index, piece))
+                piece = sentence
+            else:
+                piece = f"{piece} {sentence}".strip()
+        if piece:
+            turns.append((index, piece))
+    return turns
+
+
+def chunk_transcript(transcript, max_tokens=200, overlap_turns=1):
+    """Group consecutive speaker turns into windows of at most ``max_tokens``.
+
+    Consecutive windows share ``overlap_turns`` turns so an exchange that spans a
+    boundary is still embedded together.
+    """
+    turns = split_turns(transcript or "", max_tokens)
+    chunks = []
+    start = 0
+    while start < len(turns):
+        end, tokens = start, 0
+        while end < len(turns):
+            cost = estimate_tokens(turns[end][1])
+            if end > start and tokens + cost > max_tokens:
+                break
+            tokens += cost
+            end += 1
+        chunks.append({
+            "chunk_index": len(chunks),
+            "turn_start": turns[start][0],
+            "turn_end": turns[end - 1][0],
+            "content": "\n\n".join(text for _, text in turns[start:end]),
+            "token_count": tokens,
+        })
+        if end >= len(turns):
+            break
+        start = max(end - overlap_turns, start + 1)
+    return chunks
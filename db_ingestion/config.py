@@ -7,3 +7,24 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 VCON_FOLDER = os.getenv("VCON_FOLDER")
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "200"))
+CHUNK_OVERLAP_TURNS = int(os.getenv("CHUNK_OVERLAP_TURNS", "1"))
+
+# Ingestion pipeline concurrency and OpenAI requests-per-minute ceilings (0 = unlimited)
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "2"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "2"))
+CLASSIFY_WORKERS = int(os.getenv("CLASSIFY_WORKERS", "8"))
+WRITE_WORKERS = int(os.getenv("WRITE_WORKERS", "4"))
+QUEUE_SIZE = int(os.getenv("QUEUE_SIZE", "64"))
+EMBEDDING_RPM = int(os.getenv("EMBEDDING_RPM", "3000"))
+CHAT_RPM = int(os.getenv("CHAT_RPM", "3500"))
+
+# Batching: records per embedding/write batch and estimated tokens per embeddings request
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "100000"))
+# Longer embedding inputs are truncated: ada-002 rejects a request with any input over 8191
+EMBEDDING_MAX_INPUT_TOKENS = int(os.getenv("EMBEDDING_MAX_INPUT_TOKENS", "8000"))
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "100"))
+
+# Local record of ingested vCons used to skip unchanged files on re-runs
+MANIFEST_PATH = os.getenv("MANIFEST_PATH", "ingest_manifest.sqlite3")
@@ -1,15 +1,46 @@
 import os
 import json
 import hashlib
+import time
+import argparse
 from datetime import datetime
 from openai import OpenAI
 from supabase import create_client
 from config import SUPABASE_URL, SUPABASE_KEY, OPENAI_API_KEY, VCON_FOLDER
+from config import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TURNS
+from config import PARSE_WORKERS, EMBED_WORKERS, CLASSIFY_WORKERS, WRITE_WORKERS, QUEUE_SIZE
+from config import EMBEDDING_RPM, CHAT_RPM
+from config import EMBED_BATCH_SIZE, EMBEDDING_BATCH_TOKENS, WRITE_BATCH_SIZE
+from config import EMBEDDING_MAX_INPUT_TOKENS
+from config import MANIFEST_PATH
+from chunking import chunk_transcript, estimate_tokens, truncate_tokens
+from manifest import Manifest, content_hash
+from vcon_io import OffsetTracker, is_ndjson, read_ndjson
+from pipeline import RateLimiter, run_pipeline
 
 # Supabase & OpenAI setup
 supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 client = OpenAI(api_key=OPENAI_API_KEY)
 
+# Requests-per-minute ceilings for the OpenAI stages
+embedding_limiter = RateLimiter(EMBEDDING_RPM)
+chat_limiter = RateLimiter(CHAT_RPM)
+
+# Bump these when the row layout, embedding setup or classification prompt changes;
+# the manifest then re-ingests or re-enriches only what the change affects
+PIPELINE_VERSION = "1"
+EMBEDDING_VERSION = f"text-embedding-ada-002/chunks-{CHUNK_MAX_TOKENS}-{CHUNK_OVERLAP_TURNS}"
+CLASSIFIER_VERSION = "gpt-3.5-turbo/v1"
+CURRENT_VERSION = f"{PIPELINE_VERSION}:{EMBEDDING_VERSION}:{CLASSIFIER_VERSION}"
+
+CLASSIFICATION_KEYS = ("issue_type", "sentiment", "sentiment_score", "resolved",
+                       "agent_politeness", "agent_professionalism", "process_adherence")
+
+manifest = None
+skip_unchanged = True
+# OffsetTracker per NDJSON source being read
+trackers = {}
+
 def generate_id(email, phone):
     return hashlib.md5((email or "" + phone or "").encode()).hexdigest()
 
@@ -46,6 +77,7 @@ Transcript:
 
 Respond with a JSON object using the exact keys: issue_type, sentiment, sentiment_score, resolved, agent_politeness, agent_professionalism, process_adherence.
 """
+    chat_limiter.acquire()
     response = client.chat.completions.create(
         model="gpt-3.5-turbo",
         temperature=0.2,
@@ -53,101 +85,317 @@ Respond with a JSON object using the exact keys: issue_type, sentiment, sentimen
     )
     return json.loads(response.choices[0].message.content)
 
-# Process all .vcon.json files
-for filename in os.listdir(VCON_FOLDER):
-    if filename.endswith(".vcon.json"):
-        path = os.path.join(VCON_FOLDER, filename)
-        with open(path, "r") as f:
-            try:
-                data = json.load(f)
-                call_id = data["uuid"]
-                timestamp = data["created_at"]
-                date_id = datetime.fromisoformat(timestamp).date().isoformat()
-
-                dialog = data.get("dialog", [{}])[0]
-                duration = dialog.get("duration", 0)
-                disposition = dialog.get("meta", {}).get("disposition")
-                direction = dialog.get("meta", {}).get("direction")
-                audio_url = dialog.get("url")
-
-                agent = next((p for p in data["parties"] if p["role"] == "agent"), {})
-                customer = next((p for p in data["parties"] if p["role"] == "customer"), {})
-
-                agent_id = agent.get("id")
-                customer_id = generate_id(customer.get("mailto"), customer.get("tel"))
-
-                if agent_id:
-                    supabase.table("dim_agents").upsert({
-                        "agent_id": agent_id,
-                        "name": agent.get("name"),
-                        "email": agent.get("mailto")
-                    }).execute()
-
-                supabase.table("dim_customers").upsert({
-                    "customer_id": customer_id,
-                    "name": customer.get("name"),
-                    "email": customer.get("mailto"),
-                    "phone": customer.get("tel")
-                }).execute()
-
-                transcript = ""
-                summary = ""
-                for analysis in data.get("analysis", []):
-                    if analysis["type"] == "transcript":
-                        transcript = analysis["body"].get("transcript", "")
-                    elif analysis["type"] == "summary":
-                        summary = analysis["body"]
-
-                embedding = None
-                issue_type = None
-                sentiment = None
-                sentiment_score = None
-                resolved = None
-                agent_politeness = None
-                agent_professionalism = None
-                process_adherence = None
-
-                if transcript:
-                    # Embedding
-                    emb_resp = client.embeddings.create(
-                        model="text-embedding-ada-002",
-                        input=transcript
-                    )
-                    embedding = emb_resp.data[0].embedding
-
-                    # Classification
-                    classification = classify_transcript(transcript)
-                    issue_type = classification.get("issue_type")
-                    sentiment = classification.get("sentiment")
-                    sentiment_score = classification.get("sentiment_score")
-                    resolved = classification.get("resolved")
-                    agent_politeness = classification.get("agent_politeness")
-                    agent_professionalism = classification.get("agent_professionalism")
-                    process_adherence = classification.get("process_adherence")
-
-                supabase.table("fact_calls").insert({
-                    "call_id": call_id,
-                    "agent_id": agent_id,
-                    "customer_id": customer_id,
-                    "date_id": date_id,
-                    "duration_seconds": int(duration),
-                    "call_timestamp": timestamp,
-                    "disposition": disposition,
-                    "direction": direction,
-                    "transcript": transcript,
-                    "summary": summary,
-                    "embedding": embedding,
-                    "audio_url": audio_url,
-                    "issue_type": issue_type,
-                    "sentiment": sentiment,
-                    "sentiment_score": sentiment_score,
-                    "resolved": resolved,
-                    "agent_politeness": agent_politeness,
-                    "agent_professionalism": agent_professionalism,
-                    "process_adherence": process_adherence
-                }).execute()
-
-                print(f"✅ Inserted: {filename}")
-
-            except Exception as e:
-                print(f"❌ Error in {filename}: {e}")
+def day_key(name):
+    return (0, int(name), "") if name.isdigit() else (1, 0, name)
+
+def find_vcon_files(folder, since=None):
+    # Walks day sub-directories (e.g. tadhack-2025/18, 19, ...) as well as flat folders;
+    # with since="24" only day directories from 24 onwards are visited
+    for root, dirs, files in os.walk(folder):
+        if since and os.path.samefile(root, folder):
+            dirs[:] = [d for d in dirs if day_key(d) >= day_key(since)]
+        dirs.sort(key=day_key)
+        for filename in sorted(files):
+            if filename.endswith(".vcon.json"):
+                yield os.path.join(root, filename)
+
+def iter_sources(inputs, since=None, offset=0, resume=False):
+    # Directory trees yield .vcon.json paths; NDJSON/JSONL files (optionally .gz) are
+    # streamed a line at a time, so queue backpressure keeps memory flat
+    for path in inputs:
+        if os.path.isdir(path):
+            yield from find_vcon_files(path, since)
+        elif is_ndjson(path):
+            source = os.path.abspath(path)
+            start = offset or (manifest.checkpoint(source) if resume else 0)
+            tracker = trackers[source] = OffsetTracker(start)
+            for line, end in read_ndjson(path, start):
+                tracker.issue(end)
+                yield {"source": source, "offset": end, "raw": line}
+        else:
+            yield path
+
+def mark_done(record):
+    # Lets the source's committed offset move past this record
+    if record.get("stream"):
+        source, offset = record["stream"]
+        trackers[source].complete(offset)
+
+def embedding_requests(texts, max_tokens, max_inputs=2048):
+    # Groups texts into multi-input requests of at most max_tokens (estimated) each
+    batch, tokens = [], 0
+    for i, text in enumerate(texts):
+        cost = estimate_tokens(text)
+        if batch and (tokens + cost > max_tokens or len(batch) >= max_inputs):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(i)
+        tokens += cost
+    if batch:
+        yield batch
+
+def embed_texts(texts):
+    # One oversized input would make OpenAI reject every input in its request;
+    # long transcripts are embedded from their opening (chunks cover the rest)
+    texts = [truncate_tokens(text, EMBEDDING_MAX_INPUT_TOKENS) for text in texts]
+    embeddings = [None] * len(texts)
+    for batch in embedding_requests(texts, EMBEDDING_BATCH_TOKENS):
+        embedding_limiter.acquire()
+        response = client.embeddings.create(
+            model="text-embedding-ada-002",
+            input=[texts[i] for i in batch]
+        )
+        for i, item in zip(batch, response.data):
+            embeddings[i] = item.embedding
+    return embeddings
+
+def sign_bits(embedding):
+    # bit(1536) text for embedding_bits, same as pgvector's binary_quantize (1 = positive)
+    return "".join("1" if x > 0 else "0" for x in embedding)
+
+# --- Pipeline stages: parse -> embed (batched) -> classify -> write (batched) ---
+def parse_vcon(item):
+    if isinstance(item, dict):
+        # A line from an NDJSON source; its manifest path is "<source>@<end offset>"
+        raw = item["raw"].rstrip(b"\r\n")
+        path = f"{item['source']}@{item['offset']}"
+        stream = (item["source"], item["offset"])
+        size, mtime = len(raw), 0.0
+    else:
+        path, stream = item, None
+        stat = os.stat(path)
+        size, mtime = stat.st_size, stat.st_mtime
+        if manifest is not None and skip_unchanged:
+            # Unchanged size and mtime: skip without reading the file
+            entry = manifest.by_path(path)
+            if (entry and entry["size"] == size and entry["mtime"] == mtime
+                    and entry["pipeline_version"] == CURRENT_VERSION):
+                return []
+        with open(path, "rb") as f:
+            raw = f.read()
+
+    data = json.loads(raw)
+    file_hash = content_hash(raw)
+
+    call_id = data["uuid"]
+    entry = manifest.get(call_id) if manifest is not None and skip_unchanged else None
+    if entry and entry["content_hash"] == file_hash and entry["pipeline_version"] == CURRENT_VERSION:
+        if entry["path"] != path or entry["mtime"] != mtime:
+            manifest.record([{**entry, "path": path, "size": size, "mtime": mtime}])
+        mark_done({"stream": stream})
+        return []
+    timestamp = data["created_at"]
+    date_id = datetime.fromisoformat(timestamp).date().isoformat()
+
+    dialog = data.get("dialog", [{}])[0]
+    agent = next((p for p in data["parties"] if p["role"] == "agent"), {})
+    customer = next((p for p in data["parties"] if p["role"] == "customer"), {})
+
+    agent_id = agent.get("id")
+    customer_id = generate_id(customer.get("mailto"), customer.get("tel"))
+
+    transcript = ""
+    summary = ""
+    for analysis in data.get("analysis", []):
+        if analysis["type"] == "transcript":
+            transcript = analysis["body"].get("transcript", "")
+        elif analysis["type"] == "summary":
+            summary = analysis["body"]
+
+    # Enrichments are keyed by model/prompt version and transcript so a metadata-only
+    # change to a vCon re-writes the row without new OpenAI calls
+    embedded_hash = content_hash(f"{EMBEDDING_VERSION}\0{transcript}")
+    classified_hash = content_hash(f"{CLASSIFIER_VERSION}\0{transcript}")
+
+    record = {
+        "filename": os.path.basename(path),
+        "stream": stream,
+        "needs_embedding": bool(transcript) and not (
+            entry and entry["embedded_hash"] == embedded_hash),
+        "needs_classification": bool(transcript) and not (
+            entry and entry["classified_hash"] == classified_hash),
+        "manifest": {
+            "call_id": call_id,
+            "path": path,
+            "size": size,
+            "mtime": mtime,
+            "content_hash": file_hash,
+            "pipeline_version": CURRENT_VERSION,
+            "embedded_hash": embedded_hash,
+            "classified_hash": classified_hash
+        },
+        "agent": {
+            "agent_id": agent_id,
+            "name": agent.get("name"),
+            "email": agent.get("mailto")
+        } if agent_id else None,
+        "customer": {
+            "customer_id": customer_id,
+            "name": customer.get("name"),
+            "email": customer.get("mailto"),
+            "phone": customer.get("tel")
+        },
+        "call": {
+            "call_id": call_id,
+            "agent_id": agent_id,
+            "customer_id": customer_id,
+            "date_id": date_id,
+            "duration_seconds": int(dialog.get("duration", 0)),
+            "call_timestamp": timestamp,
+            "disposition": dialog.get("meta", {}).get("disposition"),
+            "direction": dialog.get("meta", {}).get("direction"),
+            "transcript": transcript,
+            "summary": summary,
+            "embedding": None,
+            "embedding_bits": None,
+            "audio_url": dialog.get("url"),
+            "issue_type": None,
+            "sentiment": None,
+            "sentiment_score": None,
+            "resolved": None,
+            "agent_politeness": None,
+            "agent_professionalism": None,
+            "process_adherence": None
+        },
+        "chunks": []
+    }
+
+    # Leave already-computed enrichments out of the row so the upsert keeps them
+    if entry and not record["needs_embedding"]:
+        del record["call"]["embedding"]
+        del record["call"]["embedding_bits"]
+    if entry and not record["needs_classification"]:
+        for key in CLASSIFICATION_KEYS:
+            del record["call"][key]
+    return [record]
+
+def embed_batch(records):
+    # One set of token-sized embedding requests covers every transcript and chunk in the batch
+    texts = []
+    for record in records:
+        call = record["call"]
+        if not record["needs_embedding"]:
+            continue
+        chunks = chunk_transcript(call["transcript"], CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TURNS)
+        for chunk in chunks:
+            chunk["call_id"] = call["call_id"]
+        record["chunks"] = chunks
+        texts.append((call, call["transcript"]))
+        texts.extend((chunk, chunk["content"]) for chunk in chunks)
+
+    embeddings = embed_texts([text for _, text in texts])
+    for (target, _), embedding in zip(texts, embeddings):
+        target["embedding"] = embedding
+    # Calls also get the compact form searched first by search_similar_calls_quantized
+    for record in records:
+        if record["needs_embedding"]:
+            record["call"]["embedding_bits"] = sign_bits(record["call"]["embedding"])
+    return records
+
+def classify_record(record):
+    call = record["call"]
+    if record["needs_classification"]:
+        classification = classify_transcript(call["transcript"])
+        for key in CLASSIFICATION_KEYS:
+            call[key] = classification.get(key)
+    return [record]
+
+def write_batch(records):
+    # Dimension rows are deduped so each agent/customer is upserted once per batch
+    agents = {r["agent"]["agent_id"]: r["agent"] for r in records if r["agent"]}
+    customers = {r["customer"]["customer_id"]: r["customer"] for r in records}
+    if agents:
+        supabase.table("dim_agents").upsert(list(agents.values())).execute()
+    supabase.table("dim_customers").upsert(list(customers.values())).execute()
+
+    # Rows that reuse stored enrichments omit those columns; one upsert per column set
+    by_columns = {}
+    for r in records:
+        by_columns.setdefault(tuple(sorted(r["call"])), []).append(r["call"])
+    for rows in by_columns.values():
+        supabase.table("fact_calls").upsert(rows).execute()
+
+    # Re-embedded calls replace their chunks, which may now be fewer
+    rechunked = [r["call"]["call_id"] for r in records if r["needs_embedding"]]
+    if rechunked:
+        supabase.table("fact_call_chunks").delete().in_("call_id", rechunked).execute()
+    chunks = [chunk for r in records for chunk in r["chunks"]]
+    if chunks:
+        supabase.table("fact_call_chunks").upsert(chunks).execute()
+
+    if manifest is not None:
+        manifest.record([r["manifest"] for r in records])
+    for record in records:
+        mark_done(record)
+        print(f"✅ Inserted: {record['filename']}")
+    return []
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest .vcon.json files into Supabase")
+    parser.add_argument("inputs", nargs="*", default=[VCON_FOLDER],
+                        help="directories of .vcon.json files and/or NDJSON files (.gz ok)")
+    parser.add_argument("--since", help="only day directories from this one onwards, e.g. 24")
+    parser.add_argument("--watch", type=float, metavar="SECONDS",
+                        help="keep rescanning the folder for new or changed vCons")
+    parser.add_argument("--full", action="store_true",
+                        help="ignore the manifest and re-ingest everything")
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    parser.add_argument("--offset", type=int, default=0,
+                        help="byte offset to start NDJSON inputs from")
+    parser.add_argument("--resume", action="store_true",
+                        help="start NDJSON inputs from their last committed offset")
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS)
+    parser.add_argument("--embed-workers", type=int, default=EMBED_WORKERS)
+    parser.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--classify-workers", type=int, default=CLASSIFY_WORKERS)
+    parser.add_argument("--write-workers", type=int, default=WRITE_WORKERS)
+    parser.add_argument("--write-batch-size", type=int, default=WRITE_BATCH_SIZE)
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    parser.add_argument("--embedding-rpm", type=int, default=EMBEDDING_RPM)
+    parser.add_argument("--chat-rpm", type=int, default=CHAT_RPM)
+    args = parser.parse_args()
+
+    global embedding_limiter, chat_limiter, manifest, skip_unchanged
+    embedding_limiter = RateLimiter(args.embedding_rpm)
+    chat_limiter = RateLimiter(args.chat_rpm)
+    manifest = Manifest(args.manifest)
+
+    # --full re-ingests everything once (still recording it); watch passes are incremental
+    skip_unchanged = not args.full
+    ingest(args)
+    skip_unchanged = True
+    while args.watch:
+        time.sleep(args.watch)
+        ingest(args)
+
+def ingest(args):
+    trackers.clear()
+    elapsed, stats = run_pipeline(
+        iter_sources(args.inputs, args.since, args.offset, args.resume),
+        [
+            ("parse", parse_vcon, args.parse_workers),
+            ("embed", embed_batch, args.embed_workers, args.embed_batch_size),
+            ("classify", classify_record, args.classify_workers),
+            ("write", write_batch, args.write_workers, args.write_batch_size),
+        ],
+        queue_size=args.queue_size,
+    )
+
+    for stage in stats:
+        print(f"{stage['stage']:>8}: {stage['processed']} items in {stage['batches']} batches, "
+              f"{stage['errors']} errors, "
+              f"{stage['per_sec']}/s, busy {stage['busy_seconds']}s ({stage['workers']} workers)")
+    total = stats[0]["processed"]
+    skipped = total - stats[0]["errors"] - stats[0]["emitted"]
+    written = stats[-1]["processed"] - stats[-1]["errors"]
+    rate = written / elapsed if elapsed else 0.0
+    print(f"Ingested {written}/{total} files, skipped {skipped} unchanged, "
+          f"in {elapsed:.1f}s ({rate:.2f} files/sec)")
+
+    # Failed records hold the checkpoint back so the next run retries them
+    for source, tracker in trackers.items():
+        manifest.save_checkpoint(source, tracker.committed)
+        print(f"{source}: committed through byte {tracker.committed}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+
+def content_hash(data):
+    if isinstance(data, str):
+        data = data.encode()
+    return hashlib.sha256(data).hexdigest()
+
+
+class Manifest:
+    """Local record of what has been ingested, keyed by vCon uuid.
+
+    Each entry keeps the hash of the file, the hash of the transcript the
+    embedding and classification were computed from, and the pipeline version
+    that produced them. File size and mtime let unchanged files be skipped
+    without reading them.
+    """
+
+    def __init__(self, path="ingest_manifest.sqlite3"):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS manifest (
+                call_id TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                content_hash TEXT NOT NULL,
+                pipeline_version TEXT NOT NULL,
+                embedded_hash TEXT,
+                classified_hash TEXT,
+                ingested_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS manifest_path ON manifest (path)")
+        # Committed byte offset per NDJSON source, for --resume
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints "
+            "(source TEXT PRIMARY KEY, offset INTEGER NOT NULL)"
+        )
+        self._db.commit()
+
+    def _row(self, sql, *params):
+        with self._lock:
+            row = self._db.execute(sql, params).fetchone()
+        if row is None:
+            return None
+        columns = ("call_id", "path", "size", "mtime", "content_hash",
+                   "pipeline_version", "embedded_hash", "classified_hash")
+        return dict(zip(columns, row))
+
+    def by_path(self, path):
+        return self._row(
+            "SELECT call_id, path, size, mtime, content_hash, pipeline_version, "
+            "embedded_hash, classified_hash FROM manifest WHERE path = ?", path
+        )
+
+    def get(self, call_id):
+        return self._row(
+            "SELECT call_id, path, size, mtime, content_hash, pipeline_version, "
+            "embedded_hash, classified_hash FROM manifest WHERE call_id = ?", call_id
+        )
+
+    def record(self, entries):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO manifest VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (e["call_id"], e["path"], e["size"], e["mtime"], e["content_hash"],
+                     e["pipeline_version"], e["embedded_hash"], e["classified_hash"], now)
+                    for e in entries
+                ],
+            )
+            self._db.commit()
+
+    def checkpoint(self, source):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT offset FROM checkpoints WHERE source = ?", (source,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def save_checkpoint(self, source, offset):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?)", (source, offset)
+            )
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM manifest").fetchone()[0]
@@ -0,0 +1,180 @@
+import queue
+import threading
+import time
+
+_STOP = object()
+
+
+class RateLimiter:
+    """Spaces calls evenly so no more than ``per_minute`` start in any minute."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _label(item):
+    return item.get("filename") if isinstance(item, dict) else item
+
+
+class Stage:
+    """A pool of worker threads reading from ``inbox`` and writing to ``outbox``.
+
+    ``fn`` takes one item and returns an iterable of output items (possibly
+    empty). Queues are bounded, so a slow stage blocks the stages before it.
+    With ``batch_size`` > 1, ``fn`` instead receives a list of up to
+    ``batch_size`` items, collected for at most ``max_wait`` seconds; if it
+    raises, the items are retried one at a time so only the failing ones count
+    as errors.
+    """
+
+    def __init__(
+        self, name, fn, workers, inbox, outbox=None, batch_size=1, max_wait=1.0
+    ):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.inbox = inbox
+        self.outbox = outbox
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.processed = 0
+        self.batches = 0
+        self.emitted = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self._alive = workers
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, name=f"{self.name}-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _next_batch(self):
+        item = self.inbox.get()
+        if item is _STOP or self.batch_size <= 1:
+            return item
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self.inbox.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # Flush what we have; the sentinel is handled on the next pass
+                self.inbox.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            item = self._next_batch()
+            if item is _STOP:
+                # Let sibling workers see the sentinel; the last one out closes the outbox
+                self.inbox.put(_STOP)
+                with self._lock:
+                    self._alive -= 1
+                    last = self._alive == 0
+                if last and self.outbox is not None:
+                    self.outbox.put(_STOP)
+                return
+
+            size = len(item) if self.batch_size > 1 else 1
+            start = time.perf_counter()
+            try:
+                outputs = list(self.fn(item) or [])
+            except Exception as e:
+                if self.batch_size > 1 and size > 1:
+                    # One bad record (an oversized input, a row the database
+                    # rejects) must not fail the rest of its batch
+                    print(
+                        f"⚠️ {self.name} batch of {size} failed ({e}); "
+                        "retrying one at a time"
+                    )
+                    outputs = self._run_singly(item)
+                else:
+                    outputs = []
+                    with self._lock:
+                        self.errors += 1
+                    print(f"❌ Error in {self.name} ({_label(item)}): {e}")
+            with self._lock:
+                self.processed += size
+                self.batches += 1
+                self.emitted += len(outputs)
+                self.busy_seconds += time.perf_counter() - start
+            if self.outbox is not None:
+                for output in outputs:
+                    self.outbox.put(output)
+
+    def _run_singly(self, items):
+        outputs = []
+        for item in items:
+            try:
+                outputs.extend(self.fn([item]) or [])
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                print(f"❌ Error in {self.name} ({_label(item)}): {e}")
+        return outputs
+
+    def stats(self, elapsed):
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "processed": self.processed,
+            "batches": self.batches,
+            "emitted": self.emitted,
+            "errors": self.errors,
+            "per_sec": round(self.processed / elapsed, 2) if elapsed else 0.0,
+            "busy_seconds": round(self.busy_seconds, 2),
+        }
+
+
+def run_pipeline(source, stages, queue_size=64):
+    """Feed ``source`` items through ``stages``.
+
+    Each stage is ``(name, fn, workers)`` or ``(name, fn, workers, batch_size)``.
+    Returns (elapsed_seconds, [stage stats]).
+    """
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages] + [None]
+    running = [
+        Stage(name, fn, workers, queues[i], queues[i + 1], *batching)
+        for i, (name, fn, workers, *batching) in enumerate(stages)
+    ]
+    start = time.perf_counter()
+    for stage in running:
+        stage.start()
+
+    for item in source:
+        queues[0].put(item)
+    queues[0].put(_STOP)
+
+    for stage in running:
+        stage.join()
+    elapsed = time.perf_counter() - start
+    return elapsed, [stage.stats(elapsed) for stage in running]
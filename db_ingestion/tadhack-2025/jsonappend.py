@@ -1,21 +1,24 @@
 import os
+import sys
 import json
+import argparse
 
-directory = "./24"  # Replace with your directory path
-output_file = "combined_output24.txt"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vcon_io import NDJSONWriter  # noqa: E402
 
-json_list = []
+parser = argparse.ArgumentParser(description="Combine vCon JSON files into one NDJSON file")
+parser.add_argument("directory", nargs="?", default="./24")
+parser.add_argument("output_file", nargs="?", default="combined_output24.txt",
+                    help="use a .gz suffix to gzip the output")
+parser.add_argument("--append", action="store_true")
+args = parser.parse_args()
 
-# Explore directory and collect JSON files
-for filename in os.listdir(directory):
-    if filename.endswith(".json"):
-        filepath = os.path.join(directory, filename)
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            json_list.append(data)
+# Stream one vCon at a time to the output, one JSON object per line
+with NDJSONWriter(args.output_file, append=args.append) as writer:
+    for filename in sorted(os.listdir(args.directory)):
+        if filename.endswith(".json"):
+            filepath = os.path.join(args.directory, filename)
+            with open(filepath, "r", encoding="utf-8") as f:
+                writer.write(json.load(f))
 
-# Write all JSON objects to a single .txt file, one per line
-with open(output_file, "w", encoding="utf-8") as outfile:
-    for item in json_list:
-        outfile.write(json.dumps(item))
-        outfile.write("\n")
+print(f"Wrote {writer.count} vCons to {args.output_file}")
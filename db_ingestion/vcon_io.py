@@ -0,0 +1,92 @@
+import gzip
+import json
+import threading
+from collections import deque
+
+NDJSON_SUFFIXES = (".ndjson", ".jsonl", ".txt")
+
+
+def is_ndjson(path):
+    # combined_output*.txt from jsonappend.py is NDJSON too; any of these may be gzipped
+    name = path[:-3] if path.endswith(".gz") else path
+    return name.endswith(NDJSON_SUFFIXES)
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def read_ndjson(path, offset=0):
+    """Yield (raw_line, end_offset) for each record, one line at a time.
+
+    Offsets are byte positions in the (uncompressed) stream, so a reader can
+    resume from any end_offset it has seen.
+    """
+    with _open(path, "rb") as f:
+        if offset:
+            f.seek(offset)
+        for line in f:
+            offset += len(line)
+            if line.strip():
+                yield line, offset
+
+
+def iter_vcons(path, offset=0):
+    for line, _ in read_ndjson(path, offset):
+        yield json.loads(line)
+
+
+class NDJSONWriter:
+    """Appends one JSON object per line; gzip when ``path`` ends in .gz."""
+
+    def __init__(self, path, append=False):
+        self._file = _open(path, "ab" if append else "wb")
+        self.count = 0
+
+    def write(self, record):
+        self._file.write(json.dumps(record).encode("utf-8") + b"\n")
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_ndjson(path, records, append=False):
+    with NDJSONWriter(path, append) as writer:
+        for record in records:
+            writer.write(record)
+        return writer.count
+
+
+class OffsetTracker:
+    """Low-water mark of a stream whose records finish out of order.
+
+    ``issue`` is called in read order and ``complete`` from any thread; the
+    ``committed`` offset only advances past records that have all completed,
+    so resuming from it never loses a record.
+    """
+
+    def __init__(self, offset=0):
+        self.committed = offset
+        self._pending = deque()
+        self._done = set()
+        self._lock = threading.Lock()
+
+    def issue(self, end_offset):
+        with self._lock:
+            self._pending.append(end_offset)
+
+    def complete(self, end_offset):
+        with self._lock:
+            self._done.add(end_offset)
+            while self._pending and self._pending[0] in self._done:
+                self._done.discard(self._pending[0])
+                self.committed = self._pending.popleft()
@@ -61,4 +61,303 @@ select
   extract(week from d),
   extract(isodow from d)  -- 1 = Monday, 7 = Sunday
 from generate_series('2024-01-01'::date, '2026-01-01'::date, interval '1 day') d
-on conflict (date_id) do nothing;
\ No newline at end of file
+on conflict (date_id) do nothing;
+
+-- Data version counters, bumped on every write so API caches can invalidate
+create table if not exists data_version (
+  name text primary key,
+  version bigint not null default 0,
+  updated_at timestamptz not null default now()
+);
+
+insert into data_version (name) values ('fact_calls')
+on conflict (name) do nothing;
+
+create or replace function bump_fact_calls_version()
+returns trigger
+language plpgsql
+as $$
+begin
+  update data_version
+  set version = version + 1, updated_at = now()
+  where name = 'fact_calls';
+  return null;
+end;
+$$;
+
+drop trigger if exists trg_fact_calls_data_version on fact_calls;
+create trigger trg_fact_calls_data_version
+after insert or update or delete or truncate on fact_calls
+for each statement execute function bump_fact_calls_version();
+
+-- Time of each call's last write, so the API's local search mirror can pick up
+-- re-ingested rows as well as new ones (their call_timestamp does not change).
+-- clock_timestamp keeps a long ingestion transaction's rows close to commit time.
+alter table fact_calls add column if not exists updated_at timestamptz not null default now();
+
+create or replace function touch_fact_calls_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+  new.updated_at := clock_timestamp();
+  return new;
+end;
+$$;
+
+drop trigger if exists trg_fact_calls_updated_at on fact_calls;
+create trigger trg_fact_calls_updated_at
+before insert or update on fact_calls
+for each row execute function touch_fact_calls_updated_at();
+
+create index if not exists idx_fact_calls_updated_at on fact_calls (updated_at, call_id);
+
+
+-- Chunk-level transcript embeddings (speaker-turn windows)
+create table if not exists fact_call_chunks (
+  call_id uuid references fact_calls(call_id) on delete cascade,
+  chunk_index int,
+  turn_start int,
+  turn_end int,
+  content text,
+  token_count int,
+  embedding vector(1536),
+  primary key (call_id, chunk_index)
+);
+
+
+-- Dashboard rollups, kept in step with fact_calls by statement-level triggers so the
+-- dashboard functions read a few small rows instead of scanning every call.
+-- Keys are "nulls not distinct" so calls with a missing date/issue/score still count.
+create table if not exists rollup_daily (
+  date_id date unique nulls not distinct,
+  call_count bigint not null default 0,
+  duration_sum bigint not null default 0,
+  duration_count bigint not null default 0,
+  sentiment_score_sum double precision not null default 0,
+  sentiment_score_count bigint not null default 0,
+  positive_count bigint not null default 0,
+  negative_count bigint not null default 0,
+  resolved_count bigint not null default 0,
+  unresolved_count bigint not null default 0
+);
+
+create table if not exists rollup_issue (
+  issue_type text unique nulls not distinct,
+  call_count bigint not null default 0
+);
+
+create table if not exists rollup_agent (
+  agent_id text unique nulls not distinct,
+  call_count bigint not null default 0,
+  duration_sum bigint not null default 0
+);
+
+create table if not exists rollup_sentiment_score (
+  sentiment_score float unique nulls not distinct,
+  call_count bigint not null default 0
+);
+
+-- Adds a set of per-rollup deltas (negative counts remove calls) to every rollup.
+-- Rows are applied in key order so concurrent writers lock them in the same order.
+drop function if exists apply_fact_calls_rollups(fact_calls[], int);
+create or replace function apply_fact_calls_rollups(
+  p_daily rollup_daily[],
+  p_issue rollup_issue[],
+  p_agent rollup_agent[],
+  p_score rollup_sentiment_score[]
+)
+returns void
+language plpgsql
+as $$
+begin
+  insert into rollup_daily as t
+  select * from unnest(p_daily) d
+  order by d.date_id
+  on conflict (date_id) do update set
+    call_count = t.call_count + excluded.call_count,
+    duration_sum = t.duration_sum + excluded.duration_sum,
+    duration_count = t.duration_count + excluded.duration_count,
+    sentiment_score_sum = t.sentiment_score_sum + excluded.sentiment_score_sum,
+    sentiment_score_count = t.sentiment_score_count + excluded.sentiment_score_count,
+    positive_count = t.positive_count + excluded.positive_count,
+    negative_count = t.negative_count + excluded.negative_count,
+    resolved_count = t.resolved_count + excluded.resolved_count,
+    unresolved_count = t.unresolved_count + excluded.unresolved_count;
+
+  insert into rollup_issue as t
+  select * from unnest(p_issue) d
+  order by d.issue_type
+  on conflict (issue_type) do update set call_count = t.call_count + excluded.call_count;
+
+  insert into rollup_agent as t
+  select * from unnest(p_agent) d
+  order by d.agent_id
+  on conflict (agent_id) do update set
+    call_count = t.call_count + excluded.call_count,
+    duration_sum = t.duration_sum + excluded.duration_sum;
+
+  insert into rollup_sentiment_score as t
+  select * from unnest(p_score) d
+  order by d.sentiment_score
+  on conflict (sentiment_score) do update set call_count = t.call_count + excluded.call_count;
+
+  -- Keys whose last call was removed
+  delete from rollup_daily t using unnest(p_daily) d
+  where t.date_id is not distinct from d.date_id and t.call_count = 0;
+  delete from rollup_issue t using unnest(p_issue) d
+  where t.issue_type is not distinct from d.issue_type and t.call_count = 0;
+  delete from rollup_agent t using unnest(p_agent) d
+  where t.agent_id is not distinct from d.agent_id and t.call_count = 0;
+  delete from rollup_sentiment_score t using unnest(p_score) d
+  where t.sentiment_score is not distinct from d.sentiment_score and t.call_count = 0;
+end;
+$$;
+
+-- Old rows come out of the rollups and new rows go in. Each side is aggregated per
+-- rollup straight from its transition table, reading only the key and measure
+-- columns, so the embedding and transcript of changed calls are never copied.
+-- Dynamic SQL because an insert trigger has no old_rows to name (and vice versa).
+create or replace function fact_calls_rollup_trigger()
+returns trigger
+language plpgsql
+as $$
+declare
+  v_side record;
+  v_daily rollup_daily[];
+  v_issue rollup_issue[];
+  v_agent rollup_agent[];
+  v_score rollup_sentiment_score[];
+begin
+  if tg_op = 'TRUNCATE' then
+    truncate rollup_daily, rollup_issue, rollup_agent, rollup_sentiment_score;
+    return null;
+  end if;
+  for v_side in
+    select * from (values ('old_rows', -1), ('new_rows', 1)) s (transition, sign)
+    where (s.transition = 'old_rows' and tg_op in ('UPDATE', 'DELETE'))
+       or (s.transition = 'new_rows' and tg_op in ('UPDATE', 'INSERT'))
+  loop
+    execute format($q$
+      select
+        (select array_agg(row(d.*)::rollup_daily) from (
+          select
+            date_id,
+            %1$s * count(*),
+            %1$s * coalesce(sum(duration_seconds), 0),
+            %1$s * count(duration_seconds),
+            %1$s * coalesce(sum(sentiment_score), 0),
+            %1$s * count(sentiment_score),
+            %1$s * count(*) filter (where sentiment = 'positive'),
+            %1$s * count(*) filter (where sentiment = 'negative'),
+            %1$s * count(*) filter (where resolved = true),
+            %1$s * count(*) filter (where resolved = false)
+          from %2$I
+          group by date_id
+        ) d),
+        (select array_agg(row(d.*)::rollup_issue) from (
+          select issue_type, %1$s * count(*) from %2$I group by issue_type
+        ) d),
+        (select array_agg(row(d.*)::rollup_agent) from (
+          select agent_id, %1$s * count(*), %1$s * coalesce(sum(duration_seconds), 0)
+          from %2$I
+          group by agent_id
+        ) d),
+        (select array_agg(row(d.*)::rollup_sentiment_score) from (
+          select sentiment_score, %1$s * count(*) from %2$I group by sentiment_score
+        ) d)
+    $q$, v_side.sign, v_side.transition)
+    into v_daily, v_issue, v_agent, v_score;
+    perform apply_fact_calls_rollups(v_daily, v_issue, v_agent, v_score);
+  end loop;
+  return null;
+end;
+$$;
+
+-- Transition tables need one trigger per event
+drop trigger if exists trg_fact_calls_rollup_insert on fact_calls;
+create trigger trg_fact_calls_rollup_insert
+after insert on fact_calls
+referencing new table as new_rows
+for each statement execute function fact_calls_rollup_trigger();
+
+drop trigger if exists trg_fact_calls_rollup_update on fact_calls;
+create trigger trg_fact_calls_rollup_update
+after update on fact_calls
+referencing old table as old_rows new table as new_rows
+for each statement execute function fact_calls_rollup_trigger();
+
+drop trigger if exists trg_fact_calls_rollup_delete on fact_calls;
+create trigger trg_fact_calls_rollup_delete
+after delete on fact_calls
+referencing old table as old_rows
+for each statement execute function fact_calls_rollup_trigger();
+
+drop trigger if exists trg_fact_calls_rollup_truncate on fact_calls;
+create trigger trg_fact_calls_rollup_truncate
+after truncate on fact_calls
+for each statement execute function fact_calls_rollup_trigger();
+
+-- Rebuilds every rollup from fact_calls (backfill, or repair after check_dashboard_rollups).
+-- Aggregates directly rather than via apply_fact_calls_rollups: no deltas to merge.
+create or replace function refresh_dashboard_rollups()
+returns void
+language plpgsql
+as $$
+begin
+  lock table fact_calls in share mode;
+  truncate rollup_daily, rollup_issue, rollup_agent, rollup_sentiment_score;
+
+  insert into rollup_daily
+  select
+    date_id,
+    count(*),
+    coalesce(sum(duration_seconds), 0),
+    count(duration_seconds),
+    coalesce(sum(sentiment_score), 0),
+    count(sentiment_score),
+    count(*) filter (where sentiment = 'positive'),
+    count(*) filter (where sentiment = 'negative'),
+    count(*) filter (where resolved = true),
+    count(*) filter (where resolved = false)
+  from fact_calls
+  group by date_id;
+
+  insert into rollup_issue
+  select issue_type, count(*) from fact_calls group by issue_type;
+
+  insert into rollup_agent
+  select agent_id, count(*), coalesce(sum(duration_seconds), 0)
+  from fact_calls
+  group by agent_id;
+
+  insert into rollup_sentiment_score
+  select sentiment_score, count(*) from fact_calls group by sentiment_score;
+end;
+$$;
+
+select refresh_dashboard_rollups();
+
+
+-- Call listing (/api/calls): newest-first keyset pagination on (call_timestamp, call_id),
+-- with composite indexes so each filter is still served in cursor order
+create index if not exists idx_fact_calls_ts_id
+  on fact_calls (call_timestamp desc, call_id desc);
+create index if not exists idx_fact_calls_sentiment_ts_id
+  on fact_calls (sentiment, call_timestamp desc, call_id desc);
+create index if not exists idx_fact_calls_issue_ts_id
+  on fact_calls (issue_type, call_timestamp desc, call_id desc);
+create index if not exists idx_fact_calls_agent_ts_id
+  on fact_calls (agent_id, call_timestamp desc, call_id desc);
+create index if not exists idx_fact_calls_date
+  on fact_calls (date_id);
+
+-- Compact embedding tier: 1-bit sign codes of embedding (192 bytes vs 6 KB a row),
+-- written by ingestion alongside it. search_similar_calls_quantized picks candidates
+-- by Hamming distance over these and re-ranks them with the full-precision embedding.
+-- binary_quantize needs pgvector 0.7+; the update backfills rows ingested before.
+alter table fact_calls add column if not exists embedding_bits bit(1536);
+
+update fact_calls
+set embedding_bits = binary_quantize(embedding)::bit(1536)
+where embedding is not null and embedding_bits is null;
@@ -0,0 +1,94 @@
+-- Compares every rollup row with the same aggregate computed from fact_calls.
+-- Returns one row per mismatch; an empty result means the rollups are consistent.
+-- Repair with: SELECT refresh_dashboard_rollups();
+CREATE OR REPLACE FUNCTION check_dashboard_rollups()
+RETURNS TABLE (
+    rollup TEXT,
+    rollup_key TEXT,
+    rollup_value JSONB,
+    raw_value JSONB
+)
+AS $$
+BEGIN
+    RETURN QUERY
+    WITH raw_daily AS (
+        SELECT
+            COALESCE(f.date_id::TEXT, '<null>') AS k,
+            jsonb_build_object(
+                'call_count', COUNT(*),
+                'duration_sum', COALESCE(SUM(f.duration_seconds), 0),
+                'duration_count', COUNT(f.duration_seconds),
+                'sentiment_score_sum', ROUND(COALESCE(SUM(f.sentiment_score), 0)::NUMERIC, 6),
+                'sentiment_score_count', COUNT(f.sentiment_score),
+                'positive_count', COUNT(*) FILTER (WHERE f.sentiment = 'positive'),
+                'negative_count', COUNT(*) FILTER (WHERE f.sentiment = 'negative'),
+                'resolved_count', COUNT(*) FILTER (WHERE f.resolved = true),
+                'unresolved_count', COUNT(*) FILTER (WHERE f.resolved = false)
+            ) AS v
+        FROM fact_calls f
+        GROUP BY f.date_id
+    ),
+    rolled_daily AS (
+        SELECT
+            COALESCE(r.date_id::TEXT, '<null>') AS k,
+            jsonb_build_object(
+                'call_count', r.call_count,
+                'duration_sum', r.duration_sum,
+                'duration_count', r.duration_count,
+                'sentiment_score_sum', ROUND(r.sentiment_score_sum::NUMERIC, 6),
+                'sentiment_score_count', r.sentiment_score_count,
+                'positive_count', r.positive_count,
+                'negative_count', r.negative_count,
+                'resolved_count', r.resolved_count,
+                'unresolved_count', r.unresolved_count
+            ) AS v
+        FROM rollup_daily r
+    ),
+    raw_issue AS (
+        SELECT COALESCE(f.issue_type, '<null>') AS k, jsonb_build_object('call_count', COUNT(*)) AS v
+        FROM fact_calls f
+        GROUP BY f.issue_type
+    ),
+    rolled_issue AS (
+        SELECT COALESCE(r.issue_type, '<null>') AS k, jsonb_build_object('call_count', r.call_count) AS v
+        FROM rollup_issue r
+    ),
+    raw_agent AS (
+        SELECT
+            COALESCE(f.agent_id, '<null>') AS k,
+            jsonb_build_object('call_count', COUNT(*), 'duration_sum', COALESCE(SUM(f.duration_seconds), 0)) AS v
+        FROM fact_calls f
+        GROUP BY f.agent_id
+    ),
+    rolled_agent AS (
+        SELECT
+            COALESCE(r.agent_id, '<null>') AS k,
+            jsonb_build_object('call_count', r.call_count, 'duration_sum', r.duration_sum) AS v
+        FROM rollup_agent r
+    ),
+    raw_score AS (
+        SELECT COALESCE(f.sentiment_score::TEXT, '<null>') AS k, jsonb_build_object('call_count', COUNT(*)) AS v
+        FROM fact_calls f
+        GROUP BY f.sentiment_score
+    ),
+    rolled_score AS (
+        SELECT COALESCE(r.sentiment_score::TEXT, '<null>') AS k, jsonb_build_object('call_count', r.call_count) AS v
+        FROM rollup_sentiment_score r
+    )
+    SELECT 'rollup_daily', COALESCE(a.k, b.k), a.v, b.v
+    FROM rolled_daily a FULL JOIN raw_daily b ON a.k = b.k
+    WHERE a.v IS DISTINCT FROM b.v
+    UNION ALL
+    SELECT 'rollup_issue', COALESCE(a.k, b.k), a.v, b.v
+    FROM rolled_issue a FULL JOIN raw_issue b ON a.k = b.k
+    WHERE a.v IS DISTINCT FROM b.v
+    UNION ALL
+    SELECT 'rollup_agent', COALESCE(a.k, b.k), a.v, b.v
+    FROM rolled_agent a FULL JOIN raw_agent b ON a.k = b.k
+    WHERE a.v IS DISTINCT FROM b.v
+    UNION ALL
+    SELECT 'rollup_sentiment_score', COALESCE(a.k, b.k), a.v, b.v
+    FROM rolled_score a FULL JOIN raw_score b ON a.k = b.k
+    WHERE a.v IS DISTINCT FROM b.v;
+END;
+$$ LANGUAGE plpgsql;
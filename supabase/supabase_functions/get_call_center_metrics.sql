@@ -10,19 +10,17 @@ BEGIN
     RETURN QUERY
     WITH fact_metrics AS (
         SELECT 
-            COUNT(*) AS total_conversations,
-            AVG(duration_seconds) AS avg_handle_time,
-            AVG(sentiment_score) AS avg_sentiment_score
-        FROM fact_calls
-    ),
-    latest_date AS (
-        SELECT MAX(date_id) AS id FROM fact_calls
+            SUM(call_count)::BIGINT AS total_conversations,
+            SUM(duration_sum)::NUMERIC / NULLIF(SUM(duration_count), 0) AS avg_handle_time,
+            SUM(sentiment_score_sum) / NULLIF(SUM(sentiment_score_count), 0) AS avg_sentiment_score
+        FROM rollup_daily
     ),
     last_active_agents AS (
-        SELECT COUNT(*) AS latest_agent_count
-        FROM fact_calls 
-        CROSS JOIN latest_date
-        WHERE fact_calls.date_id = latest_date.id
+        SELECT COALESCE((
+            SELECT r.call_count
+            FROM rollup_daily r
+            WHERE r.date_id = (SELECT MAX(date_id) FROM rollup_daily)
+        ), 0) AS latest_agent_count
     )
     SELECT
         f.total_conversations,
@@ -32,4 +30,4 @@ BEGIN
     FROM fact_metrics f
     CROSS JOIN last_active_agents l;
 END;
-$$ LANGUAGE plpgsql;
\ No newline at end of file
+$$ LANGUAGE plpgsql;
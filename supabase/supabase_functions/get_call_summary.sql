@@ -12,43 +12,42 @@ RETURNS TABLE (
 )
 AS $$
 BEGIN
+    -- Reads the trigger-maintained rollups (see schema.sql) instead of scanning fact_calls
     RETURN QUERY
     WITH fact_data AS (
         SELECT 
-            COUNT(*) AS total_calls,
-            AVG(duration_seconds) AS avg_duration_in_sec,
-            AVG(sentiment_score) AS avg_sentiment
-        FROM fact_calls
+            SUM(call_count)::BIGINT AS total_calls,
+            SUM(duration_sum)::NUMERIC / NULLIF(SUM(duration_count), 0) AS avg_duration_in_sec,
+            SUM(sentiment_score_sum) / NULLIF(SUM(sentiment_score_count), 0) AS avg_sentiment,
+            SUM(positive_count) AS positive_count,
+            SUM(negative_count) AS negative_count
+        FROM rollup_daily
     ),
     freq_sentiment AS (
-        SELECT sentiment_score, COUNT(*) AS count
-        FROM fact_calls
-        GROUP BY sentiment_score
-        ORDER BY count DESC
+        SELECT r.sentiment_score
+        FROM rollup_sentiment_score r
+        ORDER BY r.call_count DESC
         LIMIT 1
     ),
     freq_issue AS (
-        SELECT issue_type, COUNT(issue_type) AS issue_count
-        FROM fact_calls
-        GROUP BY issue_type
-        ORDER BY COUNT(issue_type) DESC
+        -- COUNT(issue_type) semantics: calls without an issue type count as 0
+        SELECT r.issue_type, CASE WHEN r.issue_type IS NULL THEN 0 ELSE r.call_count END AS issue_count
+        FROM rollup_issue r
+        ORDER BY 2 DESC
         LIMIT 1
     ),
     busy_agents AS (
-        SELECT dim_agents.name, SUM(duration_seconds) AS total_duration
-        FROM fact_calls
-        JOIN dim_agents ON fact_calls.agent_id = dim_agents.agent_id
+        SELECT dim_agents.name, SUM(r.duration_sum)::BIGINT AS total_duration
+        FROM rollup_agent r
+        JOIN dim_agents ON r.agent_id = dim_agents.agent_id
         GROUP BY dim_agents.name
-        ORDER BY SUM(duration_seconds) DESC
+        ORDER BY SUM(r.duration_sum) DESC
         LIMIT 1
     ),
     pct_positive AS (
         SELECT 
-            100 * (
-                SUM(CASE WHEN sentiment = 'positive' THEN 1.00 ELSE 0 END) - 
-                SUM(CASE WHEN sentiment = 'negative' THEN 1.00 ELSE 0 END)
-            ) / COUNT(*) AS pct
-        FROM fact_calls
+            100 * (f.positive_count - f.negative_count)::NUMERIC / NULLIF(f.total_calls, 0) AS pct
+        FROM fact_data f
     )
     SELECT 
         f.total_calls,
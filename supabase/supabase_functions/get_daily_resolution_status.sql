@@ -8,11 +8,10 @@ AS $$
 BEGIN
     RETURN QUERY
     SELECT 
-        f.date_id, 
-        SUM(CASE WHEN f.resolved = true THEN 1 ELSE 0 END) AS resolved,
-        SUM(CASE WHEN f.resolved = false THEN 1 ELSE 0 END) AS unresolved
-    FROM fact_calls f
-    GROUP BY f.date_id
-    ORDER BY f.date_id;
+        r.date_id, 
+        r.resolved_count AS resolved,
+        r.unresolved_count AS unresolved
+    FROM rollup_daily r
+    ORDER BY r.date_id;
 END;
-$$ LANGUAGE plpgsql;
\ No newline at end of file
+$$ LANGUAGE plpgsql;
@@ -8,11 +8,10 @@ AS $$
 BEGIN
     RETURN QUERY
     SELECT 
-        f.date_id, 
-        SUM(CASE WHEN sentiment = 'positive' THEN 1 ELSE 0 END)::NUMERIC * 100.0 / COUNT(*) AS positive_pct,
-        SUM(CASE WHEN sentiment = 'negative' THEN 1 ELSE 0 END)::NUMERIC * 100.0 / COUNT(*) AS negative_pct
-    FROM fact_calls f
-    GROUP BY f.date_id
-    ORDER BY f.date_id;
+        r.date_id, 
+        r.positive_count::NUMERIC * 100.0 / r.call_count AS positive_pct,
+        r.negative_count::NUMERIC * 100.0 / r.call_count AS negative_pct
+    FROM rollup_daily r
+    ORDER BY r.date_id;
 END;
 $$ LANGUAGE plpgsql;
@@ -0,0 +1,6 @@
+CREATE OR REPLACE FUNCTION get_data_version()
+RETURNS BIGINT
+LANGUAGE SQL STABLE
+AS $$
+    SELECT version FROM data_version WHERE name = 'fact_calls';
+$$;
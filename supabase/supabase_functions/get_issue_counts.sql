@@ -6,8 +6,7 @@ RETURNS TABLE (
 AS $$
 BEGIN
     RETURN QUERY
-    SELECT fact_calls.issue_type, COUNT(*) AS issue_count
-    FROM fact_calls
-    GROUP BY fact_calls.issue_type;
+    SELECT r.issue_type, r.call_count AS issue_count
+    FROM rollup_issue r;
 END;
 $$ LANGUAGE plpgsql;
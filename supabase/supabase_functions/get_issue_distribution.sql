@@ -7,9 +7,8 @@ AS $$
 BEGIN
     RETURN QUERY
     SELECT 
-        f.issue_type, 
-        100.0 * COUNT(*) / SUM(COUNT(*)) OVER () AS issue_dist
-    FROM fact_calls f
-    GROUP BY f.issue_type;
+        r.issue_type, 
+        100.0 * r.call_count / SUM(r.call_count) OVER () AS issue_dist
+    FROM rollup_issue r;
 END;
-$$ LANGUAGE plpgsql;
\ No newline at end of file
+$$ LANGUAGE plpgsql;
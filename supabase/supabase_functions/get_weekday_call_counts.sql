@@ -8,10 +8,10 @@ BEGIN
     RETURN QUERY
     SELECT 
         dim_date.weekday, 
-        COUNT(*) AS call_count
-    FROM fact_calls 
-    JOIN dim_date ON fact_calls.date_id = dim_date.date_id
+        SUM(r.call_count)::BIGINT AS call_count
+    FROM rollup_daily r
+    JOIN dim_date ON r.date_id = dim_date.date_id
     GROUP BY dim_date.weekday
     ORDER BY MAX(dim_date.day_number);
 END;
-$$ LANGUAGE plpgsql;
\ No newline at end of file
+$$ LANGUAGE plpgsql;
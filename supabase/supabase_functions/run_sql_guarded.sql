@@ -0,0 +1,44 @@
+-- Runs a query already checked by api/sql_guard.py. The planner's cost estimate is
+-- checked first, so an expensive query is rejected without being executed.
+--
+-- The estimate can be far off (stale statistics, skewed filters), so the run is
+-- also bounded in time by the statement_timeout set on the function below. It
+-- sits under the API's SQL_GUARD_TIMEOUT (5s) so Postgres cancels the query
+-- rather than leaving it running after the client gives up.
+CREATE OR REPLACE FUNCTION run_sql_guarded(
+    query TEXT,
+    max_cost FLOAT DEFAULT 100000,
+    strip_columns TEXT[] DEFAULT ARRAY['embedding', 'transcript']
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    plan JSONB;
+    cost FLOAT;
+    result JSONB;
+BEGIN
+    -- Defence in depth: nothing below may write, whatever got past the parser
+    SET TRANSACTION READ ONLY;
+
+    EXECUTE 'EXPLAIN (FORMAT JSON) ' || query INTO plan;
+    cost := (plan -> 0 -> 'Plan' ->> 'Total Cost')::FLOAT;
+    IF cost > max_cost THEN
+        RETURN jsonb_build_object('rejected', TRUE, 'cost', cost);
+    END IF;
+
+    -- Heavy columns the rewrite could not project away (SELECT * over a join or CTE)
+    EXECUTE format(
+        'SELECT COALESCE(jsonb_agg(to_jsonb(q) - %L::TEXT[]), ''[]''::JSONB) FROM (%s) q',
+        strip_columns,
+        query
+    ) INTO result;
+    RETURN jsonb_build_object('rejected', FALSE, 'cost', cost, 'result', result);
+END;
+$$;
+
+-- statement_timeout is armed when a top-level statement starts, so a SET inside the
+-- function body would not bound it. PostgREST (v12+) applies a function's own
+-- statement_timeout to the transaction before calling it; older versions need the
+-- calling role bounded instead (ALTER ROLE anon SET statement_timeout = '4s').
+ALTER FUNCTION run_sql_guarded(TEXT, FLOAT, TEXT[]) SET statement_timeout = '4s';
@@ -15,6 +15,17 @@ RETURNS TABLE (
 )
 LANGUAGE SQL STABLE
 AS $$
+    -- Order/limit on the distance alone so the vector index can serve the scan;
+    -- the threshold is applied to the nearest calls afterwards.
+    WITH nearest AS (
+        SELECT
+            fc.call_id,
+            fc.embedding <=> query_embedding AS distance
+        FROM fact_calls fc
+        WHERE fc.embedding IS NOT NULL
+        ORDER BY fc.embedding <=> query_embedding
+        LIMIT match_count
+    )
     SELECT
         fc.call_id,
         fc.agent_id,
@@ -23,15 +34,18 @@ AS $$
         fc.sentiment,
         fc.issue_type,
         fc.call_timestamp,
-        1 - (fc.embedding <=> query_embedding) AS similarity
-    FROM fact_calls fc
-    WHERE fc.embedding IS NOT NULL
-        AND 1 - (fc.embedding <=> query_embedding) > match_threshold
-    ORDER BY fc.embedding <=> query_embedding
-    LIMIT match_count;
+        1 - n.distance AS similarity
+    FROM nearest n
+    JOIN fact_calls fc ON fc.call_id = n.call_id
+    WHERE 1 - n.distance > match_threshold
+    ORDER BY n.distance;
 $$;
 
 
-CREATE INDEX IF NOT EXISTS idx_fact_calls_embedding 
-ON fact_calls USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
-
+-- HNSW rather than ivfflat (lists = 100): no training step, so recall does not
+-- decay as calls are added, and it supports the iterative scans that
+-- search_similar_calls_filtered relies on. Recall/speed is tuned per query with
+-- hnsw.ef_search.
+DROP INDEX IF EXISTS idx_fact_calls_embedding;
+CREATE INDEX IF NOT EXISTS idx_fact_calls_embedding_hnsw
+ON fact_calls USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
@@ -0,0 +1,115 @@
+-- search_similar_calls with structured filters pushed into the vector query.
+--
+-- Only the filters given become predicates, and the query is planned with their
+-- values, so the planner can choose per call: a selective filter (one agent, a
+-- short date range) is pre-filtered through the btree indexes and the few
+-- matching rows are ranked exactly; a broad one walks the HNSW index and drops
+-- non-matching rows as it goes. Iterative scans (pgvector 0.8+) keep that walk
+-- going until match_count rows pass; on older versions, where the parameter does
+-- not exist (and setting it would fail), it is skipped and a narrow filter can
+-- return fewer rows than asked for.
+CREATE OR REPLACE FUNCTION search_similar_calls_filtered(
+    query_embedding VECTOR(1536),
+    match_threshold FLOAT DEFAULT 0.7,
+    match_count INT DEFAULT 5,
+    filter_date_from DATE DEFAULT NULL,
+    filter_date_to DATE DEFAULT NULL,
+    filter_agent_id TEXT DEFAULT NULL,
+    filter_issue_type TEXT DEFAULT NULL,
+    filter_sentiment TEXT DEFAULT NULL,
+    filter_resolved BOOLEAN DEFAULT NULL,
+    ef_search INT DEFAULT 100
+)
+RETURNS TABLE (
+    call_id UUID,
+    agent_id TEXT,
+    transcript TEXT,
+    summary TEXT,
+    sentiment TEXT,
+    issue_type TEXT,
+    call_timestamp TIMESTAMPTZ,
+    similarity FLOAT
+)
+LANGUAGE plpgsql STABLE
+AS $$
+DECLARE
+    conditions TEXT := 'fc.embedding IS NOT NULL';
+BEGIN
+    PERFORM set_config('hnsw.ef_search', GREATEST(ef_search, match_count)::TEXT, TRUE);
+    IF (
+        SELECT string_to_array(extversion, '.')::INT[] >= ARRAY[0, 8]
+        FROM pg_extension
+        WHERE extname = 'vector'
+    ) THEN
+        PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', TRUE);
+    END IF;
+
+    IF filter_date_from IS NOT NULL THEN
+        conditions := conditions || ' AND fc.date_id >= $2';
+    END IF;
+    IF filter_date_to IS NOT NULL THEN
+        conditions := conditions || ' AND fc.date_id <= $3';
+    END IF;
+    IF filter_agent_id IS NOT NULL THEN
+        conditions := conditions || ' AND fc.agent_id = $4';
+    END IF;
+    IF filter_issue_type IS NOT NULL THEN
+        conditions := conditions || ' AND fc.issue_type = $5';
+    END IF;
+    IF filter_sentiment IS NOT NULL THEN
+        conditions := conditions || ' AND fc.sentiment = $6';
+    END IF;
+    IF filter_resolved IS NOT NULL THEN
+        conditions := conditions || ' AND fc.resolved = $7';
+    END IF;
+
+    -- Relaxed iterative scans may return the nearest rows slightly out of order,
+    -- so they are materialized and sorted again by distance.
+    RETURN QUERY EXECUTE format(
+        $query$
+        WITH nearest AS MATERIALIZED (
+            SELECT
+                fc.call_id,
+                fc.embedding <=> $1 AS distance
+            FROM fact_calls fc
+            WHERE %s
+            ORDER BY fc.embedding <=> $1
+            LIMIT $8
+        )
+        SELECT
+            fc.call_id,
+            fc.agent_id,
+            fc.transcript,
+            fc.summary,
+            fc.sentiment,
+            fc.issue_type,
+            fc.call_timestamp,
+            1 - n.distance AS similarity
+        FROM nearest n
+        JOIN fact_calls fc ON fc.call_id = n.call_id
+        WHERE 1 - n.distance > $9
+        ORDER BY n.distance
+        $query$,
+        conditions
+    )
+    USING
+        query_embedding,
+        filter_date_from,
+        filter_date_to,
+        filter_agent_id,
+        filter_issue_type,
+        filter_sentiment,
+        filter_resolved,
+        match_count,
+        match_threshold;
+END;
+$$;
+
+
+-- Pre-filtering paths. date_id, agent and sentiment already have indexes in
+-- schema.sql; issue type questions are usually also bounded in time.
+CREATE INDEX IF NOT EXISTS idx_fact_calls_issue_date
+ON fact_calls (issue_type, date_id);
+-- Unresolved calls are the minority that questions single out
+CREATE INDEX IF NOT EXISTS idx_fact_calls_unresolved_date
+ON fact_calls (date_id) WHERE resolved = FALSE;
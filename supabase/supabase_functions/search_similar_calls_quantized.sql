@@ -0,0 +1,54 @@
+CREATE OR REPLACE FUNCTION search_similar_calls_quantized(
+    query_embedding VECTOR(1536),
+    match_threshold FLOAT DEFAULT 0.7,
+    match_count INT DEFAULT 5,
+    candidate_count INT DEFAULT 40
+)
+RETURNS TABLE (
+    call_id UUID,
+    agent_id TEXT,
+    transcript TEXT,
+    summary TEXT,
+    sentiment TEXT,
+    issue_type TEXT,
+    call_timestamp TIMESTAMPTZ,
+    similarity FLOAT
+)
+LANGUAGE plpgsql STABLE
+AS $$
+BEGIN
+    -- An HNSW scan returns at most ef_search rows; let it cover every candidate
+    PERFORM set_config(
+        'hnsw.ef_search', GREATEST(candidate_count, 40)::TEXT, TRUE
+    );
+
+    -- Candidates come from the Hamming index over the 1-bit codes (192 bytes a
+    -- row); only their full-precision embeddings are read to re-rank them.
+    RETURN QUERY
+    WITH candidates AS (
+        SELECT fc.call_id
+        FROM fact_calls fc
+        WHERE fc.embedding_bits IS NOT NULL
+        ORDER BY fc.embedding_bits <~> binary_quantize(query_embedding)::BIT(1536)
+        LIMIT candidate_count
+    )
+    SELECT
+        fc.call_id,
+        fc.agent_id,
+        fc.transcript,
+        fc.summary,
+        fc.sentiment,
+        fc.issue_type,
+        fc.call_timestamp,
+        1 - (fc.embedding <=> query_embedding) AS similarity
+    FROM candidates c
+    JOIN fact_calls fc ON fc.call_id = c.call_id
+    WHERE 1 - (fc.embedding <=> query_embedding) > match_threshold
+    ORDER BY fc.embedding <=> query_embedding
+    LIMIT match_count;
+END;
+$$;
+
+
+CREATE INDEX IF NOT EXISTS idx_fact_calls_embedding_bits
+ON fact_calls USING hnsw (embedding_bits bit_hamming_ops);
@@ -0,0 +1,53 @@
+CREATE OR REPLACE FUNCTION search_similar_chunks(
+    query_embedding VECTOR(1536),
+    match_threshold FLOAT DEFAULT 0.7,
+    match_count INT DEFAULT 20
+)
+RETURNS TABLE (
+    call_id UUID,
+    chunk_index INT,
+    content TEXT,
+    agent_id TEXT,
+    summary TEXT,
+    sentiment TEXT,
+    issue_type TEXT,
+    call_timestamp TIMESTAMPTZ,
+    similarity FLOAT
+)
+LANGUAGE SQL STABLE
+AS $$
+    -- Order/limit on the distance alone so the vector index can serve the scan;
+    -- the threshold is applied to the nearest chunks afterwards.
+    WITH nearest AS (
+        SELECT
+            ch.call_id,
+            ch.chunk_index,
+            ch.content,
+            ch.embedding <=> query_embedding AS distance
+        FROM fact_call_chunks ch
+        WHERE ch.embedding IS NOT NULL
+        ORDER BY ch.embedding <=> query_embedding
+        LIMIT match_count
+    )
+    SELECT
+        n.call_id,
+        n.chunk_index,
+        n.content,
+        fc.agent_id,
+        fc.summary,
+        fc.sentiment,
+        fc.issue_type,
+        fc.call_timestamp,
+        1 - n.distance AS similarity
+    FROM nearest n
+    JOIN fact_calls fc ON fc.call_id = n.call_id
+    WHERE 1 - n.distance > match_threshold
+    ORDER BY n.distance;
+$$;
+
+
+-- HNSW: fact_call_chunks starts empty, and an ivfflat index built on an empty
+-- table has no trained lists to search, so its recall stays poor as chunks arrive.
+DROP INDEX IF EXISTS idx_fact_call_chunks_embedding;
+CREATE INDEX IF NOT EXISTS idx_fact_call_chunks_embedding_hnsw
+ON fact_call_chunks USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
@@ -0,0 +1,36 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "api"))
+
+from answer_cache import SemanticAnswerCache  # noqa: E402
+
+EMBEDDING = [1.0] * 8
+LITERALS = (("date", "2025-05-21"), ("sentiment", "negative"))
+
+
+def test_hit_needs_matching_literals():
+    cache = SemanticAnswerCache()
+    cache.store(EMBEDDING, {"answer": "12"}, 1, LITERALS)
+    assert cache.lookup(EMBEDDING, 1, LITERALS)[0] == {"answer": "12"}
+    assert cache.lookup(EMBEDDING, 1, (("date", "2025-05-22"),) + LITERALS[1:]) is None
+    assert (
+        cache.lookup(EMBEDDING, 1, LITERALS[:1] + (("sentiment", "positive"),)) is None
+    )
+
+
+def test_new_data_version_drops_entries():
+    cache = SemanticAnswerCache()
+    cache.store(EMBEDDING, {"answer": "12"}, 1, LITERALS)
+    assert cache.lookup(EMBEDDING, 2, LITERALS) is None
+
+
+def test_exact_key_tier_shares_the_size_bound():
+    cache = SemanticAnswerCache(max_entries=2)
+    cache.store_key(("how", "many", "calls"), {"answer": "3"}, 1)
+    assert cache.lookup_key(("how", "many", "calls"), 1) == {"answer": "3"}
+    cache.store(EMBEDDING, {"answer": "12"}, 1, LITERALS)
+    cache.store([0.0] * 7 + [1.0], {"answer": "4"}, 1)
+    assert cache.lookup_key(("how", "many", "calls"), 1) is None
+    assert cache.stats()["entries"] == 2
@@ -0,0 +1,32 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "api"))
+
+from bm25 import BM25Index  # noqa: E402
+
+
+def test_readded_calls_do_not_crowd_out_results():
+    index = BM25Index(compact_ratio=1.0)
+    for i in range(4):
+        index.add(f"call-{i}", "refund request")
+    for _ in range(5):
+        index.add("call-0", "refund request")
+
+    hits = index.search("refund", k=4)
+    assert sorted(row["call_id"] for row, _ in hits) == [f"call-{i}" for i in range(4)]
+    assert all(score > 0 for _, score in hits)
+    assert index.stats()["tombstones"] == 5
+
+
+def test_tombstones_are_compacted():
+    index = BM25Index(compact_ratio=0.25)
+    for i in range(4):
+        index.add(f"call-{i}", "refund request")
+    for _ in range(10):
+        index.add("call-0", "billing question")
+
+    assert index.stats()["postings"] <= 2 * 4 + 2
+    assert [row["call_id"] for row, _ in index.search("billing")] == ["call-0"]
+    assert len(index.search("refund", k=10)) == 3
@@ -0,0 +1,27 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "api"))
+
+from embedding_cache import EmbeddingCache  # noqa: E402
+
+MODEL = "text-embedding-ada-002"
+
+
+def test_disk_tier_keeps_newest_rows(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(path=path, disk_max_entries=3, prune_every=5)
+    for i in range(5):
+        cache.put(f"question {i}", MODEL, [float(i)])
+
+    reopened = EmbeddingCache(path=path, disk_max_entries=3)
+    assert reopened.get_disk("question 0", MODEL) is None
+    assert reopened.get_disk("question 4", MODEL) == [4.0]
+    assert cache.stats()["disk_pruned"] == 2
+
+
+def test_disk_tier_expires_old_rows(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    EmbeddingCache(path=path).put("question", MODEL, [1.0])
+    assert EmbeddingCache(path=path, disk_ttl_seconds=-1).get("question", MODEL) is None
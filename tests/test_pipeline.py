@@ -0,0 +1,18 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "db_ingestion"))
+
+from pipeline import run_pipeline  # noqa: E402
+
+
+def test_failed_batch_is_retried_one_record_at_a_time():
+    def write(batch):
+        if any(item == 3 for item in batch):
+            raise ValueError("bad row")
+        return batch
+
+    _, stats = run_pipeline(range(8), [("write", write, 1, 8)])
+    assert stats[0]["errors"] == 1
+    assert stats[0]["emitted"] == 7
@@ -0,0 +1,37 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "api"))
+
+from sql_templates import SQLTemplateStore, mentions_relative_date  # noqa: E402
+
+COUNT_SQL = "SELECT COUNT(*) FROM fact_calls WHERE date_id = '2025-05-21'"
+
+
+def learned_store():
+    store = SQLTemplateStore()
+    assert store.learn("How many calls took place on May 21st 2025?", COUNT_SQL)
+    return store
+
+
+def test_same_shape_fills_new_date():
+    sql, _ = learned_store().match("How many calls took place on May 22nd 2025?")
+    assert sql == "SELECT COUNT(*) FROM fact_calls WHERE date_id = '2025-05-22'"
+
+
+def test_soft_word_near_match():
+    sql, _ = learned_store().match("How many calls happened on May 22nd 2025?")
+    assert "'2025-05-22'" in sql
+
+
+def test_list_question_does_not_reuse_count_template():
+    store = learned_store()
+    assert store.match("What calls took place on May 22nd 2025?") is None
+    assert store.match("What number of calls took place on May 22nd 2025?") is None
+
+
+def test_relative_dates_are_detected():
+    assert mentions_relative_date("How many calls were there yesterday?")
+    assert mentions_relative_date("Average score over the last 7 days")
+    assert not mentions_relative_date("How many calls took place on May 21st 2025?")
@@ -1,7 +1,7 @@
 "use client";
 
 import { useState, useEffect } from "react";
-import { supabase } from "../lib/supabase";
+import { fetchDashboardRpcs } from "../lib/api";
 import {
   Card,
   CardContent,
@@ -121,17 +121,17 @@ export function AnalyticsPage() {
       try {
         setLoading(true);
 
-        // Fetch all data in parallel
+        // All KPIs come from one cached /api/dashboard request
         const [
           issueResult,
           resolutionResult,
           sentimentResult,
           callCenterResults,
-        ] = await Promise.all([
-          supabase.rpc("get_issue_distribution"),
-          supabase.rpc("get_daily_resolution_status"),
-          supabase.rpc("get_daily_sentiment_pct"),
-          supabase.rpc("get_call_center_metrics"),
+        ] = await fetchDashboardRpcs([
+          "get_issue_distribution",
+          "get_daily_resolution_status",
+          "get_daily_sentiment_pct",
+          "get_call_center_metrics",
         ]);
         if (callCenterResults.error) throw callCenterResults.error;
         if (callCenterResults.data) {
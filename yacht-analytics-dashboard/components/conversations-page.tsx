@@ -1,5 +1,6 @@
 "use client";
 import { supabase } from "../lib/supabase";
+import { fetchCall, fetchCalls } from "../lib/api";
 import { useState, useEffect } from "react";
 
 import {
@@ -44,7 +45,10 @@ import {
   DialogTrigger,
 } from "@/components/ui/dialog";
 
+const PAGE_SIZE = 50;
+
 interface Conversation {
+  call_id: string;
   date_id: string;
   agent_name: string;
   agent_email: string;
@@ -70,6 +74,8 @@ export function ConversationsPage() {
   const [searchTerm, setSearchTerm] = useState("");
   const [statusFilter, setStatusFilter] = useState("all");
   const [sentimentFilter, setSentimentFilter] = useState("all");
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   // Helper function to format duration from seconds
   const formatDuration = (seconds: number): string => {
@@ -103,30 +109,66 @@ export function ConversationsPage() {
     return { date: dateStr, time: timeStr };
   };
 
+  // Pages come from /api/calls without transcripts; the sentiment filter runs server-side
+  const fetchPage = (cursor: string | null) =>
+    fetchCalls<Conversation>({
+      limit: PAGE_SIZE,
+      cursor,
+      include_parties: true,
+      sentiment: sentimentFilter === "all" ? null : sentimentFilter,
+    });
+
   useEffect(() => {
     async function fetchConversations() {
       setLoading(true);
       setError(null);
 
       try {
-        const { data, error } = await supabase.rpc("get_call_data");
-
-        if (error) {
-          console.error("Error fetching conversations:", error.message);
-          setError("Failed to load conversations. Please try again.");
-        } else {
-          setConversations(data as Conversation[]);
-        }
+        const page = await fetchPage(null);
+        setConversations(page.calls);
+        setNextCursor(page.next_cursor);
       } catch (err) {
-        console.error("Unexpected error:", err);
-        setError("An unexpected error occurred.");
+        console.error("Error fetching conversations:", err);
+        setError("Failed to load conversations. Please try again.");
       } finally {
         setLoading(false);
       }
     }
 
     fetchConversations();
-  }, []);
+  }, [sentimentFilter]);
+
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchPage(nextCursor);
+      setConversations((current) => [...current, ...page.calls]);
+      setNextCursor(page.next_cursor);
+    } catch (err) {
+      console.error("Error fetching more conversations:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // The transcript is only fetched when a conversation is opened
+  const openConversation = async (conversation: Conversation) => {
+    setSelectedConversation(conversation);
+    if (conversation.transcript !== undefined) return;
+    try {
+      const detail = await fetchCall<Conversation>(conversation.call_id);
+      setConversations((current) =>
+        current.map((conv) =>
+          conv.call_id === conversation.call_id
+            ? { ...conv, transcript: detail.transcript ?? "" }
+            : conv
+        )
+      );
+    } catch (err) {
+      console.error("Error fetching transcript:", err);
+    }
+  };
 
   const filteredConversations = conversations.filter((conv) => {
     const searchLower = searchTerm.toLowerCase();
@@ -326,7 +368,7 @@ export function ConversationsPage() {
 
                     return (
                       <TableRow
-                        key={conversation.date_id + index}
+                        key={conversation.call_id}
                         className="border-slate-700 hover:bg-slate-800"
                       >
                         <TableCell className="text-white">
@@ -425,9 +467,7 @@ export function ConversationsPage() {
                                   variant="ghost"
                                   size="icon"
                                   className="h-8 w-8 text-slate-400 hover:text-cyan-400"
-                                  onClick={() =>
-                                    setSelectedConversation(conversation)
-                                  }
+                                  onClick={() => openConversation(conversation)}
                                 >
                                   <Play className="h-4 w-4" />
                                 </Button>
@@ -658,6 +698,19 @@ export function ConversationsPage() {
               </Table>
             </div>
           )}
+          {nextCursor && (
+            <div className="flex justify-center pt-4">
+              <Button
+                variant="outline"
+                onClick={loadMore}
+                disabled={loadingMore}
+                className="border-slate-600 text-slate-400 hover:bg-slate-800"
+              >
+                {loadingMore && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+                Load more
+              </Button>
+            </div>
+          )}
         </CardContent>
       </Card>
     </div>
@@ -1,5 +1,5 @@
 "use client";
-import { supabase } from "../lib/supabase";
+import { fetchDashboardRpcs } from "../lib/api";
 import Link from "next/link";
 import { useState, useEffect } from "react";
 import {
@@ -131,12 +131,13 @@ export function DashboardHome() {
       try {
         setLoading(true);
 
-        // Fetch all data in parallel
-        const [summaryResult, weekdayResult, issueResult] = await Promise.all([
-          supabase.rpc("get_call_summary"),
-          supabase.rpc("get_weekday_call_counts"),
-          supabase.rpc("get_issue_counts"),
-        ]);
+        // All KPIs come from one cached /api/dashboard request
+        const [summaryResult, weekdayResult, issueResult] =
+          await fetchDashboardRpcs([
+            "get_call_summary",
+            "get_weekday_call_counts",
+            "get_issue_counts",
+          ]);
 
         // Handle summary data
         if (summaryResult.error) throw summaryResult.error;
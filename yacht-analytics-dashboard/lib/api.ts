@@ -0,0 +1,55 @@
+export const API_BASE_URL: string =
+  process.env.NEXT_PUBLIC_API_BASE_URL || "http://localhost:8000";
+
+export type RpcResult = { data: any; error: Error | null };
+
+// One request for every dashboard KPI. "no-cache" makes the browser revalidate
+// with If-None-Match, so unchanged data comes back as an empty 304.
+export async function fetchDashboard(): Promise<Record<string, any>> {
+  const response = await fetch(`${API_BASE_URL}/api/dashboard`, {
+    cache: "no-cache",
+  });
+  if (!response.ok) {
+    throw new Error(`Dashboard request failed: ${response.status}`);
+  }
+  return response.json();
+}
+
+// Results in the { data, error } shape that supabase.rpc returns
+export async function fetchDashboardRpcs(
+  names: string[]
+): Promise<RpcResult[]> {
+  const dashboard = await fetchDashboard();
+  return names.map((name) => ({ data: dashboard[name], error: null }));
+}
+
+export interface CallPage<T> {
+  calls: T[];
+  count: number;
+  next_cursor: string | null;
+}
+
+// One page of calls, newest first. Pass the previous page's next_cursor to continue.
+export async function fetchCalls<T>(
+  params: Record<string, string | number | boolean | null | undefined>
+): Promise<CallPage<T>> {
+  const query = new URLSearchParams();
+  Object.entries(params).forEach(([key, value]) => {
+    if (value !== null && value !== undefined && value !== "") {
+      query.set(key, String(value));
+    }
+  });
+  const response = await fetch(`${API_BASE_URL}/api/calls?${query}`);
+  if (!response.ok) {
+    throw new Error(`Calls request failed: ${response.status}`);
+  }
+  return response.json();
+}
+
+export async function fetchCall<T>(callId: string): Promise<T> {
+  const response = await fetch(`${API_BASE_URL}/api/calls/${callId}`);
+  if (!response.ok) {
+    throw new Error(`Call request failed: ${response.status}`);
+  }
+  return response.json();
+}